@@ -0,0 +1,118 @@
+"""
+Async versions of the request-path operations in crud.py.
+
+Used with ``database.get_async_db`` (or ``get_optional_async_db``) when
+DATABASE_URL names an async driver. Each function mirrors the crud.py
+function of the same name. Reads are written against the async session
+directly; writes run the crud.py function through ``run_sync`` so they
+keep its side effects (mailbox counters, the reminder outbox, principal
+cache invalidation) without a second copy of that logic.
+"""
+from sqlalchemy import false, select
+from sqlalchemy.ext.asyncio import AsyncSession
+import crud, models, schemas, pagination
+from typing import List, Optional
+
+# User operations
+async def get_user(db: AsyncSession, user_id: int):
+    """Get a user by ID."""
+    return await db.get(models.User, user_id)
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    """Get a user by email."""
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    return result.scalars().first()
+
+async def set_user_active(db: AsyncSession, user_id: int, is_active: bool):
+    """Activate or deactivate a user (cached logins are invalidated)."""
+    return await db.run_sync(crud.set_user_active, user_id, is_active)
+
+# Document operations
+async def get_document(db: AsyncSession, document_id: int):
+    """Get a document by ID."""
+    return await db.get(models.Document, document_id)
+
+async def get_user_documents(db: AsyncSession, user_id: int, document_ids: List[int] = None):
+    """Get documents owned by a user, optionally restricted to the given IDs."""
+    query = select(models.Document).where(models.Document.user_id == user_id)
+    if document_ids is not None:
+        query = query.where(models.Document.id.in_(document_ids))
+    result = await db.execute(query.order_by(models.Document.id))
+    return result.scalars().all()
+
+async def get_documents(db: AsyncSession, user_id: int, cursor: str = None, limit: int = 100):
+    """Get a page of documents for a user, oldest first, with the next cursor."""
+    limit = pagination.clamp_limit(limit)
+    result = await db.execute(
+        select(*crud.DOCUMENT_LIST_COLUMNS)
+        .where(models.Document.user_id == user_id, *pagination.after_cursor(models.Document, cursor))
+        .order_by(*pagination.page_order(models.Document))
+        .limit(limit + 1)
+    )
+    return pagination.make_page(result.all(), limit)
+
+async def get_document_analysis(db: AsyncSession, document_id: int):
+    """Get the most recent analysis for a document."""
+    result = await db.execute(
+        select(models.DocumentAnalysis)
+        .where(models.DocumentAnalysis.document_id == document_id)
+        .order_by(models.DocumentAnalysis.id.desc())
+        .limit(1)
+    )
+    return result.scalars().first()
+
+async def get_cached_analysis(db: AsyncSession, document_id: int, content_hash: str, analyzer_version: str,
+                              user_id: Optional[int] = None):
+    """Get an existing analysis of the given content by the given analyzer; see crud.get_cached_analysis."""
+    return await db.run_sync(crud.get_cached_analysis, document_id, content_hash, analyzer_version, user_id)
+
+async def get_jobs(db: AsyncSession, document_id: int):
+    """Get all jobs for a document, oldest first."""
+    result = await db.execute(
+        select(models.Job).where(models.Job.document_id == document_id).order_by(models.Job.id)
+    )
+    return result.scalars().all()
+
+# Program operations
+async def get_programs(db: AsyncSession, user_id: int, cursor: str = None, limit: int = 100):
+    """Get a page of programs for a user, oldest first, with the next cursor."""
+    limit = pagination.clamp_limit(limit)
+    result = await db.execute(
+        select(*crud.PROGRAM_LIST_COLUMNS)
+        .where(models.Program.user_id == user_id, *pagination.after_cursor(models.Program, cursor))
+        .order_by(*pagination.page_order(models.Program))
+        .limit(limit + 1)
+    )
+    return pagination.make_page(result.all(), limit)
+
+async def get_program(db: AsyncSession, program_id: int):
+    """Get a program by ID."""
+    return await db.get(models.Program, program_id)
+
+async def create_program(db: AsyncSession, program: schemas.ProgramCreate, user_id: int):
+    """Create a new program for a user."""
+    return await db.run_sync(crud.create_program, program, user_id)
+
+# Email operations
+async def get_emails(db: AsyncSession, user_id: int, cursor: str = None, limit: int = 100,
+                     unread_only: bool = False):
+    """Get a page of emails for a user, oldest first, with the next cursor."""
+    limit = pagination.clamp_limit(limit)
+    query = select(*crud.EMAIL_LIST_COLUMNS).where(
+        models.Email.user_id == user_id, *pagination.after_cursor(models.Email, cursor)
+    )
+    if unread_only:
+        query = query.where(models.Email.is_read == false())
+    result = await db.execute(query.order_by(*pagination.page_order(models.Email)).limit(limit + 1))
+    return pagination.make_page(result.all(), limit)
+
+async def create_email(db: AsyncSession, email: schemas.EmailCreate, user_id: int):
+    """Create a new email for a user."""
+    return await db.run_sync(crud.create_email, email, user_id)
+
+async def get_mailbox_counts(db: AsyncSession, user_id: int):
+    """A user's (total, unread) email counts; see crud.get_mailbox_counts."""
+    counter = await db.get(models.MailboxCounter, user_id)
+    if counter is None:
+        return await db.run_sync(crud.count_emails, user_id)
+    return counter.total, counter.unread
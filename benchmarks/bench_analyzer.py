@@ -0,0 +1,102 @@
+"""
+Compare the streaming analyzer engine against the original analyze_document.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_analyzer [--sizes 1,4,16] [--repeat 3]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from services.analyzer import Analyzer
+
+WORDS = (
+    "the program application essay deadline research university student "
+    "statement purpose faculty good great excellent success benefit bad poor "
+    "problem issue failure advantage interest experience laboratory thesis"
+).split()
+
+def synthetic_text(size_mb: float, seed: int = 0) -> str:
+    """Sentence-shaped text of roughly ``size_mb`` megabytes."""
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    sentences = []
+    length = 0
+    while length < target:
+        words = rng.choices(WORDS, k=rng.randint(4, 25))
+        sentence = " ".join(words).capitalize() + (".\n" if rng.random() < 0.2 else ". ")
+        sentences.append(sentence)
+        length += len(sentence)
+    return "".join(sentences)
+
+def legacy_analyze(extracted_text: str) -> dict:
+    """analyze_document before the streaming engine, kept for comparison."""
+    word_count = len(extracted_text.split())
+    sentences = [s.strip() for s in extracted_text.replace("\n", " ").split(".") if s.strip()]
+    key_points = []
+    for sentence in sentences:
+        if len(sentence.split()) > 10:
+            key_points.append(sentence)
+    key_points = key_points[:5]
+    summary = ""
+    if sentences:
+        summary = sentences[0]
+        if len(sentences) > 1:
+            summary += " " + sentences[-1]
+    positive_words = ["good", "great", "excellent", "positive", "success", "benefit", "advantage"]
+    negative_words = ["bad", "poor", "negative", "failure", "problem", "disadvantage", "issue"]
+    positive_count = sum(1 for word in extracted_text.lower().split() if word in positive_words)
+    negative_count = sum(1 for word in extracted_text.lower().split() if word in negative_words)
+    sentiment = "neutral"
+    if positive_count > negative_count * 2:
+        sentiment = "positive"
+    elif negative_count > positive_count * 2:
+        sentiment = "negative"
+    return {"summary": summary, "key_points": key_points, "word_count": word_count, "sentiment": sentiment}
+
+def measure(func, text: str, repeat: int):
+    """Best wall time over ``repeat`` runs and peak traced memory of one run."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+def run(sizes, repeat: int):
+    engine = Analyzer()
+    rows = []
+    for size in sizes:
+        text = synthetic_text(size)
+        legacy = legacy_analyze(text)
+        streamed = engine.analyze(text)
+        assert legacy["word_count"] == streamed["word_count"]
+        assert legacy["sentiment"] == streamed["sentiment"]
+        assert legacy["key_points"] == streamed["key_points"]
+        legacy_time, legacy_peak = measure(legacy_analyze, text, repeat)
+        engine_time, engine_peak = measure(engine.analyze, text, repeat)
+        rows.append((size, legacy_time, engine_time, legacy_peak, engine_peak))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,4,16", help="Text sizes in MB, comma-separated")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    sizes = [float(size) for size in args.sizes.split(",")]
+
+    print(f"{'size':>7} {'legacy s':>10} {'engine s':>10} {'speedup':>8} {'legacy MB':>10} {'engine MB':>10}")
+    for size, legacy_time, engine_time, legacy_peak, engine_peak in run(sizes, args.repeat):
+        print(
+            f"{size:>5g}MB {legacy_time:>10.3f} {engine_time:>10.3f} {legacy_time / engine_time:>7.1f}x "
+            f"{legacy_peak / 2**20:>10.1f} {engine_peak / 2**20:>10.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
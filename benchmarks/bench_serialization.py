@@ -0,0 +1,98 @@
+"""
+Per-page cost of the list endpoints: ORM objects validated through the
+response_model (the old path) versus column rows encoded by
+serialization.page_response (the fast path).
+
+Both paths include the database query. Run from the repository root:
+
+    python -m benchmarks.bench_serialization [--rows 20000] [--page 100] [--repeat 200]
+"""
+import argparse
+import datetime
+import json
+import os
+import tempfile
+import time
+import warnings
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import models
+import schemas
+import serialization
+
+def seed(db, rows: int) -> None:
+    """One user with ``rows`` documents."""
+    db.add(models.User(email="bench@example.com", hashed_password="x"))
+    db.commit()
+    start = datetime.datetime(2024, 1, 1)
+    db.execute(insert(models.Document), [
+        {
+            "title": f"Statement of purpose {i}", "description": "Draft for the fall intake",
+            "filename": f"sop-{i}.pdf", "file_path": f"uploads/blobs/{i:02x}/{i:064x}",
+            "content_type": "application/pdf", "size_bytes": 120_000 + i,
+            "content_hash": None, "created_at": start + datetime.timedelta(seconds=i), "user_id": 1,
+        }
+        for i in range(rows)
+    ])
+    db.commit()
+
+def validate(document) -> schemas.Document:
+    """response_model validation of one ORM object, on pydantic v1 or v2."""
+    if hasattr(schemas.Document, "model_validate"):
+        return schemas.Document.model_validate(document, from_attributes=True)
+    return schemas.Document.from_orm(document)
+
+def legacy_page(db, limit: int) -> bytes:
+    """ORM query, then response_model validation and jsonable_encoder, as before."""
+    documents = db.query(models.Document).filter(
+        models.Document.user_id == 1
+    ).order_by(models.Document.created_at, models.Document.id).limit(limit).all()
+    page = schemas.DocumentPage(items=[validate(d) for d in documents], next_cursor=None)
+    return json.dumps(jsonable_encoder(page), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def fast_page(db, limit: int) -> bytes:
+    """Column-only query encoded by the fast response class."""
+    rows, next_cursor = crud.get_documents(db, user_id=1, limit=limit)
+    return serialization.page_response(rows, next_cursor).body
+
+def measure(func, session_factory, limit: int, repeat: int) -> float:
+    """Median milliseconds per page, each in a fresh session like a request."""
+    samples = []
+    for _ in range(repeat):
+        with session_factory() as db:
+            start = time.perf_counter()
+            func(db, limit)
+            samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--page", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        models.Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        with Session() as db:
+            seed(db, args.rows)
+
+        legacy = measure(legacy_page, Session, args.page, args.repeat)
+        fast = measure(fast_page, Session, args.page, args.repeat)
+        engine.dispose()
+
+    encoder = "orjson" if serialization.orjson is not None else "json"
+    print(f"{'path':>8} {'ms/page':>9}   ({args.page} items, encoder: {encoder})")
+    print(f"{'legacy':>8} {legacy:>9.3f}")
+    print(f"{'fast':>8} {fast:>9.3f}   {legacy / fast:.1f}x")
+
+if __name__ == "__main__":
+    main()
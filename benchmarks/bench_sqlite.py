@@ -0,0 +1,131 @@
+"""
+Compare the stock and tuned SQLite profiles under mixed read/write load.
+
+Each profile gets a fresh database file; writer threads insert documents
+one transaction at a time while reader threads list them, the same shape
+as uploads racing the GET routes.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_sqlite [--seconds 5] [--readers 8] [--writers 2]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import create_sqlite_engines
+
+USERS = 20
+
+def seed(session_factory) -> None:
+    """Create the users every document belongs to."""
+    with session_factory() as db:
+        for i in range(USERS):
+            db.add(models.User(email=f"bench{i}@example.com", hashed_password="x"))
+        db.commit()
+
+def percentile(samples, q: float) -> float:
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+def run_profile(profile: str, seconds: float, readers: int, writers: int) -> dict:
+    """Drive one profile and collect per-operation latencies and errors."""
+    with tempfile.TemporaryDirectory() as tmp:
+        writer, reader = create_sqlite_engines(f"sqlite:///{os.path.join(tmp, 'bench.db')}", profile)
+        models.Base.metadata.create_all(bind=writer)
+        WriteSession = sessionmaker(bind=writer)
+        ReadSession = sessionmaker(bind=reader)
+        seed(WriteSession)
+
+        latencies = {"read": [], "write": []}
+        errors = {"read": 0, "write": 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def write_loop(worker: int) -> None:
+            n = 0
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    with WriteSession() as db:
+                        db.add(models.Document(
+                            title=f"doc {worker}-{n}", description="benchmark", file_path=f"/tmp/{worker}-{n}",
+                            content_type="text/plain", user_id=n % USERS + 1
+                        ))
+                        db.commit()
+                    key = "write"
+                except OperationalError:
+                    key = None
+                with lock:
+                    if key:
+                        latencies[key].append(time.perf_counter() - start)
+                    else:
+                        errors["write"] += 1
+                n += 1
+
+        def read_loop(worker: int) -> None:
+            n = worker
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    with ReadSession() as db:
+                        db.query(models.Document).filter(
+                            models.Document.user_id == n % USERS + 1
+                        ).order_by(models.Document.id.desc()).limit(50).all()
+                    key = "read"
+                except OperationalError:
+                    key = None
+                with lock:
+                    if key:
+                        latencies[key].append(time.perf_counter() - start)
+                    else:
+                        errors["read"] += 1
+                n += 1
+
+        threads = [threading.Thread(target=write_loop, args=(i,)) for i in range(writers)]
+        threads += [threading.Thread(target=read_loop, args=(i,)) for i in range(readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        writer.dispose()
+        reader.dispose()
+
+    return {
+        kind: {
+            "ops_per_s": len(samples) / seconds,
+            "p50_ms": statistics.median(samples) * 1000 if samples else 0.0,
+            "p99_ms": percentile(samples, 0.99) * 1000,
+            "errors": errors[kind],
+        }
+        for kind, samples in latencies.items()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--profiles", default="default,tuned", help="SQLite profiles, comma-separated")
+    args = parser.parse_args()
+
+    print(f"{'profile':>8} {'op':>6} {'ops/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for profile in args.profiles.split(","):
+        results = run_profile(profile, args.seconds, args.readers, args.writers)
+        for kind, row in results.items():
+            print(
+                f"{profile:>8} {kind:>6} {row['ops_per_s']:>9.0f} {row['p50_ms']:>8.2f} "
+                f"{row['p99_ms']:>8.2f} {row['errors']:>7}"
+            )
+
+if __name__ == "__main__":
+    main()
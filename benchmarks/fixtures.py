@@ -0,0 +1,87 @@
+"""
+Deterministic fixtures for the benchmark suite: synthetic users, plain
+text documents and small multi-page PDFs written by hand (no PDF library
+needed). The same seed always produces the same bytes.
+"""
+import os
+import random
+from typing import Dict, List, Tuple
+
+from benchmarks.bench_analyzer import WORDS, synthetic_text
+
+# name -> size in KiB of the text fixtures used by the suite
+TEXT_SIZES = {"text-4k": 4, "text-64k": 64, "text-1m": 1024}
+# name -> page count of the PDF fixtures
+PDF_PAGES = {"pdf-1p": 1, "pdf-10p": 10, "pdf-50p": 50}
+
+def users(count: int, seed: int = 0) -> List[Dict[str, str]]:
+    """Registration payloads for ``count`` synthetic users."""
+    rng = random.Random(seed)
+    return [
+        {"email": f"bench-{i}-{rng.randrange(16 ** 6):06x}@example.com", "password": f"pw-{i}-{rng.random():.6f}"}
+        for i in range(count)
+    ]
+
+def text_document(size_kb: float, seed: int = 0) -> bytes:
+    """UTF-8 text of roughly ``size_kb`` KiB."""
+    return synthetic_text(size_kb / 1024, seed).encode("utf-8")
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def pdf_document(pages: int, lines_per_page: int = 40, seed: int = 0) -> bytes:
+    """
+    A valid PDF with ``pages`` pages of Helvetica text that pdftotext can read.
+
+    Objects: 1 catalog, 2 page tree, 3 font, then a page and a content
+    stream per page.
+    """
+    rng = random.Random(seed)
+    objects: List[bytes] = [b"", b"", b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for _ in range(pages):
+        lines = [" ".join(rng.choices(WORDS, k=rng.randint(6, 12))).capitalize() + "." for _ in range(lines_per_page)]
+        body = "BT /F1 10 Tf 14 TL 50 780 Td " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET"
+        stream = body.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+def write_documents(directory: str, seed: int = 0) -> Dict[str, Tuple[str, str]]:
+    """
+    Write every text and PDF fixture into ``directory``.
+
+    Returns:
+        Fixture name -> (path, content type)
+    """
+    os.makedirs(directory, exist_ok=True)
+    documents = {}
+    for name, size_kb in TEXT_SIZES.items():
+        documents[name] = (text_document(size_kb, seed), "text/plain", "txt")
+    for name, pages in PDF_PAGES.items():
+        documents[name] = (pdf_document(pages, seed=seed), "application/pdf", "pdf")
+    paths = {}
+    for name, (data, content_type, extension) in documents.items():
+        path = os.path.join(directory, f"{name}.{extension}")
+        with open(path, "wb") as f:
+            f.write(data)
+        paths[name] = (path, content_type)
+    return paths
@@ -0,0 +1,353 @@
+"""
+Benchmark and load-test suite, fully local and reproducible.
+
+- micro: process_document (extraction into the text store) and
+  analyze_document on text and PDF fixtures of several sizes
+- load: an in-process driver for register, token, upload, list, analyze
+  and download against a fresh temporary SQLite database and upload dir,
+  with background extraction drained between upload and analysis
+- tfidf: ranking one user's whole corpus with the TF-IDF engine, both
+  in memory (select over stored profiles) and end to end
+  (analyze_documents, including the database and text store reads)
+
+Every benchmark reports throughput and p50/p95/p99 latency. Results can be
+saved as a baseline; later runs are compared against it and regressions
+beyond --tolerance are flagged (exit status 1). PDF fixtures need
+pdftotext and are skipped without it.
+
+Run from the repository root:
+
+    python -m benchmarks.run [--only micro,load,tfidf] [--quick] [--save-baseline]
+                             [--baseline benchmarks/baseline.json] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks import fixtures
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Application modules read their configuration at import time, so they are
+# imported inside the benchmarks, after main() has pointed the environment
+# at the scratch directory.
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted samples."""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, max(0, int(round(q * len(samples))) - 1))]
+
+def summarize(samples: List[float], wall_seconds: float, errors: int = 0) -> Dict[str, float]:
+    """Throughput and latency percentiles (milliseconds) for one benchmark."""
+    samples = sorted(samples)
+    return {
+        "n": len(samples),
+        "errors": errors,
+        "ops_per_sec": len(samples) / wall_seconds if wall_seconds > 0 else 0.0,
+        "mean_ms": sum(samples) / len(samples) * 1000 if samples else 0.0,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+    }
+
+def repeat_timed(func: Callable[[], Any], repeat: int, setup: Optional[Callable[[], Any]] = None) -> Dict[str, float]:
+    """Run ``func`` ``repeat`` times (after ``setup``, which is not timed)."""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples, sum(samples))
+
+# Micro-benchmarks
+def run_micro(workdir: str, documents: Dict[str, tuple], repeat: int, pdf: bool) -> Dict[str, Dict[str, float]]:
+    from services import document_service, text_store
+
+    results = {}
+    for name, (fixture_path, content_type) in documents.items():
+        if content_type == "application/pdf" and not pdf:
+            continue
+        # Work on a copy so text store files land in the scratch directory
+        path = os.path.join(workdir, "micro", os.path.basename(fixture_path))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(fixture_path, path)
+
+        results[f"micro.process_document[{name}]"] = repeat_timed(
+            lambda: document_service.process_document(path, content_type), repeat,
+            setup=lambda: text_store.remove_text(path)
+        )
+        # Cold: decompress from the text store; warm: served by the text LRU
+        results[f"micro.analyze_document.cold[{name}]"] = repeat_timed(
+            lambda: document_service.analyze_document(path, content_type), repeat,
+            setup=text_store.text_cache.clear
+        )
+        results[f"micro.analyze_document.warm[{name}]"] = repeat_timed(
+            lambda: document_service.analyze_document(path, content_type), repeat
+        )
+    return results
+
+# Load test
+LOAD_FIXTURES = ("text-4k", "text-64k", "pdf-1p", "pdf-10p")
+
+def run_load(documents: Dict[str, tuple], users: int, docs_per_user: int, rounds: int,
+             concurrency: int, pdf: bool, seed: int) -> Dict[str, Dict[str, float]]:
+    from fastapi.testclient import TestClient
+
+    import database
+    import main
+    import models
+
+    fixture_names = [name for name in LOAD_FIXTURES if pdf or documents[name][1] != "application/pdf"]
+    payloads = {}
+    for name in fixture_names:
+        path, content_type = documents[name]
+        with open(path, "rb") as f:
+            payloads[name] = (os.path.basename(path), f.read(), content_type)
+
+    results = {}
+    with TestClient(main.app) as client, ThreadPoolExecutor(concurrency) as pool:
+
+        def phase(name: str, calls: List[Callable[[], Any]], ok: int = 200) -> List[Any]:
+            def call(func):
+                start = time.perf_counter()
+                response = func()
+                return time.perf_counter() - start, response
+
+            started = time.perf_counter()
+            outcomes = list(pool.map(call, calls))
+            wall = time.perf_counter() - started
+            errors = sum(1 for _, response in outcomes if response.status_code != ok)
+            results[f"load.{name}"] = summarize([elapsed for elapsed, _ in outcomes], wall, errors)
+            return [response for _, response in outcomes]
+
+        accounts = fixtures.users(users, seed)
+        phase("register", [lambda a=a: client.post("/auth/register", json=a) for a in accounts])
+        tokens = phase("token", [
+            lambda a=a: client.post("/auth/token", data={"username": a["email"], "password": a["password"]})
+            for a in accounts
+        ])
+        headers = [{"Authorization": f"Bearer {r.json()['access_token']}"} for r in tokens if r.status_code == 200]
+
+        uploads = []
+        for u, header in enumerate(headers):
+            for d in range(docs_per_user):
+                filename, data, content_type = payloads[fixture_names[(u + d) % len(fixture_names)]]
+                uploads.append(lambda h=header, d=d, f=(filename, data, content_type): client.post(
+                    "/documents/", headers=h, data={"title": f"Benchmark document {d}"}, files={"file": f}
+                ))
+        owned = [(h, r.json()["id"]) for h, r in zip(
+            [h for h in headers for _ in range(docs_per_user)], phase("upload", uploads)
+        ) if r.status_code == 200]
+
+        # Let background extraction finish so analysis reads the text store
+        start = time.perf_counter()
+        while time.perf_counter() - start < 300:
+            with database.SessionLocal() as db:
+                pending = db.query(models.Job).filter(models.Job.status.in_(("queued", "running"))).count()
+            if not pending:
+                break
+            time.sleep(0.05)
+        results["load.extraction_drain"] = summarize([time.perf_counter() - start], time.perf_counter() - start, pending)
+
+        phase("list", [
+            lambda h=h: client.get("/documents/", headers=h, params={"limit": 50})
+            for _ in range(rounds) for h in headers
+        ])
+        phase("analyze", [
+            lambda h=h, i=i: client.post(f"/documents/{i}/analyze", headers=h) for h, i in owned
+        ])
+        phase("download", [
+            lambda h=h, i=i: client.get(f"/documents/{i}/download", headers=h)
+            for _ in range(rounds) for h, i in owned
+        ])
+    return results
+
+# TF-IDF corpus ranking
+def run_tfidf(workdir: str, docs: int, words: int, repeat: int, seed: int) -> Dict[str, Dict[str, float]]:
+    import hashlib
+
+    import database
+    import models
+    import startup
+    from services import text_store, tfidf
+
+    startup.create_schema()
+    directory = os.path.join(workdir, "tfidf")
+    os.makedirs(directory, exist_ok=True)
+    with database.SessionLocal() as db:
+        user = models.User(email="tfidf-bench@example.com", hashed_password="-")
+        db.add(user)
+        db.flush()
+        documents = []
+        for i in range(docs):
+            data = fixtures.text_document(words * 6.6 / 1024, seed + i)
+            content_hash = hashlib.sha256(data).hexdigest()
+            path = os.path.join(directory, content_hash)
+            with open(path, "wb") as f:
+                f.write(data)
+            text_store.write_text(path, [data.decode("utf-8")])
+            db.add(models.Blob(content_hash=content_hash, file_path=path, size_bytes=len(data), ref_count=1))
+            documents.append(models.Document(
+                title=f"tfidf {i}", filename=f"{i}.txt", file_path=path, content_type="text/plain",
+                size_bytes=len(data), content_hash=content_hash, user_id=user.id
+            ))
+        db.add_all(documents)
+        db.commit()
+        # Profiles and corpus statistics are built once, as extraction would
+        tfidf.count_documents(db, documents)
+        user_id = user.id
+        # Detached, as the documents router passes them
+        documents = db.query(models.Document).filter(models.Document.user_id == user_id).all()
+        db.expunge_all()
+
+    label = f"{docs}x{words}w"
+    with database.SessionLocal() as db:
+        profiles = list(tfidf._load_profiles(db, [document.content_hash for document in documents]).values())
+        doc_freq = lambda terms: tfidf._doc_freq(db, user_id, terms)
+        results = {
+            f"tfidf.select[{label}]": repeat_timed(lambda: tfidf.select(profiles, doc_freq, docs), repeat),
+            f"tfidf.analyze_documents[{label}]": repeat_timed(
+                lambda: tfidf.analyze_documents(db, user_id, documents), repeat, setup=text_store.text_cache.clear
+            ),
+        }
+    return results
+
+# Baselines
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float) -> Dict[str, List[str]]:
+    """Benchmarks whose p50 latency or throughput got worse than ``tolerance`` allows."""
+    regressions = {}
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        problems = []
+        if previous["p50_ms"] > 0 and current["p50_ms"] > previous["p50_ms"] * (1 + tolerance):
+            problems.append(f"p50 {previous['p50_ms']:.2f} -> {current['p50_ms']:.2f} ms")
+        if current["ops_per_sec"] < previous["ops_per_sec"] * (1 - tolerance):
+            problems.append(f"throughput {previous['ops_per_sec']:.1f} -> {current['ops_per_sec']:.1f}/s")
+        if current["errors"] > previous.get("errors", 0):
+            problems.append(f"errors {previous.get('errors', 0)} -> {current['errors']}")
+        if problems:
+            regressions[name] = problems
+    return regressions
+
+def print_report(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                 regressions: Dict[str, List[str]]) -> None:
+    width = max(len(name) for name in results)
+    print(f"{'benchmark':<{width}} {'n':>5} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'vs base':>8}")
+    for name, r in results.items():
+        change = ""
+        if baseline.get(name, {}).get("p50_ms"):
+            change = f"{(r['p50_ms'] / baseline[name]['p50_ms'] - 1) * 100:+.0f}%"
+        flag = "  REGRESSION" if name in regressions else ""
+        errors = f"  ({r['errors']} errors)" if r["errors"] else ""
+        print(f"{name:<{width}} {r['n']:>5} {r['ops_per_sec']:>9.1f} {r['p50_ms']:>9.2f} "
+              f"{r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {change:>8}{flag}{errors}")
+    for name, problems in regressions.items():
+        print(f"regression: {name}: {'; '.join(problems)}")
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", default="micro,load,tfidf", help="Comma-separated suites to run")
+    parser.add_argument("--quick", action="store_true", help="Fewer repetitions and users, for a smoke run")
+    parser.add_argument("--repeat", type=int, default=20, help="Repetitions per micro-benchmark")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--docs-per-user", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=5, help="List and download passes per user")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent in-process clients")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4,
+                        help="Password hashing cost; lower than production so auth doesn't dominate")
+    parser.add_argument("--tfidf-docs", type=int, default=2000, help="Documents in the ranked corpus")
+    parser.add_argument("--tfidf-words", type=int, default=500, help="Approximate words per ranked document")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before flagging, e.g. 0.25")
+    parser.add_argument("--output", help="Also write this run's results to a JSON file")
+    args = parser.parse_args()
+    if args.quick:
+        args.repeat, args.users, args.docs_per_user, args.rounds = 3, 4, 2, 2
+        args.tfidf_docs = 200
+    suites = {suite.strip() for suite in args.only.split(",") if suite.strip()}
+    warnings.simplefilter("ignore")
+
+    pdf = shutil.which("pdftotext") is not None
+    if not pdf:
+        print("pdftotext not found: skipping PDF fixtures", file=sys.stderr)
+    config = {
+        "suites": sorted(suites), "repeat": args.repeat, "users": args.users, "docs_per_user": args.docs_per_user,
+        "rounds": args.rounds, "concurrency": args.concurrency, "bcrypt_rounds": args.bcrypt_rounds,
+        "tfidf_docs": args.tfidf_docs, "tfidf_words": args.tfidf_words, "seed": args.seed, "pdf": pdf,
+    }
+
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ.update({
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+            "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+            "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+            "REMINDERS_ENABLED": "false",
+            "JOB_POLL_INTERVAL": "0.05",
+            "CREATE_SCHEMA": "true",
+        })
+        documents = fixtures.write_documents(os.path.join(workdir, "fixtures"), args.seed)
+        if "micro" in suites:
+            results.update(run_micro(workdir, documents, args.repeat, pdf))
+        if "load" in suites:
+            results.update(run_load(documents, args.users, args.docs_per_user, args.rounds,
+                                    args.concurrency, pdf, args.seed))
+        if "tfidf" in suites:
+            results.update(run_tfidf(workdir, args.tfidf_docs, args.tfidf_words, args.repeat, args.seed))
+
+    run = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": config,
+        "results": results,
+    }
+
+    baseline: Dict[str, Any] = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print("note: baseline was recorded with different options; comparisons may not be meaningful",
+                  file=sys.stderr)
+    regressions = compare(results, baseline.get("results", {}), args.tolerance)
+    print_report(results, baseline.get("results", {}), regressions)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+    elif regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by entry count and weight.
+
+    ``weigh`` maps a value to its cost (e.g. characters of text); entries
+    are evicted oldest-first until both ``max_entries`` and ``max_weight``
+    are respected. Values heavier than ``max_weight`` are never cached.
+    """
+
+    def __init__(self, max_entries: int, max_weight: Optional[int] = None,
+                 weigh: Callable[[Any], int] = lambda value: 1):
+        self.max_entries = max_entries
+        self.max_weight = max_weight
+        self.weigh = weigh
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._weights: Dict[Hashable, int] = {}
+        self._total_weight = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for ``key``, marking it recently used."""
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return self._data[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Cache ``value`` under ``key``, evicting old entries as needed."""
+        weight = self.weigh(value)
+        if self.max_entries <= 0 or (self.max_weight is not None and weight > self.max_weight):
+            self.pop(key)
+            return
+        with self._lock:
+            self._discard(key)
+            self._data[key] = value
+            self._weights[key] = weight
+            self._total_weight += weight
+            while len(self._data) > self.max_entries or (
+                self.max_weight is not None and self._total_weight > self.max_weight
+            ):
+                self._discard(next(iter(self._data)))
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove ``key`` from the cache, returning its value if present."""
+        with self._lock:
+            value = self._data.get(key, default)
+            self._discard(key)
+            return value
+
+    def discard_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Remove every entry for which ``predicate(key, value)`` is true."""
+        with self._lock:
+            doomed = [key for key, value in self._data.items() if predicate(key, value)]
+            for key in doomed:
+                self._discard(key)
+            return len(doomed)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._data.clear()
+            self._weights.clear()
+            self._total_weight = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Size and hit-rate counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "weight": self._total_weight,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _discard(self, key: Hashable) -> None:
+        if key in self._data:
+            del self._data[key]
+            self._total_weight -= self._weights.pop(key)
+
+class TTLCache(LRUCache):
+    """LRU cache whose entries also expire after a per-entry time-to-live."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        super().__init__(max_entries)
+        self.ttl = ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    self._discard(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Cache ``value`` for ``ttl`` seconds (default: the cache TTL)."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            self.pop(key)
+            return
+        super().set(key, (time.monotonic() + ttl, value))
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = super().pop(key)
+        return default if entry is None else entry[1]
+
+    def discard_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        return super().discard_where(lambda key, entry: predicate(key, entry[1]))
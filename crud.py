@@ -1,6 +1,12 @@
+from sqlalchemy import bindparam, false, func, insert, or_, true, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-import models, schemas, security
+import models, schemas, security, pagination
+from services import reminders, search_index, storage_service, tfidf
 from fastapi import HTTPException, status
+from datetime import datetime, timedelta
+from typing import List, Optional
+from collections import Counter
 import os
 import json
 
@@ -12,12 +18,14 @@ def get_user_by_email(db: Session, email: str):
     """Get a user by email."""
     return db.query(models.User).filter(models.User.email == email).first()
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    """Get a list of users."""
-    return db.query(models.User).offset(skip).limit(limit).all()
+def get_users(db: Session, after_id: int = 0, limit: int = 100):
+    """Get a page of users ordered by ID, starting after ``after_id``."""
+    return db.query(models.User).filter(
+        models.User.id > after_id
+    ).order_by(models.User.id).limit(limit).all()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    """Create a new user."""
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str = None):
+    """Create a new user, hashing the password unless a hash is given."""
     # Check if user already exists
     db_user = get_user_by_email(db, email=user.email)
     if db_user:
@@ -27,7 +35,8 @@ def create_user(db: Session, user: schemas.UserCreate):
         )
     
     # Create new user with hashed password
-    hashed_password = security.get_password_hash(user.password)
+    if hashed_password is None:
+        hashed_password = security.get_password_hash(user.password)
     db_user = models.User(
         email=user.email,
         hashed_password=hashed_password
@@ -40,22 +49,58 @@ def create_user(db: Session, user: schemas.UserCreate):
     
     return db_user
 
+def set_user_active(db: Session, user_id: int, is_active: bool):
+    """Activate or deactivate a user (cached logins are invalidated)."""
+    db_user = get_user(db, user_id=user_id)
+    if db_user:
+        db_user.is_active = is_active
+        db.commit()
+        db.refresh(db_user)
+    return db_user
+
 # Document CRUD operations
 def get_document(db: Session, document_id: int):
     """Get a document by ID."""
     return db.query(models.Document).filter(models.Document.id == document_id).first()
 
-def get_documents(db: Session, user_id: int, skip: int = 0, limit: int = 100):
-    """Get documents for a user."""
-    return db.query(models.Document).filter(
-        models.Document.user_id == user_id
-    ).offset(skip).limit(limit).all()
+def get_user_documents(db: Session, user_id: int, document_ids: List[int] = None):
+    """Get documents owned by a user, optionally restricted to the given IDs."""
+    query = db.query(models.Document).filter(models.Document.user_id == user_id)
+    if document_ids is not None:
+        query = query.filter(models.Document.id.in_(document_ids))
+    return query.order_by(models.Document.id).all()
+
+# Columns returned by list queries; match schemas.Document
+DOCUMENT_LIST_COLUMNS = (
+    models.Document.id, models.Document.title, models.Document.description,
+    models.Document.filename, models.Document.file_path, models.Document.content_type,
+    models.Document.size_bytes, models.Document.content_hash, models.Document.created_at,
+    models.Document.user_id,
+)
+
+def get_documents(db: Session, user_id: int, cursor: str = None, limit: int = 100):
+    """
+    Get a page of documents for a user, oldest first.
+    
+    Returns a tuple of (rows of the list columns, next cursor or None on
+    the last page); plain rows skip the ORM identity map.
+    """
+    limit = pagination.clamp_limit(limit)
+    rows = db.query(*DOCUMENT_LIST_COLUMNS).filter(
+        models.Document.user_id == user_id,
+        *pagination.after_cursor(models.Document, cursor)
+    ).order_by(*pagination.page_order(models.Document)).limit(limit + 1).all()
+    return pagination.make_page(rows, limit)
 
-def create_document(db: Session, document: schemas.DocumentCreate, user_id: int, file_path: str):
+def create_document(db: Session, document: schemas.DocumentCreate, user_id: int, file_path: str,
+                    filename: str = None, size_bytes: int = None, content_hash: str = None):
     """Create a new document for a user."""
     db_document = models.Document(
         **document.dict(),
+        filename=filename,
         file_path=file_path,
+        size_bytes=size_bytes,
+        content_hash=content_hash,
         user_id=user_id
     )
     db.add(db_document)
@@ -63,22 +108,246 @@ def create_document(db: Session, document: schemas.DocumentCreate, user_id: int,
     db.refresh(db_document)
     return db_document
 
-def delete_document(db: Session, document_id: int):
-    """Delete a document."""
-    db_document = get_document(db, document_id=document_id)
-    if db_document:
-        db.delete(db_document)
+def delete_documents(db: Session, user_id: int, document_ids: List[int] = None):
+    """
+    Delete a user's documents with set-based statements, in one transaction.
+
+    Analyses, jobs and versions of the documents go with them, as do blob
+    references and corpus statistics; blobs left unreferenced are deleted
+    along with their chunks.
+    Files are not touched: hand the returned paths to the garbage collector.
+
+    Args:
+        db: Database session
+        user_id: Owner of the documents
+        document_ids: Documents to delete; None deletes all of the user's
+
+    Returns:
+        Tuple of (number of documents deleted, paths of upload files that
+        are no longer referenced)
+    """
+    scope = [models.Document.user_id == user_id]
+    if document_ids is not None:
+        if not document_ids:
+            return 0, []
+        scope.append(models.Document.id.in_(set(document_ids)))
+    targets = db.query(models.Document.id).filter(*scope).scalar_subquery()
+
+    # References to drop per blob (current contents and older versions),
+    # and files owned by pre-blob-store documents
+    version = models.DocumentVersion
+    released = Counter(dict(db.query(models.Document.content_hash, func.count()).filter(
+        *scope, models.Document.content_hash.isnot(None)
+    ).group_by(models.Document.content_hash).all()))
+    released.update(dict(db.query(version.content_hash, func.count()).filter(
+        version.document_id.in_(targets), version.content_hash.isnot(None)
+    ).group_by(version.content_hash).all()))
+    released = list(released.items())
+    orphaned = [path for (path,) in db.query(models.Document.file_path).filter(
+        *scope, models.Document.content_hash.is_(None), models.Document.file_path.isnot(None)
+    )]
+    orphaned.extend(path for (path,) in db.query(version.file_path).filter(
+        version.document_id.in_(targets), version.content_hash.is_(None), version.file_path.isnot(None)
+    ))
+
+    tfidf.uncount_documents(db, targets)
+    db.query(models.DocumentAnalysis).filter(
+        models.DocumentAnalysis.document_id.in_(targets)
+    ).delete(synchronize_session=False)
+    db.query(models.Job).filter(models.Job.document_id.in_(targets)).delete(synchronize_session=False)
+    db.query(version).filter(version.document_id.in_(targets)).delete(synchronize_session=False)
+    deleted = db.query(models.Document).filter(*scope).delete(synchronize_session=False)
+
+    if released:
+        blobs = models.Blob.__table__
+        db.execute(
+            update(blobs).where(blobs.c.content_hash == bindparam("hash"))
+            .values(ref_count=blobs.c.ref_count - bindparam("count")),
+            [{"hash": content_hash, "count": count} for content_hash, count in released]
+        )
+        hashes = [content_hash for content_hash, _ in released]
+        for start in range(0, len(hashes), 500):
+            dead = db.query(models.Blob.content_hash, models.Blob.file_path).filter(
+                models.Blob.content_hash.in_(hashes[start:start + 500]), models.Blob.ref_count <= 0
+            ).all()
+            if dead:
+                dead_hashes = [content_hash for content_hash, _ in dead]
+                db.query(models.Blob).filter(
+                    models.Blob.content_hash.in_(dead_hashes)
+                ).delete(synchronize_session=False)
+                remove_blob_chunks(db, dead_hashes)
+                orphaned.extend(path for _, path in dead if path)
+    db.commit()
+    return deleted, orphaned
+
+# Blob store operations
+def acquire_blob(db: Session, content_hash: str, file_path: str, size_bytes: int):
+    """
+    Take a reference on a blob, registering it if it is new.
+
+    Returns:
+        Tuple of (blob, created) where created is True for new content
+    """
+    updated = db.query(models.Blob).filter(
+        models.Blob.content_hash == content_hash
+    ).update({models.Blob.ref_count: models.Blob.ref_count + 1}, synchronize_session=False)
+    created = False
+    if not updated:
+        db.add(models.Blob(
+            content_hash=content_hash,
+            file_path=file_path,
+            size_bytes=size_bytes,
+            ref_count=1
+        ))
+        try:
+            db.commit()
+            created = True
+        except IntegrityError:
+            # Another upload registered the same content first
+            db.rollback()
+            return acquire_blob(db, content_hash, file_path, size_bytes)
+    else:
         db.commit()
-    return db_document
+    return db.get(models.Blob, content_hash), created
+
+def release_blob(db: Session, content_hash: str):
+    """
+    Drop a reference on a blob, deleting it once unreferenced.
+
+    The file is removed before the caller commits so a concurrent
+    ``acquire_blob`` for the same content (which waits on this row)
+    always re-creates the file afterwards. Does not commit.
+    """
+    db.query(models.Blob).filter(
+        models.Blob.content_hash == content_hash
+    ).update({models.Blob.ref_count: models.Blob.ref_count - 1}, synchronize_session=False)
+    db_blob = db.get(models.Blob, content_hash, populate_existing=True)
+    if db_blob is not None and db_blob.ref_count <= 0:
+        db.delete(db_blob)
+        remove_blob_chunks(db, [content_hash])
+        db.flush()
+        storage_service.remove_blob(db_blob.file_path)
+    return db_blob
+
+def remove_blob_chunks(db: Session, content_hashes: List[str]):
+    """
+    Forget the chunks and vocabulary of deleted blobs.
+
+    Chunks no other blob contains are dropped from the search index along
+    with their analyzer states. Does not commit.
+    """
+    db.query(models.BlobVocabulary).filter(
+        models.BlobVocabulary.content_hash.in_(content_hashes)
+    ).delete(synchronize_session=False)
+    chunk = models.BlobChunk
+    chunk_hashes = {chunk_hash for (chunk_hash,) in db.query(chunk.chunk_hash).filter(
+        chunk.content_hash.in_(content_hashes)
+    ).distinct()}
+    db.query(chunk).filter(chunk.content_hash.in_(content_hashes)).delete(synchronize_session=False)
+    chunk_hashes = list(chunk_hashes)
+    for start in range(0, len(chunk_hashes), 500):
+        batch = chunk_hashes[start:start + 500]
+        shared = {chunk_hash for (chunk_hash,) in db.query(chunk.chunk_hash).filter(
+            chunk.chunk_hash.in_(batch)
+        ).distinct()}
+        dead = [chunk_hash for chunk_hash in batch if chunk_hash not in shared]
+        if dead:
+            search_index.remove_chunks(db, dead)
+            db.query(models.ChunkAnalysis).filter(
+                models.ChunkAnalysis.chunk_hash.in_(dead)
+            ).delete(synchronize_session=False)
+
+# Document version operations
+def create_document_version(db: Session, document: models.Document, file_path: str, filename: str = None,
+                            content_type: str = None, size_bytes: int = None, content_hash: str = None):
+    """
+    Replace a document's content, keeping the current one as a version.
+
+    The document's reference on its current blob moves to the version
+    row; the caller has already acquired the new blob.
+    """
+    count = db.query(func.count(models.DocumentVersion.id)).filter(
+        models.DocumentVersion.document_id == document.id
+    ).scalar()
+    db.add(models.DocumentVersion(
+        document_id=document.id,
+        version=count + 1,
+        filename=document.filename,
+        file_path=document.file_path,
+        content_type=document.content_type,
+        size_bytes=document.size_bytes,
+        content_hash=document.content_hash,
+        superseded_at=datetime.utcnow()
+    ))
+    document.filename = filename
+    document.file_path = file_path
+    document.content_type = content_type
+    document.size_bytes = size_bytes
+    document.content_hash = content_hash
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another version was uploaded concurrently; stack this one on top
+        db.rollback()
+        db.refresh(document)
+        return create_document_version(db, document, file_path, filename, content_type, size_bytes, content_hash)
+    db.refresh(document)
+    return document
+
+def get_document_versions(db: Session, document_id: int):
+    """Get the superseded versions of a document, oldest first."""
+    return db.query(models.DocumentVersion).filter(
+        models.DocumentVersion.document_id == document_id
+    ).order_by(models.DocumentVersion.version).all()
 
-def create_document_analysis(db: Session, analysis: schemas.DocumentAnalysisCreate):
+# Chunk analysis operations
+def get_chunk_states(db: Session, chunk_hashes: List[str], analyzer_version: str):
+    """Get stored analyzer states of chunks, as chunk hash -> state."""
+    chunk_hashes = list(chunk_hashes)
+    states = {}
+    for start in range(0, len(chunk_hashes), 500):
+        states.update(
+            (chunk_hash, json.loads(state))
+            for chunk_hash, state in db.query(models.ChunkAnalysis.chunk_hash, models.ChunkAnalysis.state).filter(
+                models.ChunkAnalysis.chunk_hash.in_(chunk_hashes[start:start + 500]),
+                models.ChunkAnalysis.analyzer_version == analyzer_version
+            )
+        )
+    return states
+
+def save_chunk_states(db: Session, states: dict, analyzer_version: str):
+    """
+    Store analyzer states of chunks (chunk hash -> state) and commit.
+
+    States already stored, e.g. by a concurrent analysis of the same
+    chunks, are kept: a chunk's state only depends on its text.
+    """
+    existing = get_chunk_states(db, states, analyzer_version)
+    rows = [
+        {"chunk_hash": chunk_hash, "analyzer_version": analyzer_version, "state": json.dumps(state)}
+        for chunk_hash, state in states.items() if chunk_hash not in existing
+    ]
+    if not rows:
+        return 0
+    try:
+        db.execute(insert(models.ChunkAnalysis), rows)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return save_chunk_states(db, states, analyzer_version)
+    return len(rows)
+
+def create_document_analysis(db: Session, analysis: schemas.DocumentAnalysisCreate,
+                             content_hash: str = None, analyzer_version: str = None):
     """Create a document analysis."""
     db_analysis = models.DocumentAnalysis(
         document_id=analysis.document_id,
         summary=analysis.summary,
         # Store key_points as JSON string
         key_points=json.dumps(analysis.key_points),
-        sentiment=analysis.sentiment
+        sentiment=analysis.sentiment,
+        content_hash=content_hash,
+        analyzer_version=analyzer_version
     )
     db.add(db_analysis)
     db.commit()
@@ -86,17 +355,210 @@ def create_document_analysis(db: Session, analysis: schemas.DocumentAnalysisCrea
     return db_analysis
 
 def get_document_analysis(db: Session, document_id: int):
-    """Get analysis for a document."""
+    """Get the most recent analysis for a document."""
     return db.query(models.DocumentAnalysis).filter(
         models.DocumentAnalysis.document_id == document_id
-    ).first()
+    ).order_by(models.DocumentAnalysis.id.desc()).first()
+
+def _owned_by(query, user_id: Optional[int]):
+    """Limit an analysis query to the documents of ``user_id`` (when given)."""
+    if user_id is None:
+        return query
+    return query.join(models.Document, models.Document.id == models.DocumentAnalysis.document_id).filter(
+        models.Document.user_id == user_id
+    )
+
+def get_cached_analysis(db: Session, document_id: int, content_hash: str, analyzer_version: str,
+                        user_id: Optional[int] = None):
+    """
+    Get an existing analysis of the given content by the given analyzer.
+    
+    Prefers this document's own analysis, then falls back to one made for
+    another document with identical content (see copy_document_analysis).
+    Pass ``user_id`` for analyzers whose results depend on the owner's
+    other documents, so only that user's analyses are reused.
+    """
+    key = (
+        models.DocumentAnalysis.content_hash == content_hash,
+        models.DocumentAnalysis.analyzer_version == analyzer_version,
+    )
+    db_analysis = db.query(models.DocumentAnalysis).filter(
+        models.DocumentAnalysis.document_id == document_id, *key
+    ).order_by(models.DocumentAnalysis.id.desc()).first()
+    if db_analysis is not None:
+        return db_analysis
+    return _owned_by(db.query(models.DocumentAnalysis), user_id).filter(*key).first()
+
+def copy_document_analysis(db: Session, source: models.DocumentAnalysis, document_id: int):
+    """Store a copy of an analysis for another document with the same content."""
+    db_analysis = models.DocumentAnalysis(
+        document_id=document_id,
+        summary=source.summary,
+        key_points=source.key_points,
+        sentiment=source.sentiment,
+        content_hash=source.content_hash,
+        analyzer_version=source.analyzer_version
+    )
+    db.add(db_analysis)
+    db.commit()
+    db.refresh(db_analysis)
+    return db_analysis
+
+def save_document_analysis(db: Session, analysis: schemas.DocumentAnalysisCreate,
+                           content_hash: str, analyzer_version: str):
+    """Store an analysis, replacing any earlier one with the same cache key."""
+    db_analysis = db.query(models.DocumentAnalysis).filter(
+        models.DocumentAnalysis.document_id == analysis.document_id,
+        models.DocumentAnalysis.content_hash == content_hash,
+        models.DocumentAnalysis.analyzer_version == analyzer_version
+    ).order_by(models.DocumentAnalysis.id.desc()).first()
+    if db_analysis is None:
+        return create_document_analysis(
+            db, analysis, content_hash=content_hash, analyzer_version=analyzer_version
+        )
+    db_analysis.summary = analysis.summary
+    db_analysis.key_points_list = analysis.key_points
+    db_analysis.sentiment = analysis.sentiment
+    db_analysis.created_at = datetime.utcnow()
+    db.commit()
+    db.refresh(db_analysis)
+    return db_analysis
+
+def get_analyses_by_content(db: Session, content_hashes: List[str], analyzer_version: str,
+                            user_id: Optional[int] = None):
+    """Get existing analyses for any of the given contents (of ``user_id``'s documents, if given), newest first."""
+    return _owned_by(db.query(models.DocumentAnalysis), user_id).filter(
+        models.DocumentAnalysis.content_hash.in_(content_hashes),
+        models.DocumentAnalysis.analyzer_version == analyzer_version
+    ).order_by(models.DocumentAnalysis.id.desc()).all()
+
+def bulk_save_document_analyses(db: Session, analyses: List[dict], analyzer_version: str):
+    """
+    Store many analyses in a single transaction.
+    
+    Earlier analyses of the same documents by the same analyzer are
+    replaced. Each dict carries the DocumentAnalysis columns, with
+    key_points as a list.
+    """
+    if not analyses:
+        return 0
+    db.query(models.DocumentAnalysis).filter(
+        models.DocumentAnalysis.document_id.in_([a["document_id"] for a in analyses]),
+        models.DocumentAnalysis.analyzer_version == analyzer_version
+    ).delete(synchronize_session=False)
+    now = datetime.utcnow()
+    db.execute(insert(models.DocumentAnalysis), [
+        {
+            **analysis,
+            "key_points": json.dumps(analysis["key_points"]),
+            "analyzer_version": analyzer_version,
+            "created_at": now,
+        }
+        for analysis in analyses
+    ])
+    db.commit()
+    return len(analyses)
+
+# Job queue operations
+def create_job(db: Session, document_id: int, kind: str, max_attempts: int = 3):
+    """Enqueue a background job for a document."""
+    db_job = models.Job(
+        document_id=document_id,
+        kind=kind,
+        status="queued",
+        max_attempts=max_attempts
+    )
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+def get_jobs(db: Session, document_id: int):
+    """Get all jobs for a document, oldest first."""
+    return db.query(models.Job).filter(
+        models.Job.document_id == document_id
+    ).order_by(models.Job.id).all()
+
+def get_runnable_jobs(db: Session, limit: int):
+    """Get queued jobs whose retry delay (if any) has elapsed."""
+    now = datetime.utcnow()
+    return db.query(models.Job).filter(
+        models.Job.status == "queued",
+        or_(models.Job.run_after == None, models.Job.run_after <= now)
+    ).order_by(models.Job.id).limit(limit).all()
+
+def claim_job(db: Session, job_id: int) -> bool:
+    """
+    Atomically move a queued job to running.
+
+    Returns False if another worker claimed the job first.
+    """
+    claimed = db.query(models.Job).filter(
+        models.Job.id == job_id,
+        models.Job.status == "queued"
+    ).update({
+        models.Job.status: "running",
+        models.Job.attempts: models.Job.attempts + 1,
+        models.Job.started_at: datetime.utcnow(),
+        models.Job.error: None
+    }, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+def complete_job(db: Session, job_id: int):
+    """Mark a running job as succeeded."""
+    db.query(models.Job).filter(models.Job.id == job_id).update({
+        models.Job.status: "succeeded",
+        models.Job.finished_at: datetime.utcnow()
+    }, synchronize_session=False)
+    db.commit()
+    return db.get(models.Job, job_id)
+
+def fail_job(db: Session, job_id: int, error: str, retry_delay: float = 0):
+    """Record a job failure, re-queueing it if it has attempts left."""
+    db_job = db.query(models.Job).filter(models.Job.id == job_id).first()
+    if db_job is None:
+        return None
+    db_job.error = error
+    if db_job.attempts < db_job.max_attempts:
+        db_job.status = "queued"
+        db_job.run_after = datetime.utcnow() + timedelta(seconds=retry_delay * db_job.attempts)
+    else:
+        db_job.status = "failed"
+        db_job.finished_at = datetime.utcnow()
+    db.commit()
+    return db_job
+
+def requeue_stale_jobs(db: Session, started_before: datetime) -> int:
+    """Re-queue running jobs abandoned by a crashed worker."""
+    requeued = db.query(models.Job).filter(
+        models.Job.status == "running",
+        models.Job.started_at < started_before
+    ).update({models.Job.status: "queued"}, synchronize_session=False)
+    db.commit()
+    return requeued
 
 # Program CRUD operations
-def get_programs(db: Session, user_id: int, skip: int = 0, limit: int = 100):
-    """Get programs for a user."""
-    return db.query(models.Program).filter(
-        models.Program.user_id == user_id
-    ).offset(skip).limit(limit).all()
+# Columns returned by list queries; match schemas.Program
+PROGRAM_LIST_COLUMNS = (
+    models.Program.id, models.Program.name, models.Program.university, models.Program.description,
+    models.Program.deadline, models.Program.is_shortlisted, models.Program.created_at,
+    models.Program.user_id,
+)
+
+def get_programs(db: Session, user_id: int, cursor: str = None, limit: int = 100):
+    """
+    Get a page of programs for a user, oldest first.
+    
+    Returns a tuple of (rows of the list columns, next cursor or None on
+    the last page); plain rows skip the ORM identity map.
+    """
+    limit = pagination.clamp_limit(limit)
+    rows = db.query(*PROGRAM_LIST_COLUMNS).filter(
+        models.Program.user_id == user_id,
+        *pagination.after_cursor(models.Program, cursor)
+    ).order_by(*pagination.page_order(models.Program)).limit(limit + 1).all()
+    return pagination.make_page(rows, limit)
 
 def create_program(db: Session, program: schemas.ProgramCreate, user_id: int):
     """Create a new program for a user."""
@@ -109,20 +571,205 @@ def create_program(db: Session, program: schemas.ProgramCreate, user_id: int):
     db.refresh(db_program)
     return db_program
 
+def bulk_create_programs(db: Session, rows: List[dict]) -> int:
+    """Insert many programs in one executemany transaction."""
+    if not rows:
+        return 0
+    # Core inserts bypass mapper events, so fetch the new IDs of programs
+    # that need deadline reminders and register them by hand
+    tracked = [row for row in rows if row.get("is_shortlisted") and row.get("deadline")]
+    untracked = [row for row in rows if not (row.get("is_shortlisted") and row.get("deadline"))]
+    if untracked:
+        db.execute(insert(models.Program), untracked)
+    if tracked:
+        result = db.execute(
+            insert(models.Program).returning(models.Program.id, sort_by_parameter_order=True), tracked
+        )
+        for row, program_id in zip(tracked, result.scalars()):
+            reminders.note_program(
+                db, program_id, row["user_id"], row["name"], row["university"], row["deadline"], True
+            )
+    db.commit()
+    return len(rows)
+
+def get_program(db: Session, program_id: int):
+    """Get a program by ID."""
+    return db.query(models.Program).filter(models.Program.id == program_id).first()
+
+def update_program(db: Session, program_id: int, program: schemas.ProgramUpdate):
+    """Apply the fields set in ``program`` to an existing program."""
+    db_program = get_program(db, program_id=program_id)
+    if db_program:
+        for field, value in program.dict(exclude_unset=True).items():
+            setattr(db_program, field, value)
+        db.commit()
+        db.refresh(db_program)
+    return db_program
+
+def delete_program(db: Session, program_id: int):
+    """Delete a program."""
+    db_program = get_program(db, program_id=program_id)
+    if db_program:
+        db.delete(db_program)
+        db.commit()
+    return db_program
+
+def get_upcoming_deadlines(db: Session, user_id: int, until: datetime, limit: int = 100,
+                           shortlisted_only: bool = False):
+    """A user's programs with deadlines between now and ``until``, soonest first."""
+    query = db.query(models.Program).filter(
+        models.Program.deadline >= datetime.utcnow(),
+        models.Program.deadline < until,
+        models.Program.user_id == user_id
+    )
+    if shortlisted_only:
+        query = query.filter(models.Program.is_shortlisted.is_(True))
+    return query.order_by(models.Program.deadline, models.Program.id).limit(limit).all()
+
+def get_global_upcoming_deadlines(db: Session, until: datetime, limit: int = 100):
+    """
+    Upcoming deadlines across all users, aggregated per program.
+    
+    Only (university, name, deadline) and how many users track it are
+    returned, never anyone's own rows.
+    """
+    tracked_by = func.count(func.distinct(models.Program.user_id)).label("users")
+    return db.query(
+        models.Program.university, models.Program.name, models.Program.deadline, tracked_by
+    ).filter(
+        models.Program.deadline >= datetime.utcnow(),
+        models.Program.deadline < until
+    ).group_by(
+        models.Program.deadline, models.Program.university, models.Program.name
+    ).order_by(models.Program.deadline, tracked_by.desc()).limit(limit).all()
+
 # Email CRUD operations
-def get_emails(db: Session, user_id: int, skip: int = 0, limit: int = 100):
-    """Get emails for a user."""
-    return db.query(models.Email).filter(
-        models.Email.user_id == user_id
-    ).offset(skip).limit(limit).all()
+def get_email(db: Session, email_id: int):
+    """Get an email by ID."""
+    return db.query(models.Email).filter(models.Email.id == email_id).first()
+
+# Columns returned by list queries; match schemas.Email
+EMAIL_LIST_COLUMNS = (
+    models.Email.id, models.Email.subject, models.Email.sender, models.Email.recipient,
+    models.Email.content, models.Email.is_read, models.Email.created_at, models.Email.user_id,
+)
+
+def get_emails(db: Session, user_id: int, cursor: str = None, limit: int = 100, unread_only: bool = False):
+    """
+    Get a page of emails for a user, oldest first.
+    
+    With ``unread_only`` the page is served from the partial unread index.
+    Returns a tuple of (rows of the list columns, next cursor or None on
+    the last page); plain rows skip the ORM identity map.
+    """
+    limit = pagination.clamp_limit(limit)
+    query = db.query(*EMAIL_LIST_COLUMNS).filter(
+        models.Email.user_id == user_id,
+        *pagination.after_cursor(models.Email, cursor)
+    )
+    if unread_only:
+        query = query.filter(models.Email.is_read == false())
+    rows = query.order_by(*pagination.page_order(models.Email)).limit(limit + 1).all()
+    return pagination.make_page(rows, limit)
 
 def create_email(db: Session, email: schemas.EmailCreate, user_id: int):
     """Create a new email for a user."""
+    ensure_mailbox_counter(db, user_id)
     db_email = models.Email(
         **email.dict(),
         user_id=user_id
     )
     db.add(db_email)
+    bump_mailbox_counter(db, user_id, total=1, unread=0 if email.is_read else 1)
     db.commit()
     db.refresh(db_email)
     return db_email
+
+def bulk_create_emails(db: Session, rows: List[dict]) -> int:
+    """Insert many emails in one executemany transaction."""
+    if not rows:
+        return 0
+    counts = {}
+    for row in rows:
+        total, unread = counts.get(row["user_id"], (0, 0))
+        counts[row["user_id"]] = (total + 1, unread + (0 if row.get("is_read") else 1))
+    for user_id in counts:
+        ensure_mailbox_counter(db, user_id)
+    db.execute(insert(models.Email), rows)
+    for user_id, (total, unread) in counts.items():
+        bump_mailbox_counter(db, user_id, total=total, unread=unread)
+    db.commit()
+    return len(rows)
+
+def mark_email_read(db: Session, email_id: int, user_id: int, is_read: bool = True):
+    """Set the read flag on one of a user's emails, keeping the counters in step."""
+    mark_emails_read(db, user_id, email_ids=[email_id], is_read=is_read)
+    return db.query(models.Email).filter(
+        models.Email.id == email_id, models.Email.user_id == user_id
+    ).first()
+
+def mark_emails_read(db: Session, user_id: int, email_ids: List[int] = None, is_read: bool = True) -> int:
+    """
+    Set the read flag on many of a user's emails (all of them if no IDs given).
+    
+    Only rows whose flag actually changes are updated and counted, so the
+    unread counter moves by exactly that amount. Returns that number.
+    """
+    ensure_mailbox_counter(db, user_id)
+    query = db.query(models.Email).filter(
+        models.Email.user_id == user_id, models.Email.is_read == (false() if is_read else true())
+    )
+    if email_ids is not None:
+        query = query.filter(models.Email.id.in_(email_ids))
+    changed = query.update({models.Email.is_read: is_read}, synchronize_session=False)
+    if changed:
+        bump_mailbox_counter(db, user_id, unread=-changed if is_read else changed)
+    db.commit()
+    return changed
+
+# Mailbox counter operations
+def count_emails(db: Session, user_id: int):
+    """Count a user's (total, unread) emails from the emails table."""
+    total = db.query(func.count(models.Email.id)).filter(models.Email.user_id == user_id).scalar()
+    unread = db.query(func.count(models.Email.id)).filter(
+        models.Email.user_id == user_id, models.Email.is_read == false()
+    ).scalar()
+    return total, unread
+
+def get_mailbox_counts(db: Session, user_id: int):
+    """
+    A user's (total, unread) email counts.
+    
+    A primary-key lookup once the user's counter row exists; users with no
+    email writes since counters were introduced are counted directly.
+    """
+    counter = db.get(models.MailboxCounter, user_id)
+    if counter is None:
+        return count_emails(db, user_id)
+    return counter.total, counter.unread
+
+def ensure_mailbox_counter(db: Session, user_id: int) -> None:
+    """
+    Create the user's counter row from the emails table if it is missing.
+    
+    Call before changing any email in the transaction, so the initial
+    counts do not already include the change. Does not commit.
+    """
+    if db.get(models.MailboxCounter, user_id) is not None:
+        return
+    total, unread = count_emails(db, user_id)
+    try:
+        with db.begin_nested():
+            db.add(models.MailboxCounter(user_id=user_id, total=total, unread=unread))
+    except IntegrityError:
+        # Another transaction created it first
+        pass
+
+def bump_mailbox_counter(db: Session, user_id: int, total: int = 0, unread: int = 0) -> None:
+    """Adjust a user's counters in the current transaction. Does not commit."""
+    if not (total or unread):
+        return
+    db.query(models.MailboxCounter).filter(models.MailboxCounter.user_id == user_id).update({
+        models.MailboxCounter.total: models.MailboxCounter.total + total,
+        models.MailboxCounter.unread: models.MailboxCounter.unread + unread,
+    }, synchronize_session=False)
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -10,13 +11,116 @@ load_dotenv()
 # Get DATABASE_URL from environment variable or use SQLite as default
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 
-# Create SQLAlchemy engine
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-)
+# Connection pool configuration
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", -1))  # Seconds; -1 disables
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+
+# Async driver -> sync driver for the same database. Using an async driver
+# in DATABASE_URL (e.g. postgresql+asyncpg://, sqlite+aiosqlite://) enables
+# the async data layer; sync code keeps using the matching sync driver.
+ASYNC_DRIVERS = {
+    "asyncpg": "psycopg2",
+    "aiosqlite": "pysqlite",
+    "aiomysql": "pymysql",
+    "asyncmy": "pymysql",
+}
+
+_url = make_url(DATABASE_URL)
+ASYNC_MODE = _url.get_driver_name() in ASYNC_DRIVERS
+if ASYNC_MODE:
+    SYNC_DATABASE_URL = _url.set(
+        drivername=f"{_url.get_backend_name()}+{ASYNC_DRIVERS[_url.get_driver_name()]}"
+    ).render_as_string(hide_password=False)
+else:
+    SYNC_DATABASE_URL = DATABASE_URL
+
+IS_SQLITE = _url.get_backend_name() == "sqlite"
+
+# SQLite production profile ("tuned") or stock SQLite behaviour ("default").
+# The tuned profile switches to WAL so readers never block on the writer,
+# funnels all writes through a single pooled connection and serves reads
+# from a separate query-only pool.
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "tuned")
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000))  # Milliseconds
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", -64000))  # Negative means KiB
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", 8))
+
+def engine_options() -> dict:
+    """Pool settings shared by the sync and async engines."""
+    options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    if not IS_SQLITE:
+        # SQLite picks its own pool class; sizing only applies to server databases
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+def _set_sqlite_pragmas(dbapi_connection, read_only: bool) -> None:
+    cursor = dbapi_connection.cursor()
+    if not read_only:
+        cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+    cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+def create_sqlite_engines(url: str, profile: str = SQLITE_PROFILE):
+    """
+    Build the (writer, reader) engines for a SQLite database.
+    
+    With the "tuned" profile on a file database the writer is a single
+    serialized connection and the reader a pool of query-only
+    connections, both configured through connect-time PRAGMAs. Otherwise
+    one stock engine serves both roles.
+    """
+    connect_args = {"check_same_thread": False}
+    memory = make_url(url).database in (None, "", ":memory:")
+    if profile != "tuned" or memory:
+        engine = create_engine(url, connect_args=connect_args, **engine_options())
+        return engine, engine
+    
+    writer = create_engine(
+        url, connect_args=connect_args, pool_size=1, max_overflow=0,
+        pool_timeout=DB_POOL_TIMEOUT, **engine_options()
+    )
+    reader = create_engine(
+        url, connect_args=connect_args, pool_size=SQLITE_READ_POOL_SIZE, max_overflow=0,
+        pool_timeout=DB_POOL_TIMEOUT, **engine_options()
+    )
+    event.listen(writer, "connect", lambda conn, record: _set_sqlite_pragmas(conn, read_only=False))
+    event.listen(reader, "connect", lambda conn, record: _set_sqlite_pragmas(conn, read_only=True))
+    return writer, reader
+
+# Create SQLAlchemy engines: "engine" for writes, "read_engine" for read-only
+# routes (the same engine unless the SQLite profile splits them)
+if IS_SQLITE:
+    engine, read_engine = create_sqlite_engines(SYNC_DATABASE_URL)
+else:
+    engine = create_engine(SYNC_DATABASE_URL, **engine_options())
+    read_engine = engine
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# Optional async engine, only when DATABASE_URL names an async driver
+async_engine = None
+AsyncSessionLocal = None
+if ASYNC_MODE:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(DATABASE_URL, **engine_options())
+    if IS_SQLITE and SQLITE_PROFILE == "tuned":
+        event.listen(
+            async_engine.sync_engine, "connect", lambda conn, record: _set_sqlite_pragmas(conn, read_only=False)
+        )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 # Create Base class
 Base = declarative_base()
@@ -28,3 +132,27 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency to get a read-only DB session for GET routes
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Dependency to get an async DB session (requires an async driver)
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database mode is disabled; use an async driver in DATABASE_URL")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Dependency for routes ported to async_crud: an async DB session in async
+# mode, otherwise None and the route runs the sync crud on the threadpool
+async def get_optional_async_db():
+    if AsyncSessionLocal is None:
+        yield None
+        return
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,19 +1,63 @@
-from fastapi import FastAPI, Depends
+# Imported first so the startup report covers every other import
+import startup
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 
 # Import database, models, and routers using absolute imports
 import models
 import database
-from routers import auth, documents
+import metrics
+import security
+from routers import auth, documents, emails, programs
+from services import batch_analysis, garbage_collector, job_queue, reminders, text_store
+
+startup.report.phase("imports")
 
-# Create database tables
-models.Base.metadata.create_all(bind=database.engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema DDL is a release step (python -m startup create-schema) unless asked for here
+    if startup.CREATE_SCHEMA:
+        startup.create_schema()
+        startup.report.phase("schema")
+    if startup.WARM_UP:
+        startup.warm_up()
+        startup.report.phase("warm_up")
+
+    # Background job worker (text extraction, etc.); jobs are claimed
+    # atomically, so every worker process can run one
+    job_queue.worker.start()
+    # Deadline reminder scheduler: one per host, or reminders would fire
+    # once per worker; it picks up other workers' program writes from the
+    # program_changes outbox
+    if reminders.REMINDERS_ENABLED and startup.hold_lock("reminders"):
+        reminders.scheduler.start()
+    # Orphaned upload files: every worker removes what its own deletes
+    # freed; one per host also sweeps UPLOAD_DIR
+    if garbage_collector.GC_ENABLED:
+        garbage_collector.collector.start(sweep=startup.hold_lock("gc"))
+    # Snapshot for the other workers' /metrics
+    publisher = asyncio.create_task(metrics.publish_forever()) if metrics.METRICS_DIR else None
+    startup.report.phase("background")
+    startup.report.mark_ready()
+    yield
+    if publisher is not None:
+        publisher.cancel()
+        metrics.unpublish()
+    job_queue.worker.stop()
+    batch_analysis.shutdown_pool()
+    reminders.scheduler.stop()
+    garbage_collector.collector.stop()
 
 app = FastAPI(
     title="Program Pal Pathfinder API",
     description="API for managing university program applications, documents, and insights.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # CORS Middleware
@@ -31,9 +75,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Time to first request, for the startup report
+app.add_middleware(startup.FirstRequestTimer)
+
+# Request metrics (outermost, so it times the whole stack)
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(documents.router)
+app.include_router(programs.router)
+app.include_router(emails.router)
 
 @app.get("/")
 def read_root():
@@ -52,3 +104,34 @@ def test_db(db: Session = Depends(database.get_db)):
         return {"message": "Database connection successful"}
     except Exception as e:
         return {"error": f"Database connection failed: {str(e)}"}
+
+def _runtime_metrics():
+    """Cache and background worker state, read at scrape time."""
+    caches = {"text": text_store.text_cache.stats(), "principal": security.principal_cache.stats()}
+    lines = []
+    for key, documentation in (
+        ("entries", "Entries held by each in-process cache."),
+        ("hits", "Cache hits since startup."),
+        ("misses", "Cache misses since startup."),
+        ("hit_rate", "Cache hit ratio since startup."),
+    ):
+        lines += metrics.gauge_lines(
+            f"cache_{key}", documentation, {name: stats[key] for name, stats in caches.items()}, label="cache"
+        )
+    lines += metrics.gauge_lines(
+        "background_pending", "Work queued in background components.",
+        {
+            "jobs_in_flight": job_queue.worker.in_flight, "reminders": len(reminders.scheduler),
+            "gc_files": len(garbage_collector.collector),
+        },
+        label="queue"
+    )
+    return lines
+
+metrics.register_collector(_runtime_metrics)
+metrics.register_collector(startup.report.metric_lines)
+
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    """Prometheus metrics for this process, or every worker with METRICS_DIR."""
+    return Response(metrics.render_all(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,406 @@
+"""
+In-process metrics in Prometheus text format.
+
+Every process keeps its own registry. Under several worker processes
+(serve.py), set METRICS_DIR: each worker publishes its snapshot there
+with ``publish_forever()`` and /metrics serves them all, every series
+labelled with its ``worker``, so aggregate with ``sum without (worker)``.
+Without it a scrape only sees the worker that answered.
+
+- MetricsMiddleware: per-route request latency, DB queries per request and
+  in-flight requests (a pure ASGI middleware, so no per-request task or
+  response wrapping)
+- SQLAlchemy cursor events: query count and latency for every engine
+- ``stage()``/``record_stage()``: timers around document processing steps.
+  Code running in a worker process records into ``capture_stages()`` and
+  hands the samples back to the parent, which merges them with
+  ``observe_stages()``
+- ``render()``: the /metrics payload, including registered collectors
+  (cache statistics, queue state) evaluated at scrape time
+"""
+import asyncio
+import bisect
+import contextvars
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Snapshots of the worker processes of one server; unset = this process only
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_PUBLISH_INTERVAL = float(os.getenv("METRICS_PUBLISH_INTERVAL", 5))  # Seconds
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, labels: Tuple[str, ...] = ()) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    def dec(self, amount: float = 1, labels: Tuple[str, ...] = ()) -> None:
+        self.inc(-amount, labels)
+
+    def collect(self) -> List[str]:
+        lines = super().collect()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+_INF = 'le="+Inf"'
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Tuple[str, ...] = ()) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _labels(self.labelnames, labels, f'le="{bound:g}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, _INF)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+# Registered metrics and scrape-time collectors
+_metrics: List[object] = []
+_collectors: List[Callable[[], List[str]]] = []
+
+def register(metric):
+    _metrics.append(metric)
+    return metric
+
+def register_collector(collector: Callable[[], List[str]]) -> None:
+    """Add a function returning extra exposition lines at scrape time."""
+    _collectors.append(collector)
+
+def render() -> str:
+    """All metrics in Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in _metrics:
+        lines.extend(metric.collect())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+# Multi-process exposition
+_SAMPLE = re.compile(r"^([^{\s]+)(?:\{(.*)\})? (.*)$")
+
+def _snapshot_path() -> str:
+    return os.path.join(METRICS_DIR, f"{os.getpid()}.prom")
+
+def publish() -> None:
+    """Write this process's metrics to METRICS_DIR, every series labelled with the worker."""
+    worker = f'worker="{os.getpid()}"'
+    lines = []
+    for line in render().splitlines():
+        match = _SAMPLE.match(line)
+        if match and not line.startswith("#"):
+            name, labels, value = match.groups()
+            line = f"{name}{{{worker},{labels}}} {value}" if labels else f"{name}{{{worker}}} {value}"
+        lines.append(line)
+    path = _snapshot_path()
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(path + ".tmp", path)
+
+def unpublish() -> None:
+    """Remove this process's snapshot, e.g. when the worker exits."""
+    try:
+        os.remove(_snapshot_path())
+    except FileNotFoundError:
+        pass
+
+async def publish_forever() -> None:
+    """
+    Publish every METRICS_PUBLISH_INTERVAL seconds until cancelled.
+
+    Runs on the event loop, like the request metrics it reads.
+    """
+    while True:
+        publish()
+        await asyncio.sleep(METRICS_PUBLISH_INTERVAL)
+
+def render_all() -> str:
+    """
+    The /metrics payload: this process, or with METRICS_DIR every worker
+    that published recently (snapshots of exited workers are removed).
+    """
+    if not METRICS_DIR:
+        return render()
+    publish()
+    stale = time.time() - 3 * METRICS_PUBLISH_INTERVAL
+    # Metric name -> HELP/TYPE lines, then every worker's samples
+    families: Dict[str, Tuple[List[str], List[str]]] = {}
+    for entry in os.scandir(METRICS_DIR):
+        if not entry.name.endswith(".prom"):
+            continue
+        try:
+            if entry.stat().st_mtime < stale:
+                os.remove(entry.path)
+                continue
+            with open(entry.path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            continue
+        family = None
+        for line in lines:
+            if line.startswith("# HELP ") or line.startswith("# TYPE "):
+                family = line.split(" ", 3)[2]
+                headers, _ = families.setdefault(family, ([], []))
+                if line not in headers:
+                    headers.append(line)
+            elif line and family is not None:
+                families[family][1].append(line)
+    lines = []
+    for headers, samples in families.values():
+        lines.extend(headers)
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+def gauge_lines(name: str, documentation: str, values: Dict[str, float], label: str = "name") -> List[str]:
+    """Exposition lines for a gauge computed on the fly, one series per key."""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+    for key, value in sorted(values.items()):
+        lines.append(f'{name}{{{label}="{_escape(key)}"}} {value:g}')
+    return lines
+
+class HttpMetrics:
+    """
+    Per-route HTTP metrics, updated with one dict lookup per request.
+
+    Only MetricsMiddleware writes these, from the event loop, and /metrics
+    reads them there too, so no locking is needed.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        # (route, method) -> (status counts, latency, db queries, db seconds);
+        # each histogram series is [per-bucket counts..., +Inf count, sum]
+        self._routes: Dict[Tuple[str, str], tuple] = {}
+        self._latency = Histogram(
+            "http_request_duration_seconds", "HTTP request latency by route.", ("route", "method")
+        )
+        self._db_queries = Histogram(
+            "http_request_db_queries", "Database queries issued per HTTP request.", ("route", "method"),
+            COUNT_BUCKETS
+        )
+        self._db_time = Histogram(
+            "http_request_db_seconds", "Time spent in database queries per HTTP request.", ("route", "method")
+        )
+
+    def observe(self, route: str, method: str, status: int, seconds: float, queries: int, db_seconds: float) -> None:
+        key = (route, method)
+        entry = self._routes.get(key)
+        if entry is None:
+            entry = self._routes[key] = (
+                {},
+                [0] * (len(LATENCY_BUCKETS) + 2),
+                [0] * (len(COUNT_BUCKETS) + 2),
+                [0] * (len(LATENCY_BUCKETS) + 2),
+            )
+        statuses, latency, db_queries, db_time = entry
+        statuses[status] = statuses.get(status, 0) + 1
+        latency[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        latency[-1] += seconds
+        db_queries[bisect.bisect_left(COUNT_BUCKETS, queries)] += 1
+        db_queries[-1] += queries
+        db_time[bisect.bisect_left(LATENCY_BUCKETS, db_seconds)] += 1
+        db_time[-1] += db_seconds
+
+    def collect(self) -> List[str]:
+        lines = ["# HELP http_requests_total HTTP requests by route, method and status.",
+                 "# TYPE http_requests_total counter"]
+        for (route, method), entry in sorted(self._routes.items()):
+            for status, count in sorted(entry[0].items()):
+                labels = _labels(("route", "method", "status"), (route, method, str(status)))
+                lines.append(f"http_requests_total{labels} {count}")
+        # Reuse Histogram's exposition code on snapshots of the series
+        for index, histogram in ((1, self._latency), (2, self._db_queries), (3, self._db_time)):
+            histogram._series = {key: list(entry[index]) for key, entry in self._routes.items()}
+            lines.extend(histogram.collect())
+        lines += ["# HELP http_requests_in_flight HTTP requests being served.",
+                  "# TYPE http_requests_in_flight gauge",
+                  f"http_requests_in_flight {self.in_flight}"]
+        return lines
+
+http_metrics = register(HttpMetrics())
+
+# Database metrics
+db_queries = register(Counter("db_queries_total", "Database queries executed."))
+db_query_latency = register(Histogram("db_query_duration_seconds", "Database query latency."))
+
+# Processing stages (extraction, analysis, ...)
+stage_latency = register(Histogram(
+    "stage_duration_seconds", "Duration of document processing stages.", ("stage",), STAGE_BUCKETS
+))
+stage_errors = register(Counter("stage_errors_total", "Document processing stages that raised.", ("stage",)))
+
+# [query count, query seconds] for the current request, if any
+_request_db: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar("request_db", default=None)
+
+class MetricsMiddleware:
+    """Record latency, status, in-flight count and DB usage for HTTP requests."""
+
+    def __init__(self, app, exclude: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.exclude = frozenset(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        db_usage = [0, 0.0]
+        token = _request_db.set(db_usage)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_metrics.in_flight -= 1
+            _request_db.reset(token)
+            # Label by route template, not raw path, to bound cardinality
+            route = scope.get("route")
+            http_metrics.observe(
+                getattr(route, "path", None) or "unmatched", scope["method"], status_code,
+                elapsed, db_usage[0], db_usage[1]
+            )
+
+# SQLAlchemy hooks, for every engine in the process
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    db_queries.inc()
+    db_query_latency.observe(elapsed)
+    usage = _request_db.get()
+    if usage is not None:
+        usage[0] += 1
+        usage[1] += elapsed
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    conn = context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+# Stage timers
+_stage_sink: contextvars.ContextVar[Optional[List[Tuple[str, float, bool]]]] = contextvars.ContextVar(
+    "stage_sink", default=None
+)
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a processing stage (recorded as failed if it raises)."""
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        record_stage(name, time.perf_counter() - start, failed)
+
+def record_stage(name: str, seconds: float, failed: bool = False) -> None:
+    """Record a stage timed by the caller, e.g. the work done inside a generator."""
+    sample = (name, seconds, failed)
+    sink = _stage_sink.get()
+    if sink is not None:
+        sink.append(sample)
+    else:
+        observe_stages([sample])
+
+@contextmanager
+def capture_stages() -> Iterator[List[Tuple[str, float, bool]]]:
+    """Collect stage samples into a list instead of recording them, e.g. in a worker process."""
+    samples: List[Tuple[str, float, bool]] = []
+    token = _stage_sink.set(samples)
+    try:
+        yield samples
+    finally:
+        _stage_sink.reset(token)
+
+def observe_stages(samples: Sequence[Tuple[str, float, bool]]) -> None:
+    """Record stage samples, e.g. those returned by a worker process."""
+    for name, seconds, failed in samples:
+        stage_latency.observe(seconds, labels=(name,))
+        if failed:
+            stage_errors.inc(labels=(name,))
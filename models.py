@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, Index, LargeBinary, Text, JSON, UniqueConstraint, false
 from sqlalchemy.orm import relationship
 import datetime
 import json
@@ -19,20 +19,82 @@ class User(Base):
     programs = relationship("Program", back_populates="user")
     emails = relationship("Email", back_populates="user")
 
+class Blob(Base):
+    __tablename__ = "blobs"
+    
+    # Uploaded file contents, stored once per distinct SHA-256
+    content_hash = Column(String, primary_key=True)
+    file_path = Column(String)
+    size_bytes = Column(Integer)
+    ref_count = Column(Integer, default=0)  # Number of documents using this blob
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
 class Document(Base):
     __tablename__ = "documents"
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
     description = Column(String)
-    file_path = Column(String)
+    filename = Column(String)  # Original name of the uploaded file
+    file_path = Column(String)  # Path of the shared blob
     content_type = Column(String)
+    size_bytes = Column(Integer)
+    content_hash = Column(String, ForeignKey("blobs.content_hash"), index=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     user_id = Column(Integer, ForeignKey("users.id"))
     
     # Relationships
     owner = relationship("User", back_populates="documents")
     analyses = relationship("DocumentAnalysis", back_populates="document")
+    jobs = relationship("Job", back_populates="document")
+    versions = relationship("DocumentVersion", back_populates="document", order_by="DocumentVersion.version")
+    
+    __table_args__ = (
+        # Keyset pagination: per-user listing in (created_at, id) order
+        Index("ix_documents_user_created", "user_id", "created_at", "id"),
+    )
+
+class DocumentVersion(Base):
+    __tablename__ = "document_versions"
+    
+    # Superseded contents of a document; the current version lives on the
+    # document itself and is numbered one past the last row here. Each row
+    # holds a reference on its blob.
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True)
+    version = Column(Integer)
+    filename = Column(String)
+    file_path = Column(String)
+    content_type = Column(String)
+    size_bytes = Column(Integer)
+    content_hash = Column(String, ForeignKey("blobs.content_hash"), index=True)
+    superseded_at = Column(DateTime)  # When the next version was uploaded
+    
+    # Relationships
+    document = relationship("Document", back_populates="versions")
+    
+    __table_args__ = (
+        UniqueConstraint("document_id", "version"),
+    )
+
+class BlobChunk(Base):
+    __tablename__ = "blob_chunks"
+    
+    # Content-defined chunks of a blob's extracted text, in order; chunks
+    # are shared by every blob (and version) whose text contains them
+    content_hash = Column(String, primary_key=True)
+    position = Column(Integer, primary_key=True)
+    chunk_hash = Column(String, index=True)
+    start = Column(Integer)  # Character range in the extracted text
+    end = Column(Integer)
+
+class ChunkAnalysis(Base):
+    __tablename__ = "chunk_analyses"
+    
+    # Mergeable analyzer state of one chunk (JSON), see Analyzer.partial
+    chunk_hash = Column(String, primary_key=True)
+    analyzer_version = Column(String, primary_key=True)
+    state = Column(Text)
 
 class DocumentAnalysis(Base):
     __tablename__ = "document_analyses"
@@ -43,11 +105,18 @@ class DocumentAnalysis(Base):
     # Changed from ARRAY(String) to Text to store JSON string for SQLite compatibility
     key_points = Column(Text)  # Will store JSON string representation of list
     sentiment = Column(String)
+    # Cache key: the analyzed content and the analyzer that produced the result
+    content_hash = Column(String)
+    analyzer_version = Column(String)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     
     # Relationships
     document = relationship("Document", back_populates="analyses")
     
+    __table_args__ = (
+        Index("ix_document_analyses_cache_key", "content_hash", "analyzer_version"),
+    )
+    
     # Helper methods for key_points JSON conversion
     @property
     def key_points_list(self):
@@ -64,6 +133,24 @@ class DocumentAnalysis(Base):
         else:
             self.key_points = json.dumps([])
 
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True)
+    kind = Column(String)  # e.g. "extract"
+    status = Column(String, default="queued", index=True)  # queued, running, succeeded, failed
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    error = Column(Text)
+    run_after = Column(DateTime)  # Earliest time a retry may run
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    
+    # Relationships
+    document = relationship("Document", back_populates="jobs")
+
 class Program(Base):
     __tablename__ = "programs"
     
@@ -78,6 +165,35 @@ class Program(Base):
     
     # Relationships
     user = relationship("User", back_populates="programs")
+    
+    __table_args__ = (
+        # Keyset pagination: per-user listing in (created_at, id) order
+        Index("ix_programs_user_created", "user_id", "created_at", "id"),
+        # Upcoming-deadline queries, per user and global
+        Index("ix_programs_deadline_user", "deadline", "user_id"),
+    )
+
+# Programs written since the reminder scheduler last synced: an outbox
+# through which every worker process's writes reach the one scheduler
+class ProgramChange(Base):
+    __tablename__ = "program_changes"
+    
+    id = Column(Integer, primary_key=True)
+    program_id = Column(Integer, nullable=False)  # No foreign key: deleted programs are recorded too
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+# Users changed or deleted recently: every worker process polls this to
+# drop cached logins, and rows older than the login cache's TTL are pruned
+class UserChange(Base):
+    __tablename__ = "user_changes"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)  # No foreign key: deleted users are recorded too
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+    
+    # Readers remember the last id they saw, so ids must never be reused
+    # once the newest rows are pruned
+    __table_args__ = {"sqlite_autoincrement": True}
 
 class Email(Base):
     __tablename__ = "emails"
@@ -93,3 +209,73 @@ class Email(Base):
     
     # Relationships
     user = relationship("User", back_populates="emails")
+    
+    __table_args__ = (
+        # Keyset pagination: per-user listing in (created_at, id) order
+        Index("ix_emails_user_created", "user_id", "created_at", "id"),
+    )
+
+# Partial index: the unread inbox stays small and cheap to scan however
+# much read mail accumulates
+Index(
+    "ix_emails_unread",
+    Email.user_id, Email.created_at, Email.id,
+    sqlite_where=Email.is_read == false(),
+    postgresql_where=Email.is_read == false(),
+)
+
+class MailboxCounter(Base):
+    __tablename__ = "mailbox_counters"
+    
+    # Per-user email totals, updated in the same transaction as every
+    # email write so the inbox badge is a primary-key lookup
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total = Column(Integer, default=0, nullable=False)
+    unread = Column(Integer, default=0, nullable=False)
+
+class SearchChunk(Base):
+    __tablename__ = "search_chunks"
+    
+    # Chunks present in the search index; id is the FTS5 rowid
+    id = Column(Integer, primary_key=True)
+    chunk_hash = Column(String, unique=True, index=True)
+
+class ChunkPosting(Base):
+    __tablename__ = "chunk_postings"
+    
+    # Fallback inverted index (used when SQLite FTS5 is unavailable):
+    # how often each term occurs in each indexed chunk
+    term = Column(String, primary_key=True)
+    chunk_id = Column(Integer, ForeignKey("search_chunks.id"), primary_key=True, index=True)
+    tf = Column(Integer)
+
+class BlobVocabulary(Base):
+    __tablename__ = "blob_vocabularies"
+    
+    # Distinct terms of a blob's extracted text (JSON list), kept so a
+    # document can be subtracted from the corpus statistics later, and the
+    # rest of its TF-IDF profile (see services.tfidf.Profile) so batches
+    # are ranked without re-reading and re-tokenizing the text
+    content_hash = Column(String, primary_key=True)
+    terms = Column(Text)
+    word_count = Column(Integer)
+    sentiment = Column(String)
+    sentences = Column(LargeBinary)  # Packed (start, end, words) per sentence
+    entries = Column(LargeBinary)  # Packed (sentence, term, tf) per non-zero cell
+
+class CorpusDocument(Base):
+    __tablename__ = "corpus_documents"
+    
+    # Documents counted in their owner's corpus statistics, and the content
+    # they were counted with
+    document_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    content_hash = Column(String)
+
+class CorpusTerm(Base):
+    __tablename__ = "corpus_terms"
+    
+    # Per-user document frequency of each term, for TF-IDF ranking
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    term = Column(String, primary_key=True)
+    df = Column(Integer, default=0, nullable=False)
@@ -0,0 +1,70 @@
+"""
+Keyset (cursor) pagination helpers.
+
+Lists are ordered by ``(created_at, id)`` ascending and a page continues
+strictly after the last row of the previous one, so with a matching
+``(user_id, created_at, id)`` index every page costs the same as the first.
+Cursors are opaque to clients: URL-safe base64 of the last row's key.
+"""
+import base64
+import binascii
+import datetime
+import json
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+
+# Upper bound on the page size a client may request
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(row: Any) -> str:
+    """Cursor pointing just after ``row`` in (created_at, id) order."""
+    created_at = row.created_at.isoformat() if row.created_at else None
+    raw = json.dumps([created_at, row.id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    """Parse a cursor from encode_cursor, rejecting anything malformed with a 400."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.datetime.fromisoformat(created_at), int(row_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def after_cursor(model: Any, cursor: Optional[str]) -> List[Any]:
+    """
+    WHERE criteria selecting the rows that follow ``cursor``.
+
+    Written as ``created_at >= c AND (created_at > c OR id > i)`` so the
+    leading range condition can seek into the composite index.
+    """
+    if not cursor:
+        return []
+    created_at, row_id = decode_cursor(cursor)
+    return [
+        model.created_at >= created_at,
+        or_(model.created_at > created_at, and_(model.created_at == created_at, model.id > row_id)),
+    ]
+
+def page_order(model: Any) -> List[Any]:
+    """ORDER BY matching after_cursor."""
+    return [model.created_at, model.id]
+
+def clamp_limit(limit: int) -> int:
+    """Keep a requested page size within 1..MAX_PAGE_SIZE."""
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def make_page(rows: Sequence[Any], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    Split ``limit + 1`` fetched rows into a page and the cursor for the next.
+
+    Returns:
+        Tuple of (at most ``limit`` rows, next cursor or None on the last page)
+    """
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1])
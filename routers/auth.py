@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
@@ -8,7 +9,7 @@ import crud
 import models
 import schemas
 import security
-from database import get_db
+from database import get_db, get_read_db
 
 router = APIRouter(
     prefix="/auth",
@@ -17,15 +18,30 @@ router = APIRouter(
 )
 
 @router.post("/register", response_model=schemas.User)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_user(
+    user: schemas.UserCreate,
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db)
+):
     """Register a new user."""
-    return crud.create_user(db=db, user=user)
+    # Check first so duplicate registrations do not cost a bcrypt hash
+    if await run_in_threadpool(crud.get_user_by_email, read_db, email=user.email):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+    hashed_password = await security.get_password_hash_async(user.password)
+    return await run_in_threadpool(crud.create_user, db=db, user=user, hashed_password=hashed_password)
 
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db)
+):
     """Generate a JWT token for authentication."""
     # Authenticate user
-    user = security.authenticate_user(db, form_data.username, form_data.password)
+    user = await security.authenticate_user_async(db, form_data.username, form_data.password, read_db=read_db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -42,6 +58,9 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/users/me", response_model=schemas.User)
-def read_users_me(current_user: models.User = Depends(security.get_current_active_user)):
+def read_users_me(
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
     """Get the current authenticated user."""
-    return current_user
+    return crud.get_user(db, user_id=current_user.id)
@@ -1,18 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
-from fastapi.responses import FileResponse
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File, Form, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os
-import shutil
-from datetime import datetime
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
 import json
 
 import models
 import schemas
 import crud
 import security
-from database import get_db
-from services.document_service import process_document, analyze_document
+import serialization
+from database import SessionLocal, get_db, get_read_db
+from services import batch_analysis, chunk_analysis, garbage_collector, job_queue, search_index, tfidf
+from services.analyzer import ANALYZER_VERSION
+from services.batch_analysis import ndjson
+from services.document_service import analyze_document, has_extracted_text
+from services.storage_service import (
+    MAX_UPLOAD_SIZE, blob_path, discard_staged, save_upload, store_blob, upload_too_large
+)
+
+# Analyzer versions clients may ask for: the streaming engine (default)
+# and corpus-wide TF-IDF ranking
+ANALYZER_VERSIONS = (ANALYZER_VERSION, tfidf.ANALYZER_VERSION)
+# Versions whose results depend on the owner's other documents; their
+# cached analyses are never shared between users
+PER_USER_VERSIONS = (tfidf.ANALYZER_VERSION,)
+# New analyses a batch holds before writing them out
+BATCH_WRITE_SIZE = int(os.getenv("BATCH_WRITE_SIZE", 100))
 
 router = APIRouter(
     prefix="/documents",
@@ -20,63 +38,211 @@ router = APIRouter(
     responses={401: {"description": "Unauthorized"}},
 )
 
-# Create upload directory if it doesn't exist
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 @router.post("/", response_model=schemas.Document)
-def create_document(
+async def create_document(
+    request: Request,
     title: str = Form(...),
     description: Optional[str] = Form(None),
     file: UploadFile = File(...),
-    current_user: models.User = Depends(security.get_current_active_user),
+    current_user: security.Principal = Depends(security.get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Upload a new document."""
-    # Create unique filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{timestamp}_{current_user.id}_{file.filename}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
+    file_path, size_bytes, content_hash, is_new_blob = await _store_upload(request, file, db)
+    
+    # Create document in database
+    content_type = file.content_type
+    document_data = schemas.DocumentCreate(
+        title=title,
+        description=description,
+        content_type=content_type
+    )
+    try:
+        document = await run_in_threadpool(
+            crud.create_document,
+            db=db,
+            document=document_data,
+            user_id=current_user.id,
+            file_path=file_path,
+            filename=os.path.basename(file.filename or ""),
+            size_bytes=size_bytes,
+            content_hash=content_hash
+        )
+    except Exception:
+        # Give back the reference taken above
+        await run_in_threadpool(_give_back_blob, db, content_hash)
+        raise
     
-    # Save file
+    # Queue text extraction so the upload returns immediately; duplicate
+    # content that has already been extracted is not processed again
+    if is_new_blob or not has_extracted_text(file_path):
+        await run_in_threadpool(job_queue.enqueue, db, document.id, "extract")
+    else:
+        await run_in_threadpool(tfidf.count_documents, db, [document])
+    
+    return document
+
+async def _store_upload(request: Request, file: UploadFile, db: Session):
+    """
+    Stream an upload into the blob store, taking a reference on its blob.
+    
+    Returns:
+        Tuple of (file path, size in bytes, content hash, whether the blob is new)
+    """
+    # Reject oversized uploads before reading the body
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_SIZE:
+        raise upload_too_large()
+    
+    # Stream file to a staging area
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        staged_path, size_bytes, content_hash = await save_upload(file)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error saving file: {str(e)}"
         )
     
-    # Process document (extract text, metadata, etc.)
-    content_type = file.content_type
-    process_document(file_path, content_type)
+    # Register the content and move it into the shared blob store
+    try:
+        _, is_new_blob = await run_in_threadpool(
+            crud.acquire_blob, db, content_hash, blob_path(content_hash), size_bytes
+        )
+    except Exception:
+        discard_staged(staged_path)
+        raise
+    try:
+        file_path = await run_in_threadpool(store_blob, staged_path, content_hash)
+    except Exception:
+        # Give back the reference taken above (e.g. the disk is full)
+        discard_staged(staged_path)
+        await run_in_threadpool(_give_back_blob, db, content_hash)
+        raise
+    return file_path, size_bytes, content_hash, is_new_blob
+
+def _give_back_blob(db: Session, content_hash: str) -> None:
+    """Roll back a failed upload and release the blob reference it took."""
+    db.rollback()
+    crud.release_blob(db, content_hash)
+    db.commit()
+
+@router.post("/{document_id}/versions", response_model=schemas.Document)
+async def upload_document_version(
+    document_id: int,
+    request: Request,
+    file: UploadFile = File(...),
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload a new version of a document.
     
-    # Create document in database
-    document_data = schemas.DocumentCreate(
-        title=title,
-        description=description,
-        content_type=content_type
-    )
+    The document keeps its ID, title and analyses; its current content
+    becomes the previous version. Only the chunks of text that changed
+    are indexed and analyzed again.
+    """
+    document = await run_in_threadpool(crud.get_document, db, document_id=document_id)
+    if document is None or document.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    file_path, size_bytes, content_hash, is_new_blob = await _store_upload(request, file, db)
+    try:
+        document = await run_in_threadpool(
+            crud.create_document_version,
+            db,
+            document,
+            file_path=file_path,
+            filename=os.path.basename(file.filename or ""),
+            content_type=file.content_type,
+            size_bytes=size_bytes,
+            content_hash=content_hash
+        )
+    except Exception:
+        await run_in_threadpool(_give_back_blob, db, content_hash)
+        raise
     
-    return crud.create_document(db=db, document=document_data, user_id=current_user.id, file_path=file_path)
+    if is_new_blob or not has_extracted_text(file_path):
+        await run_in_threadpool(job_queue.enqueue, db, document.id, "extract")
+    else:
+        await run_in_threadpool(tfidf.count_documents, db, [document])
+    
+    return document
 
-@router.get("/", response_model=List[schemas.Document])
+@router.get("/{document_id}/versions", response_model=List[schemas.DocumentVersion])
+def read_document_versions(
+    document_id: int,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    """Get every version of a document, oldest first; the last one is current."""
+    document = crud.get_document(db, document_id=document_id)
+    if document is None or document.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    versions = []
+    uploaded_at = document.created_at
+    for version in crud.get_document_versions(db, document_id=document_id):
+        versions.append({
+            "version": version.version,
+            "filename": version.filename,
+            "content_type": version.content_type,
+            "size_bytes": version.size_bytes,
+            "content_hash": version.content_hash,
+            "created_at": uploaded_at,
+        })
+        # Each version was uploaded when the one before it was superseded
+        uploaded_at = version.superseded_at
+    versions.append({
+        "version": len(versions) + 1,
+        "filename": document.filename,
+        "content_type": document.content_type,
+        "size_bytes": document.size_bytes,
+        "content_hash": document.content_hash,
+        "created_at": uploaded_at,
+        "is_current": True,
+    })
+    return versions
+
+@router.get("/", response_model=schemas.DocumentPage)
 def read_documents(
-    skip: int = 0,
+    cursor: Optional[str] = None,
     limit: int = 100,
-    current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get the current user's documents, oldest first, one page at a time.
+    
+    Follow ``next_cursor`` from each response until it is null.
+    """
+    documents, next_cursor = crud.get_documents(db, user_id=current_user.id, cursor=cursor, limit=limit)
+    return serialization.page_response(documents, next_cursor)
+
+@router.get("/search", response_model=List[schemas.SearchResult])
+def search_documents(
+    q: str,
+    limit: int = 20,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_read_db)
 ):
-    """Get all documents for the current user."""
-    documents = crud.get_documents(db, user_id=current_user.id, skip=skip, limit=limit)
-    return documents
+    """
+    Full-text search over the extracted text of the current user's documents.
+    
+    Every word in ``q`` must appear; results are ranked by relevance and
+    include a snippet around the match. Documents become searchable once
+    their extraction job has succeeded.
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    return search_index.search(db, user_id=current_user.id, query=q, limit=limit)
 
 @router.get("/{document_id}", response_model=schemas.Document)
 def read_document(
     document_id: int,
-    current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_read_db)
 ):
     """Get a specific document by ID."""
     document = crud.get_document(db, document_id=document_id)
@@ -87,39 +253,290 @@ def read_document(
 @router.get("/{document_id}/download")
 def download_document(
     document_id: int,
-    current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_read_db)
 ):
-    """Download a document."""
+    """
+    Download a document.
+    
+    Supports conditional requests (``If-None-Match``/``If-Modified-Since``
+    answer 304) and single or multi-part ``Range`` requests, so viewers
+    can revalidate cheaply and fetch pages on demand. The file is sent
+    with ``http.response.pathsend`` when the server supports it.
+    """
     document = crud.get_document(db, document_id=document_id)
     if document is None or document.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    if not os.path.exists(document.file_path):
+    try:
+        stat_result = os.stat(document.file_path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
     
+    headers = {
+        "ETag": _download_etag(document, stat_result),
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        # Private data: browsers may keep it but must revalidate
+        "Cache-Control": "private, no-cache",
+    }
+    if _not_modified(request, headers["ETag"], stat_result.st_mtime):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
     return FileResponse(
         path=document.file_path,
-        filename=os.path.basename(document.file_path),
-        media_type=document.content_type
+        filename=document.filename or os.path.basename(document.file_path),
+        media_type=document.content_type,
+        headers=headers,
+        stat_result=stat_result
+    )
+
+def _download_etag(document: models.Document, stat_result: os.stat_result) -> str:
+    """Strong ETag from the content hash; size/mtime for pre-hashing uploads."""
+    if document.content_hash:
+        return f'"{document.content_hash}"'
+    return f'W/"{stat_result.st_size:x}-{int(stat_result.st_mtime):x}"'
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """Evaluate If-None-Match, or failing that If-Modified-Since (RFC 9110)."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison: ignore W/ prefixes on either side
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag.removeprefix("W/") in tags
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            # "-0000" and obsolete zone-less dates: HTTP dates are always UTC
+            since = since.replace(tzinfo=timezone.utc)
+        return int(mtime) <= since.timestamp()
+    return False
+
+@router.get("/{document_id}/jobs", response_model=List[schemas.Job])
+def read_document_jobs(
+    document_id: int,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    """Get the background jobs (e.g. text extraction) for a document."""
+    document = crud.get_document(db, document_id=document_id)
+    if document is None or document.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return crud.get_jobs(db, document_id=document_id)
+
+@router.post("/analyze-batch")
+async def analyze_documents_batch(
+    request: schemas.BatchAnalysisRequest,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Analyze many documents at once.
+    
+    Pass ``document_ids`` or ``all_documents=true``. Work is spread over a
+    process pool and one NDJSON line is streamed back per document as soon
+    as it is done, followed by a summary line. New analyses are bulk
+    inserted every BATCH_WRITE_SIZE documents and when the stream ends,
+    including when the client disconnects.
+    
+    With ``analyzer_version="tfidf-1"`` the documents are instead ranked
+    together in one batch against the user's corpus statistics.
+    """
+    if request.document_ids is None and not request.all_documents:
+        raise HTTPException(status_code=400, detail="Provide document_ids or set all_documents")
+    version = _analyzer_version(request.analyzer_version)
+    
+    document_ids = None if request.all_documents else request.document_ids
+    documents = await run_in_threadpool(
+        crud.get_user_documents, db, user_id=current_user.id, document_ids=document_ids
     )
+    found = {document.id for document in documents}
+    missing = [] if document_ids is None else [i for i in dict.fromkeys(document_ids) if i not in found]
+    
+    # Look up cached results for every document in one query
+    cached = {}
+    if not request.force:
+        hashes = list({document.content_hash for document in documents if document.content_hash})
+        owner = current_user.id if version in PER_USER_VERSIONS else None
+        for analysis in await run_in_threadpool(crud.get_analyses_by_content, db, hashes, version, owner):
+            cached.setdefault(analysis.content_hash, analysis)
+            cached.setdefault((analysis.content_hash, analysis.document_id), analysis)
+    
+    async def stream():
+        counts = {"analyzed": 0, "cached": 0, "failed": 0, "not_found": len(missing)}
+        new_rows = []
+        plans = {}
+        finished_plans = {}
+        
+        def write():
+            # Analyses and chunk states finished since the last write
+            with SessionLocal() as write_db:
+                chunk_analysis.save(write_db, list(finished_plans.values()))
+                crud.bulk_save_document_analyses(write_db, new_rows, version)
+            finished_plans.clear()
+            new_rows.clear()
+        
+        try:
+            for document_id in missing:
+                yield ndjson({"document_id": document_id, "status": "not_found"})
+            
+            pending = []
+            for document in documents:
+                hit = cached.get(document.content_hash)
+                if hit is None:
+                    pending.append(document)
+                    continue
+                if (document.content_hash, document.id) not in cached:
+                    # Same content analyzed for another document; copy it over
+                    new_rows.append({
+                        "document_id": document.id,
+                        "summary": hit.summary,
+                        "key_points": hit.key_points_list,
+                        "sentiment": hit.sentiment,
+                        "content_hash": document.content_hash,
+                    })
+                    if len(new_rows) >= BATCH_WRITE_SIZE:
+                        await run_in_threadpool(write)
+                counts["cached"] += 1
+                yield ndjson({
+                    "document_id": document.id,
+                    "status": "cached",
+                    "analysis": {"summary": hit.summary, "key_points": hit.key_points_list, "sentiment": hit.sentiment},
+                })
+            
+            if version == tfidf.ANALYZER_VERSION:
+                analyzed = _rank_many(current_user.id, pending)
+            else:
+                # Blobs with extracted text are analyzed chunk by chunk, reusing
+                # the chunks earlier versions (or other documents) share with them
+                if not request.force:
+                    plans = await run_in_threadpool(_plan_chunks, pending)
+                analyzed = batch_analysis.analyze_many(pending, plans)
+            async for document, result, error in analyzed:
+                if error is not None:
+                    counts["failed"] += 1
+                    yield ndjson({"document_id": document.id, "status": "error", "detail": error})
+                    continue
+                counts["analyzed"] += 1
+                if document.content_hash in plans:
+                    finished_plans[document.content_hash] = plans[document.content_hash]
+                new_rows.append({
+                    "document_id": document.id,
+                    "summary": result.get("summary", ""),
+                    "key_points": result.get("key_points", []),
+                    "sentiment": result.get("sentiment", "neutral"),
+                    "content_hash": document.content_hash,
+                })
+                if len(new_rows) >= BATCH_WRITE_SIZE:
+                    await run_in_threadpool(write)
+                yield ndjson({"document_id": document.id, "status": "analyzed", "analysis": result})
+        finally:
+            # Keep finished work even if the client went away mid-stream
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(write)
+        yield ndjson({"status": "done", **counts})
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+def _analyzer_version(requested: Optional[str]) -> str:
+    """The analyzer version to use, rejecting unknown ones."""
+    if requested is None:
+        return ANALYZER_VERSION
+    if requested not in ANALYZER_VERSIONS:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown analyzer version; use one of: {', '.join(ANALYZER_VERSIONS)}"
+        )
+    return requested
+
+async def _rank_many(user_id: int, documents: List[models.Document]):
+    """Rank documents with the TF-IDF engine in one batch, yielding like batch_analysis.analyze_many."""
+    def rank():
+        with SessionLocal() as write_db:
+            return tfidf.analyze_documents(write_db, user_id, documents)
+    
+    try:
+        results = await run_in_threadpool(rank) if documents else {}
+    except Exception as e:
+        for document in documents:
+            yield document, None, f"{type(e).__name__}: {e}"
+        return
+    for document in documents:
+        yield document, results[document.id], None
+
+def _plan_chunks(documents: List[models.Document]) -> dict:
+    """Chunk plans for the distinct blobs of the given documents that have extracted text."""
+    plans = {}
+    with SessionLocal() as write_db:
+        for document in documents:
+            if not document.content_hash or document.content_hash in plans:
+                continue
+            if has_extracted_text(document.file_path):
+                chunk_plan = chunk_analysis.plan(write_db, document.content_hash, document.file_path)
+                if chunk_plan is not None:
+                    plans[document.content_hash] = chunk_plan
+    return plans
 
 @router.post("/{document_id}/analyze", response_model=schemas.DocumentAnalysis)
 def analyze_document_endpoint(
     document_id: int,
-    current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    force: bool = False,
+    analyzer_version: Optional[str] = None,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db)
 ):
-    """Analyze a document for insights."""
-    document = crud.get_document(db, document_id=document_id)
+    """
+    Analyze a document for insights.
+    
+    Results are cached per (content hash, analyzer version), so repeat
+    calls are cheap; pass ``force=true`` to recompute. A new version is
+    analyzed chunk by chunk, so only the text that changed is analyzed.
+    ``analyzer_version=tfidf-1`` ranks sentences against the user's other
+    documents instead.
+    """
+    version = _analyzer_version(analyzer_version)
+    # Reads go through the read-only session so no write connection is
+    # held while the analysis runs
+    document = crud.get_document(read_db, document_id=document_id)
     if document is None or document.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Document not found")
     
+    if not force and document.content_hash:
+        cached = crud.get_cached_analysis(
+            read_db, document_id=document_id, content_hash=document.content_hash, analyzer_version=version,
+            user_id=current_user.id if version in PER_USER_VERSIONS else None
+        )
+        if cached is not None and cached.document_id != document_id:
+            # Same content analyzed for another document; copy it over
+            cached = crud.copy_document_analysis(db, cached, document_id=document_id)
+        if cached is not None:
+            return cached
+    
     if not os.path.exists(document.file_path):
         raise HTTPException(status_code=404, detail="File not found")
     
-    # Analyze document
-    analysis_result = analyze_document(document.file_path, document.content_type)
+    # End the read snapshot so it does not pin the WAL while analyzing
+    read_db.close()
+    
+    if version == tfidf.ANALYZER_VERSION:
+        analysis_result = tfidf.analyze_documents(db, current_user.id, [document])[document.id]
+    else:
+        # Analyze only the chunks no earlier version (or other document) shared
+        chunk_plan = None
+        if not force and document.content_hash and has_extracted_text(document.file_path):
+            chunk_plan = chunk_analysis.plan(db, document.content_hash, document.file_path)
+        if chunk_plan is not None:
+            analysis_result = chunk_analysis.analyze(chunk_plan, document.file_path)
+            chunk_analysis.save(db, [chunk_plan])
+        else:
+            analysis_result = analyze_document(document.file_path, document.content_type)
     
     # Create analysis record in database
     analysis_data = schemas.DocumentAnalysisCreate(
@@ -129,28 +546,42 @@ def analyze_document_endpoint(
         sentiment=analysis_result.get("sentiment", "neutral")
     )
     
-    return crud.create_document_analysis(db=db, analysis=analysis_data)
+    if not document.content_hash:
+        # Documents uploaded before content hashing cannot be cached
+        return crud.create_document_analysis(db=db, analysis=analysis_data, analyzer_version=version)
+    return crud.save_document_analysis(
+        db=db, analysis=analysis_data, content_hash=document.content_hash, analyzer_version=version
+    )
+
+@router.delete("/", response_model=schemas.BulkDeleteResult)
+def delete_documents(
+    request: schemas.BulkDeleteRequest,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Delete many documents at once.
+    
+    Pass ``document_ids`` or ``all_documents=true``. IDs that are not the
+    user's are ignored. Analyses and jobs are deleted with the documents;
+    files are removed in the background.
+    """
+    if request.document_ids is None and not request.all_documents:
+        raise HTTPException(status_code=400, detail="Provide document_ids or set all_documents")
+    document_ids = None if request.all_documents else request.document_ids
+    deleted, orphaned = crud.delete_documents(db, user_id=current_user.id, document_ids=document_ids)
+    garbage_collector.collector.enqueue(orphaned)
+    return {"deleted": deleted}
 
 @router.delete("/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_document(
     document_id: int,
-    current_user: models.User = Depends(security.get_current_active_user),
+    current_user: security.Principal = Depends(security.get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Delete a document."""
-    document = crud.get_document(db, document_id=document_id)
-    if document is None or document.user_id != current_user.id:
+    """Delete a document, its analyses and jobs; the file goes with the last reference to it."""
+    deleted, orphaned = crud.delete_documents(db, user_id=current_user.id, document_ids=[document_id])
+    if not deleted:
         raise HTTPException(status_code=404, detail="Document not found")
-    
-    # Delete file if it exists
-    if os.path.exists(document.file_path):
-        try:
-            os.remove(document.file_path)
-        except Exception as e:
-            # Log error but continue with database deletion
-            print(f"Error deleting file: {str(e)}")
-    
-    # Delete from database
-    crud.delete_document(db=db, document_id=document_id)
-    
+    garbage_collector.collector.enqueue(orphaned)
     return None
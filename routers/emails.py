@@ -0,0 +1,142 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import Optional
+
+import async_crud
+import crud
+import schemas
+import security
+import serialization
+from database import get_db, get_optional_async_db, get_read_db
+from services import bulk_import
+
+router = APIRouter(
+    prefix="/emails",
+    tags=["emails"],
+    responses={401: {"description": "Unauthorized"}},
+)
+
+@router.post("/", response_model=schemas.Email, status_code=status.HTTP_201_CREATED)
+def create_email(
+    email: schemas.EmailCreate,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Create an email."""
+    return crud.create_email(db, email=email, user_id=current_user.id)
+
+@router.get("/", response_model=schemas.EmailPage)
+async def read_emails(
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    unread: bool = False,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_read_db),
+    async_db: Optional[AsyncSession] = Depends(get_optional_async_db)
+):
+    """
+    Get the current user's emails, oldest first, one page at a time.
+    
+    Pass ``unread=true`` for the unread inbox only. Follow ``next_cursor``
+    from each response until it is null.
+    """
+    if async_db is not None:
+        emails, next_cursor = await async_crud.get_emails(
+            async_db, user_id=current_user.id, cursor=cursor, limit=limit, unread_only=unread
+        )
+    else:
+        emails, next_cursor = await run_in_threadpool(
+            crud.get_emails, db, user_id=current_user.id, cursor=cursor, limit=limit, unread_only=unread
+        )
+    return serialization.page_response(emails, next_cursor)
+
+@router.get("/counts", response_model=schemas.MailboxCounts)
+async def read_mailbox_counts(
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_read_db),
+    async_db: Optional[AsyncSession] = Depends(get_optional_async_db)
+):
+    """Total and unread email counts for the inbox badge."""
+    if async_db is not None:
+        total, unread = await async_crud.get_mailbox_counts(async_db, user_id=current_user.id)
+    else:
+        total, unread = await run_in_threadpool(crud.get_mailbox_counts, db, user_id=current_user.id)
+    return {"total": total, "unread": unread}
+
+@router.post("/mark-read", response_model=schemas.MarkReadResult)
+def mark_emails_read(
+    request: schemas.MarkReadRequest,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Mark many emails read (or unread with ``is_read=false``).
+    
+    Pass ``email_ids`` or ``all_emails=true``. IDs that are not the
+    user's, or already have the requested state, are ignored.
+    """
+    if request.email_ids is None and not request.all_emails:
+        raise HTTPException(status_code=400, detail="Provide email_ids or set all_emails")
+    email_ids = None if request.all_emails else request.email_ids
+    updated = crud.mark_emails_read(db, user_id=current_user.id, email_ids=email_ids, is_read=request.is_read)
+    _, unread = crud.get_mailbox_counts(db, user_id=current_user.id)
+    return {"updated": updated, "unread": unread}
+
+@router.post("/import", response_model=schemas.ImportReport)
+async def import_emails(
+    request: Request,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Bulk import emails from a streamed NDJSON or CSV body.
+    
+    Send ``Content-Type: application/x-ndjson`` with one JSON object per
+    line, or ``text/csv`` with a header row naming the fields. Each row is
+    validated like POST /emails/; valid rows are inserted in batches and
+    invalid ones are listed in the report by row number.
+    """
+    return await bulk_import.run_import(
+        request,
+        schemas.EmailCreate,
+        lambda rows: crud.bulk_create_emails(db, rows),
+        user_id=current_user.id
+    )
+
+@router.get("/{email_id}", response_model=schemas.Email)
+def read_email(
+    email_id: int,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    """Get a specific email."""
+    email = crud.get_email(db, email_id=email_id)
+    if email is None or email.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Email not found")
+    return email
+
+@router.post("/{email_id}/read", response_model=schemas.Email)
+def mark_email_read(
+    email_id: int,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Mark an email as read."""
+    email = crud.mark_email_read(db, email_id=email_id, user_id=current_user.id, is_read=True)
+    if email is None:
+        raise HTTPException(status_code=404, detail="Email not found")
+    return email
+
+@router.post("/{email_id}/unread", response_model=schemas.Email)
+def mark_email_unread(
+    email_id: int,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Mark an email as unread."""
+    email = crud.mark_email_read(db, email_id=email_id, user_id=current_user.id, is_read=False)
+    if email is None:
+        raise HTTPException(status_code=404, detail="Email not found")
+    return email
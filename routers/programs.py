@@ -0,0 +1,136 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime, timedelta
+
+import async_crud
+import crud
+import schemas
+import security
+import serialization
+from database import get_db, get_optional_async_db, get_read_db
+from services import bulk_import
+
+router = APIRouter(
+    prefix="/programs",
+    tags=["programs"],
+    responses={401: {"description": "Unauthorized"}},
+)
+
+@router.post("/", response_model=schemas.Program, status_code=status.HTTP_201_CREATED)
+def create_program(
+    program: schemas.ProgramCreate,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Create a program."""
+    return crud.create_program(db, program=program, user_id=current_user.id)
+
+@router.get("/", response_model=schemas.ProgramPage)
+async def read_programs(
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_read_db),
+    async_db: Optional[AsyncSession] = Depends(get_optional_async_db)
+):
+    """
+    Get the current user's programs, oldest first, one page at a time.
+    
+    Follow ``next_cursor`` from each response until it is null.
+    """
+    if async_db is not None:
+        programs, next_cursor = await async_crud.get_programs(
+            async_db, user_id=current_user.id, cursor=cursor, limit=limit
+        )
+    else:
+        programs, next_cursor = await run_in_threadpool(
+            crud.get_programs, db, user_id=current_user.id, cursor=cursor, limit=limit
+        )
+    return serialization.page_response(programs, next_cursor)
+
+@router.get("/upcoming", response_model=List[schemas.Program])
+def read_upcoming_deadlines(
+    days: int = 30,
+    limit: int = 100,
+    shortlisted: bool = False,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    """The current user's programs with deadlines in the next ``days`` days, soonest first."""
+    until = datetime.utcnow() + timedelta(days=max(0, days))
+    return crud.get_upcoming_deadlines(
+        db, user_id=current_user.id, until=until, limit=min(limit, 1000), shortlisted_only=shortlisted
+    )
+
+@router.get("/upcoming/global", response_model=List[schemas.DeadlineSummary])
+def read_global_upcoming_deadlines(
+    days: int = 30,
+    limit: int = 100,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    """Upcoming deadlines across all users, with how many users track each program."""
+    until = datetime.utcnow() + timedelta(days=max(0, days))
+    return crud.get_global_upcoming_deadlines(db, until=until, limit=min(limit, 1000))
+
+@router.post("/import", response_model=schemas.ImportReport)
+async def import_programs(
+    request: Request,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Bulk import programs from a streamed NDJSON or CSV body.
+    
+    Send ``Content-Type: application/x-ndjson`` with one JSON object per
+    line, or ``text/csv`` with a header row naming the fields. Each row is
+    validated like POST /programs/; valid rows are inserted in batches and
+    invalid ones are listed in the report by row number.
+    """
+    return await bulk_import.run_import(
+        request,
+        schemas.ProgramCreate,
+        lambda rows: crud.bulk_create_programs(db, rows),
+        user_id=current_user.id
+    )
+
+@router.get("/{program_id}", response_model=schemas.Program)
+def read_program(
+    program_id: int,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    """Get a specific program."""
+    program = crud.get_program(db, program_id=program_id)
+    if program is None or program.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Program not found")
+    return program
+
+@router.patch("/{program_id}", response_model=schemas.Program)
+def update_program(
+    program_id: int,
+    program: schemas.ProgramUpdate,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Update a program; changing the deadline or shortlist reschedules its reminders."""
+    db_program = crud.get_program(db, program_id=program_id)
+    if db_program is None or db_program.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Program not found")
+    return crud.update_program(db, program_id=program_id, program=program)
+
+@router.delete("/{program_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_program(
+    program_id: int,
+    current_user: security.Principal = Depends(security.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Delete a program."""
+    program = crud.get_program(db, program_id=program_id)
+    if program is None or program.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Program not found")
+    crud.delete_program(db, program_id=program_id)
+    return None
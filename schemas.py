@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, validator
 from typing import Optional, List
+import json
 from datetime import datetime
 
 # Token schemas
@@ -36,13 +37,43 @@ class DocumentCreate(DocumentBase):
 
 class Document(DocumentBase):
     id: int
+    filename: Optional[str] = None
     file_path: str
+    size_bytes: Optional[int] = None
+    content_hash: Optional[str] = None
     created_at: datetime
     user_id: int
     
     class Config:
         orm_mode = True
 
+class DocumentPage(BaseModel):
+    items: List[Document]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page
+
+class DocumentVersion(BaseModel):
+    version: int
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+    size_bytes: Optional[int] = None
+    content_hash: Optional[str] = None
+    created_at: Optional[datetime] = None  # When this version was uploaded
+    is_current: bool = False
+
+class BulkDeleteRequest(BaseModel):
+    document_ids: Optional[List[int]] = None
+    all_documents: bool = False
+
+class BulkDeleteResult(BaseModel):
+    deleted: int
+
+class SearchResult(BaseModel):
+    document_id: int
+    title: str
+    filename: Optional[str] = None
+    score: float
+    snippet: Optional[str] = None  # Matching excerpt, hits wrapped in <mark>
+
 # Document Analysis schemas
 class DocumentAnalysisBase(BaseModel):
     document_id: int
@@ -55,7 +86,38 @@ class DocumentAnalysisCreate(DocumentAnalysisBase):
 
 class DocumentAnalysis(DocumentAnalysisBase):
     id: int
+    content_hash: Optional[str] = None
+    analyzer_version: Optional[str] = None
+    created_at: datetime
+    
+    # key_points is stored as a JSON string on the ORM model
+    @validator("key_points", pre=True)
+    def parse_key_points(cls, value):
+        if isinstance(value, str):
+            return json.loads(value) if value else []
+        return value
+    
+    class Config:
+        orm_mode = True
+
+class BatchAnalysisRequest(BaseModel):
+    document_ids: Optional[List[int]] = None
+    all_documents: bool = False  # Analyze every document of the current user
+    force: bool = False  # Recompute even if a cached analysis exists
+    analyzer_version: Optional[str] = None  # e.g. "tfidf-1"; defaults to the streaming analyzer
+
+# Job schemas
+class Job(BaseModel):
+    id: int
+    document_id: int
+    kind: str
+    status: str
+    attempts: int
+    max_attempts: int
+    error: Optional[str] = None
     created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
     
     class Config:
         orm_mode = True
@@ -79,6 +141,26 @@ class Program(ProgramBase):
     class Config:
         orm_mode = True
 
+class ProgramPage(BaseModel):
+    items: List[Program]
+    next_cursor: Optional[str] = None
+
+class ProgramUpdate(BaseModel):
+    name: Optional[str] = None
+    university: Optional[str] = None
+    description: Optional[str] = None
+    deadline: Optional[datetime] = None
+    is_shortlisted: Optional[bool] = None
+
+class DeadlineSummary(BaseModel):
+    university: str
+    name: str
+    deadline: datetime
+    users: int  # Users tracking this program
+    
+    class Config:
+        orm_mode = True
+
 # Email schemas
 class EmailBase(BaseModel):
     subject: str
@@ -97,3 +179,31 @@ class Email(EmailBase):
     
     class Config:
         orm_mode = True
+
+class EmailPage(BaseModel):
+    items: List[Email]
+    next_cursor: Optional[str] = None
+
+class MailboxCounts(BaseModel):
+    total: int
+    unread: int
+
+class MarkReadRequest(BaseModel):
+    email_ids: Optional[List[int]] = None
+    all_emails: bool = False
+    is_read: bool = True
+
+class MarkReadResult(BaseModel):
+    updated: int  # Emails whose flag changed
+    unread: int  # Unread count afterwards
+
+# Bulk import schemas
+class ImportRowError(BaseModel):
+    row: int  # 1-based; CSV rows are counted after the header
+    error: str
+
+class ImportReport(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ImportRowError]
+    errors_truncated: bool = False  # More rows failed than are listed
@@ -2,17 +2,37 @@ from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event
 from sqlalchemy.orm import Session
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+import asyncio
+import os
+import threading
+import time
 
 # Use absolute imports
 import database
 import models
 import schemas
+from cache import TTLCache
 
-# Password hashing configuration
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing configuration. Changing BCRYPT_ROUNDS makes existing
+# hashes "need update"; they are transparently re-hashed on next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# bcrypt runs on its own small executor so login bursts cannot starve the
+# threadpool serving every other endpoint. At most HASH_WORKERS hashes run
+# at once and HASH_MAX_PENDING may be running or queued; beyond that
+# requests fail fast with 503.
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", 2))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", 32))
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+_hash_slots = threading.BoundedSemaphore(max(HASH_MAX_PENDING, HASH_WORKERS))
 
 # JWT configuration
 SECRET_KEY = "YOUR_SECRET_KEY_HERE"  # In production, use environment variable
@@ -22,6 +42,74 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
+# Verified tokens are cached so most requests skip the user lookup. The
+# cache is per process: user writes are recorded in the user_changes
+# table, which every process polls at most every PRINCIPAL_SYNC_INTERVAL
+# seconds, so a user changed or deleted by another worker process stays
+# cached there for about that long (never longer than the TTL).
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", 60))  # Seconds
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
+PRINCIPAL_SYNC_INTERVAL = float(os.getenv("PRINCIPAL_SYNC_INTERVAL", 1))  # Seconds
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user, as needed by endpoints."""
+    id: int
+    email: str
+    is_active: bool
+
+# Raw token -> Principal
+principal_cache = TTLCache(PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+# Highest user_changes id applied to this process's cache
+_last_user_change = 0
+_next_user_sync = 0.0
+_user_sync_lock = threading.Lock()
+
+def invalidate_user(user_id: int) -> None:
+    """Drop cached principals for a user, e.g. after it was changed."""
+    principal_cache.discard_where(lambda token, principal: principal.id == user_id)
+
+def sync_user_changes(db: Session) -> int:
+    """
+    Drop cached principals of users changed since the last sync, in any process.
+
+    Returns:
+        Number of changes applied
+    """
+    global _last_user_change
+    changes = db.query(models.UserChange.id, models.UserChange.user_id).filter(
+        models.UserChange.id > _last_user_change
+    ).order_by(models.UserChange.id).all()
+    for _, user_id in changes:
+        invalidate_user(user_id)
+    if changes:
+        _last_user_change = changes[-1].id
+    return len(changes)
+
+def _maybe_sync_user_changes(db: Session) -> None:
+    global _next_user_sync
+    if time.monotonic() < _next_user_sync or not _user_sync_lock.acquire(blocking=False):
+        return
+    try:
+        sync_user_changes(db)
+        _next_user_sync = time.monotonic() + PRINCIPAL_SYNC_INTERVAL
+    finally:
+        _user_sync_lock.release()
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    invalidate_user(target.id)
+    # Other processes (and this one, once committed) pick the change up
+    # from the table; rows no cache entry can predate are pruned here
+    table = models.UserChange.__table__
+    now = datetime.utcnow()
+    connection.execute(table.delete().where(
+        table.c.created_at < now - timedelta(seconds=PRINCIPAL_CACHE_TTL + 60)
+    ))
+    connection.execute(table.insert().values(user_id=target.id, created_at=now))
+
 def verify_password(plain_password, hashed_password):
     """Verify a password against a hash."""
     return pwd_context.verify(plain_password, hashed_password)
@@ -30,6 +118,50 @@ def get_password_hash(password):
     """Generate a password hash."""
     return pwd_context.hash(password)
 
+async def run_password_hashing(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a bcrypt operation on the dedicated executor, or fail with 503 when saturated."""
+    if not _hash_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent login attempts, please retry",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_slots.release()
+
+async def get_password_hash_async(password: str) -> str:
+    """Generate a password hash without blocking the event loop."""
+    return await run_password_hashing(pwd_context.hash, password)
+
+async def authenticate_user_async(db: Session, email: str, password: str, read_db: Optional[Session] = None):
+    """
+    Authenticate a user by email and password off the request threadpool.
+    
+    The user is looked up through ``read_db`` when given, so no write
+    connection is held while bcrypt runs. If the stored hash uses outdated
+    parameters (e.g. fewer bcrypt rounds than BCRYPT_ROUNDS), it is
+    replaced with a fresh hash through ``db``.
+    """
+    lookup_db = read_db or db
+    user = await run_in_threadpool(
+        lambda: lookup_db.query(models.User).filter(models.User.email == email).first()
+    )
+    if not user:
+        return False
+    valid, new_hash = await run_password_hashing(pwd_context.verify_and_update, password, user.hashed_password)
+    if not valid:
+        return False
+    if new_hash:
+        def store_new_hash():
+            db.query(models.User).filter(models.User.id == user.id).update(
+                {models.User.hashed_password: new_hash}, synchronize_session=False
+            )
+            db.commit()
+        await run_in_threadpool(store_new_hash)
+    return user
+
 def authenticate_user(db: Session, email: str, password: str):
     """Authenticate a user by email and password."""
     user = db.query(models.User).filter(models.User.email == email).first()
@@ -50,8 +182,13 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_read_db)):
     """Get the current user from a JWT token."""
+    _maybe_sync_user_changes(db)
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -68,9 +205,16 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     user = db.query(models.User).filter(models.User.email == token_data.email).first()
     if user is None:
         raise credentials_exception
-    return user
+    
+    principal = Principal(id=user.id, email=user.email, is_active=user.is_active)
+    # Never cache a token beyond its own expiry
+    ttl = None
+    if payload.get("exp") is not None:
+        ttl = payload["exp"] - time.time()
+    principal_cache.set(token, principal, ttl=ttl)
+    return principal
 
-def get_current_active_user(current_user: schemas.User = Depends(get_current_user)):
+def get_current_active_user(current_user: Principal = Depends(get_current_user)):
     """Get the current active user."""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -0,0 +1,38 @@
+"""
+Fast response path for list endpoints.
+
+List routes query plain column rows instead of ORM objects and return
+them through FastJSONResponse, skipping per-item response_model
+validation. The response_model on those routes still documents the shape.
+"""
+import datetime
+import json
+from typing import Any, Iterable, Optional
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is the fallback
+    orjson = None
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    """Encode to JSON bytes, datetimes as ISO 8601 like FastAPI's encoder."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def page_response(rows: Iterable[Any], next_cursor: Optional[str]) -> FastJSONResponse:
+    """A ``{items, next_cursor}`` page built straight from column rows."""
+    return FastJSONResponse({"items": [row._asdict() for row in rows], "next_cursor": next_cursor})
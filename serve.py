@@ -0,0 +1,70 @@
+"""
+Production server: uvicorn with one worker process per CPU.
+
+The supervisor binds the socket once and starts WEB_CONCURRENCY workers
+that share it. Each worker exits after about MAX_REQUESTS requests
+(plus up to MAX_REQUESTS_JITTER, so they don't all restart together),
+finishing in-flight requests within GRACEFUL_TIMEOUT seconds, and the
+supervisor replaces it. Worker processes split the CPUs between their
+extraction jobs, and the jobs between their pdftotext processes, unless
+JOB_WORKERS or PDF_EXTRACT_WORKERS is set.
+
+Metrics are kept per process; with several workers, /metrics serves the
+snapshots every worker publishes to METRICS_DIR (a fresh temporary
+directory unless set), labelled by worker.
+
+    python serve.py
+"""
+import logging
+import os
+import shutil
+import tempfile
+
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 8000))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", 10000))  # Per worker before recycling; 0 disables
+MAX_REQUESTS_JITTER = int(os.getenv("MAX_REQUESTS_JITTER", 1000))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", 30))  # Seconds
+KEEP_ALIVE = int(os.getenv("KEEP_ALIVE", 5))  # Seconds
+
+def main():
+    workers = max(1, WEB_CONCURRENCY)
+    # Every worker runs its own extraction pool; don't start cpu_count of them each
+    os.environ.setdefault("JOB_WORKERS", str(max(1, (os.cpu_count() or 1) // workers)))
+    os.environ.setdefault("ANALYSIS_WORKERS", os.environ["JOB_WORKERS"])
+    # ... and each of their jobs runs its own pdftotext processes
+    os.environ.setdefault("PDF_EXTRACT_WORKERS", str(
+        max(1, (os.cpu_count() or 1) // (workers * max(1, int(os.environ["JOB_WORKERS"]))))
+    ))
+    # Each worker has its own metrics registry; share them through a directory
+    metrics_dir = None
+    if workers > 1 and "METRICS_DIR" not in os.environ:
+        metrics_dir = os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="metrics-")
+    elif workers > 1 and not os.environ["METRICS_DIR"]:
+        logger.warning("METRICS_DIR is empty: /metrics will only report the worker that answers each scrape")
+    try:
+        uvicorn.run(
+            "main:app",
+            host=HOST,
+            port=PORT,
+            workers=workers,
+            limit_max_requests=MAX_REQUESTS or None,
+            limit_max_requests_jitter=MAX_REQUESTS_JITTER if MAX_REQUESTS else 0,
+            timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+            timeout_keep_alive=KEEP_ALIVE,
+            proxy_headers=True,
+        )
+    finally:
+        if metrics_dir is not None:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
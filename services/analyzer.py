@@ -0,0 +1,253 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Type, Union
+
+# Bumped whenever the output of the default passes changes
+ANALYZER_VERSION = "stream-1"
+
+# Size of the slices long texts are cut into before tokenizing
+CHUNK_CHARS = 64 * 1024
+
+# Sentiment lexicons
+POSITIVE_WORDS = frozenset(["good", "great", "excellent", "positive", "success", "benefit", "advantage"])
+NEGATIVE_WORDS = frozenset(["bad", "poor", "negative", "failure", "problem", "disadvantage", "issue"])
+
+class AnalysisPass:
+    """
+    One metric computed over the shared token stream.
+
+    The engine tokenizes the text once and feeds every pass, in order:
+
+    - ``tokens(batch)``: whitespace-delimited tokens, in batches
+    - ``sentence(words)``: the words of each non-empty sentence, where
+      sentences are split on "." (only called if ``wants_sentences``)
+
+    ``result()`` returns the keys the pass contributes to the analysis.
+    Passes are instantiated per analysis, so they may keep state.
+
+    Passes are also mergeable: ``state()`` returns the JSON-serializable
+    partial result for one piece of a text, and ``absorb(state)`` folds in
+    the states of consecutive pieces, in order, so that ``result()`` is the
+    same as for the whole text (pieces must be cut at sentence ends).
+    """
+    wants_tokens = False
+    wants_sentences = False
+
+    def tokens(self, batch: List[str]) -> None:
+        pass
+
+    def sentence(self, words: List[str]) -> None:
+        pass
+
+    def result(self) -> Dict[str, Any]:
+        return {}
+
+    def state(self) -> Dict[str, Any]:
+        return {}
+
+    def absorb(self, state: Dict[str, Any]) -> None:
+        pass
+
+class WordCountPass(AnalysisPass):
+    """Number of whitespace-delimited words."""
+    wants_tokens = True
+
+    def __init__(self):
+        self.count = 0
+
+    def tokens(self, batch: List[str]) -> None:
+        self.count += len(batch)
+
+    def result(self) -> Dict[str, Any]:
+        return {"word_count": self.count}
+
+    def state(self) -> Dict[str, Any]:
+        return {"count": self.count}
+
+    def absorb(self, state: Dict[str, Any]) -> None:
+        self.count += state["count"]
+
+class SentimentPass(AnalysisPass):
+    """Lexicon-based sentiment: positive/negative if one side dominates 2:1."""
+    wants_tokens = True
+
+    def __init__(self):
+        self.positive = 0
+        self.negative = 0
+
+    def tokens(self, batch: List[str]) -> None:
+        lowered = list(map(str.lower, batch))
+        self.positive += sum(map(POSITIVE_WORDS.__contains__, lowered))
+        self.negative += sum(map(NEGATIVE_WORDS.__contains__, lowered))
+
+    def result(self) -> Dict[str, Any]:
+        sentiment = "neutral"
+        if self.positive > self.negative * 2:
+            sentiment = "positive"
+        elif self.negative > self.positive * 2:
+            sentiment = "negative"
+        return {"sentiment": sentiment}
+
+    def state(self) -> Dict[str, Any]:
+        return {"positive": self.positive, "negative": self.negative}
+
+    def absorb(self, state: Dict[str, Any]) -> None:
+        self.positive += state["positive"]
+        self.negative += state["negative"]
+
+class KeyPointsPass(AnalysisPass):
+    """The first few sentences longer than ``min_words`` words."""
+    wants_sentences = True
+
+    def __init__(self, limit: int = 5, min_words: int = 10):
+        self.limit = limit
+        self.min_words = min_words
+        self.points: List[str] = []
+
+    def sentence(self, words: List[str]) -> None:
+        if len(self.points) < self.limit and len(words) > self.min_words:
+            self.points.append(" ".join(words))
+
+    def result(self) -> Dict[str, Any]:
+        return {"key_points": self.points}
+
+    def state(self) -> Dict[str, Any]:
+        return {"points": self.points}
+
+    def absorb(self, state: Dict[str, Any]) -> None:
+        self.points.extend(state["points"][:self.limit - len(self.points)])
+
+class SummaryPass(AnalysisPass):
+    """First sentence followed by the last one."""
+    wants_sentences = True
+
+    def __init__(self):
+        self.first: Optional[str] = None
+        self.last: Optional[str] = None
+
+    def sentence(self, words: List[str]) -> None:
+        if self.first is None:
+            self.first = " ".join(words)
+        else:
+            self.last = words
+
+    def result(self) -> Dict[str, Any]:
+        summary = ""
+        if self.first is not None:
+            summary = self.first
+            if self.last is not None:
+                summary += " " + self._last()
+        return {"summary": summary}
+
+    def state(self) -> Dict[str, Any]:
+        return {"first": self.first, "last": None if self.last is None else self._last()}
+
+    def absorb(self, state: Dict[str, Any]) -> None:
+        if state["first"] is None:
+            return
+        if self.first is None:
+            self.first, self.last = state["first"], state["last"]
+        else:
+            self.last = state["last"] if state["last"] is not None else state["first"]
+
+    def _last(self) -> str:
+        # Joined lazily: every sentence passes through here on the way
+        return self.last if isinstance(self.last, str) else " ".join(self.last)
+
+DEFAULT_PASSES: Sequence[Type[AnalysisPass]] = (WordCountPass, KeyPointsPass, SummaryPass, SentimentPass)
+
+def iter_chunks(text: Union[str, Iterable[str]], chunk_chars: int = CHUNK_CHARS) -> Iterator[str]:
+    """Cut a text, or a stream of text pieces, into bounded slices."""
+    pieces = (text,) if isinstance(text, str) else text
+    for piece in pieces:
+        for start in range(0, len(piece), chunk_chars):
+            yield piece[start:start + chunk_chars]
+
+class Analyzer:
+    """
+    Single-pass streaming analyzer.
+
+    The text is consumed chunk by chunk; tokens and sentences that straddle
+    a chunk boundary are carried over, so memory stays bounded by the
+    chunk size plus the longest sentence no matter how large the document.
+    """
+
+    def __init__(self, passes: Sequence[Type[AnalysisPass]] = DEFAULT_PASSES):
+        self.passes = passes
+
+    def analyze(self, text: Union[str, Iterable[str]]) -> Dict[str, Any]:
+        """
+        Run every pass over a text.
+
+        Args:
+            text: The full text, or an iterable of consecutive pieces of it
+                (e.g. pages from the text store)
+
+        Returns:
+            The merged results of all passes
+        """
+        results: Dict[str, Any] = {}
+        for p in self._run(text):
+            results.update(p.result())
+        return results
+
+    def partial(self, text: Union[str, Iterable[str]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Mergeable per-pass states for one piece of a text.
+
+        Returns:
+            Pass class name -> state, for ``merge``
+        """
+        return {type(p).__name__: p.state() for p in self._run(text)}
+
+    def merge(self, partials: Iterable[Dict[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Combine the ``partial`` states of consecutive pieces of a text.
+
+        The result equals ``analyze`` of the whole text as long as every
+        piece but the last ends at a sentence end.
+        """
+        passes = [factory() for factory in self.passes]
+        for partial in partials:
+            for p in passes:
+                p.absorb(partial[type(p).__name__])
+        results: Dict[str, Any] = {}
+        for p in passes:
+            results.update(p.result())
+        return results
+
+    def _run(self, text: Union[str, Iterable[str]]) -> List[AnalysisPass]:
+        passes = [factory() for factory in self.passes]
+        token_passes = [p for p in passes if p.wants_tokens]
+        sentence_passes = [p for p in passes if p.wants_sentences]
+
+        token_carry = ""
+        sentence_carry = ""
+        for chunk in iter_chunks(text):
+            if token_passes:
+                batch = (token_carry + chunk).split()
+                # A chunk that does not end in whitespace may end mid-token
+                token_carry = batch.pop() if batch and not chunk[-1].isspace() else ""
+                for p in token_passes:
+                    p.tokens(batch)
+
+            if sentence_passes:
+                segments = (sentence_carry + chunk).split(".")
+                sentence_carry = segments.pop()
+                for segment in segments:
+                    self._sentence(sentence_passes, segment)
+
+        if token_passes and token_carry:
+            for p in token_passes:
+                p.tokens([token_carry])
+        if sentence_passes and sentence_carry:
+            self._sentence(sentence_passes, sentence_carry)
+        return passes
+
+    @staticmethod
+    def _sentence(sentence_passes: List[AnalysisPass], segment: str) -> None:
+        words = segment.split()
+        if words:
+            for p in sentence_passes:
+                p.sentence(words)
+
+# Default engine used by analyze_document
+default_analyzer = Analyzer()
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import metrics
+from services.document_service import analyze_document, analyze_ranges
+
+# Number of processes used by batch analysis
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", os.cpu_count() or 1))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def get_pool() -> ProcessPoolExecutor:
+    """The shared analysis pool, created on first use."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=max(1, ANALYSIS_WORKERS),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+def shutdown_pool() -> None:
+    """Stop the analysis pool, if it was started."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+def _in_worker(function: Callable[..., Any], *args) -> tuple:
+    """Run an analysis function in a pool process, returning its stage timings too."""
+    with metrics.capture_stages() as samples:
+        try:
+            return function(*args), samples
+        except Exception as e:
+            e.stage_samples = samples
+            raise
+
+def ndjson(record: Dict[str, Any]) -> bytes:
+    """Encode one newline-delimited JSON record."""
+    return (json.dumps(record) + "\n").encode("utf-8")
+
+async def analyze_many(documents: List[Any], plans: Optional[Dict[str, Any]] = None) -> AsyncIterator[tuple]:
+    """
+    Analyze documents in parallel on the process pool.
+
+    Documents with identical content are analyzed once. Results are
+    yielded as soon as each distinct file finishes, not in input order.
+
+    Args:
+        documents: Objects with ``id``, ``file_path``, ``content_type``
+            and ``content_hash`` attributes
+        plans: Content hash -> chunk_analysis.ChunkPlan; those blobs only
+            have their missing chunks analyzed (the plans collect the new
+            chunk states for the caller to save)
+
+    Yields:
+        Tuples of (document, analysis result or None, error message or None)
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+
+    # Group documents sharing a blob so each file is analyzed once
+    groups: Dict[str, List[Any]] = {}
+    for document in documents:
+        groups.setdefault(document.content_hash or f"document:{document.id}", []).append(document)
+
+    async def run(group: List[Any]) -> tuple:
+        first = group[0]
+        plan = (plans or {}).get(first.content_hash)
+        try:
+            if plan is None:
+                result, samples = await loop.run_in_executor(
+                    pool, _in_worker, analyze_document, first.file_path, first.content_type
+                )
+            else:
+                samples = ()
+                if plan.missing:
+                    states, samples = await loop.run_in_executor(
+                        pool, _in_worker, analyze_ranges, first.file_path, plan.ranges
+                    )
+                    plan.add(states)
+                result = plan.result()
+            metrics.observe_stages(samples)
+            return group, result, None
+        except Exception as e:
+            metrics.observe_stages(getattr(e, "stage_samples", ()))
+            return group, None, f"{type(e).__name__}: {e}"
+
+    for completed in asyncio.as_completed([run(group) for group in groups.values()]):
+        group, result, error = await completed
+        for document in group:
+            yield document, result, error
@@ -0,0 +1,146 @@
+import codecs
+import csv
+import json
+import os
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Type
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+
+# Bulk import configuration
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))  # Rows per INSERT transaction
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", 1000))  # Row errors reported in full
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines")
+CSV_TYPES = ("text/csv", "application/csv")
+
+def import_format(request: Request) -> str:
+    """Pick "ndjson" or "csv" from the Content-Type header."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_TYPES:
+        return "ndjson"
+    if content_type in CSV_TYPES:
+        return "csv"
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail="Send NDJSON (application/x-ndjson) or CSV (text/csv)"
+    )
+
+async def iter_lines(request: Request) -> AsyncIterator[str]:
+    """Decode the request body as UTF-8 and yield it line by line as it arrives."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+async def iter_records(request: Request, fmt: str) -> AsyncIterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    Parse the streamed body into records.
+
+    Yields:
+        Tuples of (1-based row number, record or None, parse error or None).
+        CSV rows are numbered after the header line.
+    """
+    row = 0
+    if fmt == "ndjson":
+        async for line in iter_lines(request):
+            if not line.strip():
+                continue
+            row += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield row, None, "Expected a JSON object"
+                continue
+            yield row, record, None
+        return
+
+    header: Optional[List[str]] = None
+    buffered = ""
+    async for line in iter_lines(request):
+        # A quoted field may contain newlines; wait for its closing quote
+        buffered = f"{buffered}\n{line}" if buffered else line
+        if buffered.count('"') % 2:
+            continue
+        text, buffered = buffered, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row += 1
+        if len(values) != len(header):
+            yield row, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        # Empty cells mean "not set" so optional fields fall back to defaults
+        yield row, {name: value for name, value in zip(header, values) if value != ""}, None
+    if buffered:
+        yield row + 1, None, "Unterminated quoted field"
+
+def format_validation_error(error: ValidationError) -> str:
+    """One-line summary of a pydantic validation error."""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+    )
+
+async def run_import(
+    request: Request,
+    schema: Type[BaseModel],
+    save_batch: Callable[[List[Dict[str, Any]]], int],
+    **fields: Any
+) -> Dict[str, Any]:
+    """
+    Stream, validate and insert rows in batches.
+
+    Rows are validated against ``schema`` as they arrive and flushed to
+    ``save_batch`` (run on the threadpool) every IMPORT_BATCH_SIZE rows, so
+    memory stays bounded whatever the body size. Invalid rows are skipped
+    and reported; valid rows are imported.
+
+    Args:
+        request: Request whose body holds NDJSON or CSV rows
+        schema: Pydantic model every row must satisfy
+        save_batch: Inserts a list of row dicts in one transaction
+        **fields: Extra column values added to every row (e.g. user_id)
+
+    Returns:
+        Import report: counts and per-row errors
+    """
+    fmt = import_format(request)
+    report: Dict[str, Any] = {"imported": 0, "failed": 0, "errors": [], "errors_truncated": False}
+    batch: List[Dict[str, Any]] = []
+
+    def fail(row: int, message: str) -> None:
+        report["failed"] += 1
+        if len(report["errors"]) < IMPORT_MAX_ERRORS:
+            report["errors"].append({"row": row, "error": message})
+        else:
+            report["errors_truncated"] = True
+
+    async for row, record, error in iter_records(request, fmt):
+        if error is not None:
+            fail(row, error)
+            continue
+        try:
+            item = schema(**record)
+        except ValidationError as e:
+            fail(row, format_validation_error(e))
+            continue
+        batch.append({**item.dict(), **fields})
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            report["imported"] += await run_in_threadpool(save_batch, batch)
+            batch = []
+    if batch:
+        report["imported"] += await run_in_threadpool(save_batch, batch)
+    return report
@@ -0,0 +1,75 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+import crud
+from services import analyzer, chunking
+from services.analyzer import ANALYZER_VERSION
+from services.document_service import analyze_ranges
+
+@dataclass
+class ChunkPlan:
+    """
+    What it takes to analyze a blob chunk by chunk.
+
+    ``states`` holds the stored analyzer state of every chunk analyzed
+    before (by any document or version containing it); only ``missing``
+    chunks have to be analyzed before the states are merged.
+    """
+    chunk_hashes: List[str]  # In text order
+    states: Dict[str, Dict[str, Any]]
+    missing: Dict[str, Tuple[int, int]]  # Chunk hash -> character range
+    new_states: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    @property
+    def ranges(self) -> List[Tuple[int, int]]:
+        """Character ranges to analyze, matching ``missing``."""
+        return list(self.missing.values())
+
+    def add(self, states: List[Dict[str, Any]]) -> None:
+        """Record the states of the ``ranges``, in order."""
+        for chunk_hash, state in zip(self.missing, states):
+            self.states[chunk_hash] = state
+            self.new_states[chunk_hash] = state
+
+    def result(self) -> Dict[str, Any]:
+        """The document-level analysis."""
+        return analyzer.default_analyzer.merge(self.states[chunk_hash] for chunk_hash in self.chunk_hashes)
+
+def plan(db: Session, content_hash: str, file_path: str) -> Optional[ChunkPlan]:
+    """
+    Look up which chunks of a blob still need analyzing.
+
+    Args:
+        db: Database session (write; chunks are recorded on first use)
+        content_hash: The blob
+        file_path: Blob path
+
+    Returns:
+        The plan, or None when the blob has no extracted text yet
+    """
+    chunks = chunking.ensure_chunks(db, content_hash, file_path)
+    if not chunks:
+        return None
+    states = crud.get_chunk_states(db, {chunk.chunk_hash for chunk in chunks}, ANALYZER_VERSION)
+    missing = {}
+    for chunk in chunks:
+        if chunk.chunk_hash not in states:
+            missing.setdefault(chunk.chunk_hash, (chunk.start, chunk.end))
+    return ChunkPlan([chunk.chunk_hash for chunk in chunks], states, missing)
+
+def analyze(chunk_plan: ChunkPlan, file_path: str) -> Dict[str, Any]:
+    """Analyze the missing chunks in this process and merge all states."""
+    if chunk_plan.missing:
+        chunk_plan.add(analyze_ranges(file_path, chunk_plan.ranges))
+    return chunk_plan.result()
+
+def save(db: Session, plans: List[ChunkPlan]) -> int:
+    """Store the chunk states computed for the given plans, and commit."""
+    states = {}
+    for chunk_plan in plans:
+        states.update(chunk_plan.new_states)
+    if not states:
+        return 0
+    return crud.save_chunk_states(db, states, ANALYZER_VERSION)
@@ -0,0 +1,93 @@
+import hashlib
+import os
+import re
+import zlib
+from typing import Iterable, Iterator, List, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+from services import text_store
+
+# Chunking configuration
+CHUNK_MIN_CHARS = int(os.getenv("CHUNK_MIN_CHARS", 512))
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", 8192))  # Cut at the next sentence end past this
+CHUNK_SENTENCES = int(os.getenv("CHUNK_SENTENCES", 8))  # Average sentences per chunk past the minimum
+
+# A "." followed by whitespace: the only places text is cut, so that no
+# token or sentence ever straddles two chunks
+SENTENCE_END = re.compile(r"\.(?=\s)")
+
+def split_text(pieces: Iterable[str]) -> Iterator[Tuple[int, int, str]]:
+    """
+    Cut a text into content-defined chunks.
+
+    Whether a sentence closes a chunk depends only on the sentence itself
+    (and the chunk being at least CHUNK_MIN_CHARS long), so an edit only
+    changes the chunks around it: boundaries before and after it fall in
+    the same places as in the previous version. A text without sentence
+    ends is a single chunk.
+
+    Args:
+        pieces: Consecutive pieces of the text (e.g. text store pages)
+
+    Yields:
+        (start, end, sha256 of the chunk text) in text order
+    """
+    digest = hashlib.sha256()
+    start = 0  # Where the current chunk starts
+    consumed = 0  # Offset of pending[0] in the text
+    pending = ""  # Text since the last sentence end
+    for piece in pieces:
+        pending += piece
+        # A "." at the very end is matched once the next piece shows what follows
+        sentence = 0
+        for match in SENTENCE_END.finditer(pending):
+            cut = match.end()
+            data = pending[sentence:cut].encode("utf-8")
+            digest.update(data)
+            sentence = cut
+            end = consumed + cut
+            if end - start >= CHUNK_MIN_CHARS and (
+                zlib.crc32(data) % CHUNK_SENTENCES == 0 or end - start >= CHUNK_MAX_CHARS
+            ):
+                yield start, end, digest.hexdigest()
+                digest = hashlib.sha256()
+                start = end
+        consumed += sentence
+        pending = pending[sentence:]
+    if pending:
+        digest.update(pending.encode("utf-8"))
+    if consumed + len(pending) > start:
+        yield start, consumed + len(pending), digest.hexdigest()
+
+def get_chunks(db: Session, content_hash: str) -> List[models.BlobChunk]:
+    """The recorded chunks of a blob, in text order."""
+    return db.query(models.BlobChunk).filter(
+        models.BlobChunk.content_hash == content_hash
+    ).order_by(models.BlobChunk.position).all()
+
+def ensure_chunks(db: Session, content_hash: str, file_path: str) -> List[models.BlobChunk]:
+    """
+    Get the chunks of a blob, splitting its extracted text on first use.
+
+    Commits the new rows. Returns an empty list while the blob has no
+    extracted text.
+    """
+    chunks = get_chunks(db, content_hash)
+    if chunks or not text_store.has_text(file_path):
+        return chunks
+    rows = [
+        {"content_hash": content_hash, "position": position, "chunk_hash": chunk_hash, "start": start, "end": end}
+        for position, (start, end, chunk_hash) in enumerate(split_text(text_store.iter_text(file_path)))
+    ]
+    if rows:
+        try:
+            db.execute(insert(models.BlobChunk), rows)
+            db.commit()
+        except IntegrityError:
+            # Split concurrently by another request; the rows are identical
+            db.rollback()
+    return get_chunks(db, content_hash)
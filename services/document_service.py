@@ -1,52 +1,340 @@
+import codecs
+import logging
 import os
-import shutil
-from typing import Dict, List, Any
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 import json
 
-def process_document(file_path: str, content_type: str) -> None:
+import metrics
+from services import analyzer, text_store
+
+try:
+    import resource
+except ImportError:  # Not on Windows; pdftotext runs without a memory ceiling there
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on a single pdftotext run, in seconds
+PDFTOTEXT_TIMEOUT = float(os.getenv("PDFTOTEXT_TIMEOUT", 120))
+
+# Page-parallel PDF extraction. Up to JOB_WORKERS documents are extracted
+# at once, so by default each gets its share of the CPUs rather than all
+# of them (see job_queue.JOB_WORKERS; read here to avoid a circular import)
+_JOB_WORKERS = int(os.getenv("JOB_WORKERS", os.cpu_count() or 1))
+PDF_EXTRACT_WORKERS = int(os.getenv(
+    "PDF_EXTRACT_WORKERS", max(1, (os.cpu_count() or 1) // max(1, _JOB_WORKERS))
+))  # pdftotext processes per document
+PDF_PAGES_PER_RANGE = int(os.getenv("PDF_PAGES_PER_RANGE", 16))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 32))  # Smaller PDFs use a single process
+PDF_EXTRACT_MEMORY_MB = int(os.getenv("PDF_EXTRACT_MEMORY_MB", 0))  # Shared by the processes of a document; 0 = no ceiling
+
+_PDF_PAGES = re.compile(rb"^Pages:\s+(\d+)", re.MULTILINE)
+
+def extract_pages(file_path: str, content_type: str, failed_pages: Optional[List[int]] = None) -> Iterator[str]:
+    """
+    Extract the text of a document page by page.
+    
+    PDF pages keep their trailing form feed and plain text is cut into
+    TEXT_PAGE_CHARS pieces, so joining the pages gives back the full text.
+    Other content types yield nothing.
+    
+    Args:
+        file_path: Path to the uploaded file
+        content_type: MIME type of the file
+        failed_pages: Receives the (1-based) numbers of PDF pages that
+            could not be extracted; they are stored as empty pages
+    """
+    if content_type == "application/pdf":
+        # For PDFs, use poppler-utils to extract text
+        yield from _timed("pdftotext", _extract_pdf(file_path, failed_pages))
+    
+    elif content_type and content_type.startswith("text/"):
+        # For text files, read directly
+        with open(file_path, "r", encoding="utf-8") as f:
+            while True:
+                page = f.read(text_store.TEXT_PAGE_CHARS)
+                if not page:
+                    break
+                yield page
+
+def _extract_pdf(file_path: str, failed_pages: Optional[List[int]]) -> Iterator[str]:
+    page_count = pdf_page_count(file_path)
+    if page_count is not None and page_count >= PDF_PARALLEL_MIN_PAGES:
+        yield from _extract_pdf_parallel(file_path, page_count, failed_pages)
+    else:
+        yield from _extract_pdf_stream(file_path)
+
+def _timed(name: str, pages: Iterator[str]) -> Iterator[str]:
+    """
+    Pass pages through, recording stage ``name`` for the time spent
+    producing them only: time the consumer holds a page is not counted.
+    """
+    elapsed = 0.0
+    failed = False
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                page = next(pages)
+            except StopIteration:
+                break
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                elapsed += time.perf_counter() - start
+            yield page
+    finally:
+        pages.close()
+        metrics.record_stage(name, elapsed, failed)
+
+def pdf_page_count(file_path: str) -> Optional[int]:
+    """Number of pages according to pdfinfo, or None if it cannot tell."""
+    try:
+        output = subprocess.run(
+            ["pdfinfo", file_path], capture_output=True, timeout=PDFTOTEXT_TIMEOUT, check=True
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = _PDF_PAGES.search(output)
+    return int(match.group(1)) if match else None
+
+def _split_pages(text: str) -> Iterator[str]:
+    """pdftotext output as pages, each keeping its trailing form feed."""
+    pages = text.split("\f")
+    for page in pages[:-1]:
+        yield page + "\f"
+    if pages[-1]:
+        yield pages[-1]
+
+def _memory_limit(processes: int):
+    """preexec_fn capping each of ``processes`` pdftotext runs to its share of PDF_EXTRACT_MEMORY_MB."""
+    if resource is None or PDF_EXTRACT_MEMORY_MB <= 0:
+        return None
+    limit = PDF_EXTRACT_MEMORY_MB * 1024 * 1024 // max(1, processes)
+    return lambda: resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _extract_pdf_stream(file_path: str) -> Iterator[str]:
+    """One pdftotext process for the whole file, read page by page as it writes."""
+    process = subprocess.Popen(
+        ["pdftotext", file_path, "-"], stdout=subprocess.PIPE, preexec_fn=_memory_limit(1)
+    )
+    # Enforce the timeout without buffering the whole output
+    watchdog = threading.Timer(PDFTOTEXT_TIMEOUT, process.kill)
+    watchdog.start()
+    try:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        carry = ""
+        for data in iter(lambda: process.stdout.read(64 * 1024), b""):
+            pages = (carry + decoder.decode(data)).split("\f")
+            carry = pages.pop()
+            for page in pages:
+                yield page + "\f"
+        carry += decoder.decode(b"", final=True)
+        if process.wait() != 0:
+            if not watchdog.is_alive():
+                raise subprocess.TimeoutExpired(process.args, PDFTOTEXT_TIMEOUT)
+            raise subprocess.CalledProcessError(process.returncode, process.args)
+        if carry:
+            yield carry
+    finally:
+        watchdog.cancel()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+class _PageRange:
+    """A pdftotext run over pages ``first``..``last`` into a scratch file."""
+
+    def __init__(self, file_path: str, first: int, last: int, scratch: str, preexec_fn):
+        self.file_path = file_path
+        self.first = first
+        self.last = last
+        self.output = os.path.join(scratch, f"{first}-{last}.txt")
+        self.preexec_fn = preexec_fn
+        self.deadline = None
+        self.process = None  # Not started yet
+
+    def start(self) -> None:
+        self.deadline = time.monotonic() + PDFTOTEXT_TIMEOUT
+        self.process = subprocess.Popen(
+            ["pdftotext", "-f", str(self.first), "-l", str(self.last), self.file_path, self.output],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, preexec_fn=self.preexec_fn
+        )
+
+    def running(self) -> bool:
+        if self.process is None or self.process.poll() is not None:
+            return False
+        if time.monotonic() > self.deadline:
+            self.process.kill()
+            self.process.wait()
+            return False
+        return True
+
+    def done(self) -> bool:
+        return self.process is not None and not self.running()
+
+    def text(self) -> Optional[str]:
+        """The extracted text, or None if the run failed or produced too few pages."""
+        if self.process.returncode != 0:
+            return None
+        with open(self.output, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        os.remove(self.output)
+        return text if text.count("\f") == self.last - self.first + 1 else None
+
+def _extract_pdf_parallel(file_path: str, page_count: int, failed_pages: Optional[List[int]]) -> Iterator[str]:
+    """
+    Extract page ranges of a PDF concurrently, yielding pages in order.
+
+    Up to PDF_EXTRACT_WORKERS pdftotext processes run at once, each over
+    PDF_PAGES_PER_RANGE pages, writing to a scratch file; ranges finished
+    ahead of the one being streamed wait on disk rather than in memory. A
+    range that fails is retried page by page, through the same pool, so
+    one bad page only loses itself, stored as an empty page.
+    """
+    ranges = deque(
+        (first, min(first + PDF_PAGES_PER_RANGE - 1, page_count))
+        for first in range(1, page_count + 1, PDF_PAGES_PER_RANGE)
+    )
+    workers = max(1, min(PDF_EXTRACT_WORKERS, len(ranges)))
+    preexec_fn = _memory_limit(workers)
+    failed = []
+    outstanding: deque = deque()
+    with tempfile.TemporaryDirectory(prefix="pdftotext-") as scratch:
+        def top_up():
+            # Keep ``workers`` processes busy, with at most as many
+            # finished ranges again waiting for their turn; page retries
+            # queued at the front start first
+            running = sum(1 for page_range in outstanding if page_range.running())
+            for page_range in outstanding:
+                if running >= workers:
+                    return
+                if page_range.process is None:
+                    page_range.start()
+                    running += 1
+            while ranges and running < workers and len(outstanding) < 2 * workers:
+                page_range = _PageRange(file_path, *ranges.popleft(), scratch, preexec_fn)
+                page_range.start()
+                outstanding.append(page_range)
+                running += 1
+
+        try:
+            top_up()
+            while outstanding:
+                head = outstanding[0]
+                if not head.done():
+                    if head.process is None:
+                        # Waiting for a free worker
+                        time.sleep(0.05)
+                    else:
+                        try:
+                            head.process.wait(timeout=0.05)
+                        except subprocess.TimeoutExpired:
+                            pass
+                    top_up()
+                    continue
+                outstanding.popleft()
+                text = head.text()
+                if text is None and head.first == head.last:
+                    failed.append(head.first)
+                    text = "\f"
+                if text is None:
+                    # Isolate the failure to the pages that cause it
+                    outstanding.extendleft(
+                        _PageRange(file_path, number, number, scratch, preexec_fn)
+                        for number in range(head.last, head.first - 1, -1)
+                    )
+                    top_up()
+                    continue
+                top_up()
+                yield from _split_pages(text)
+        finally:
+            for page_range in outstanding:
+                if page_range.process is None:
+                    continue
+                if page_range.process.poll() is None:
+                    page_range.process.kill()
+                page_range.process.wait()
+    if failed:
+        logger.warning("pdftotext failed on %d of %d pages of %s", len(failed), page_count, file_path)
+        if failed_pages is not None:
+            failed_pages.extend(failed)
+        if len(failed) == page_count:
+            raise RuntimeError(f"pdftotext failed on every page of {file_path}")
+
+def process_document(file_path: str, content_type: str) -> Dict[str, Any]:
     """
     Process a document after upload.
     
     This function handles initial document processing like:
-    - Extracting text content
+    - Extracting text content into the compressed text store
     - Generating metadata
-    - Creating thumbnails (for images)
     
     Args:
         file_path: Path to the uploaded file
         content_type: MIME type of the file
+        
+    Returns:
+        Metadata about the processed file, including "page_count" (and
+        "failed_pages" for PDF pages that could not be extracted) or
+        "extraction_error"
     """
-    # Create a metadata file for the document
     metadata = {
         "file_path": file_path,
         "content_type": content_type,
         "size_bytes": os.path.getsize(file_path),
-        "created_at": os.path.getctime(file_path),
-        "modified_at": os.path.getmtime(file_path),
     }
     
-    # Extract text based on content type
-    if content_type == "application/pdf":
-        # For PDFs, use poppler-utils to extract text
-        try:
-            import subprocess
-            output = subprocess.check_output(["pdftotext", file_path, "-"])
-            metadata["extracted_text"] = output.decode("utf-8", errors="replace")
-        except Exception as e:
-            metadata["extraction_error"] = str(e)
+    # Extract text based on content type, streaming it page by page
+    failed_pages: List[int] = []
+    try:
+        with metrics.stage("extract"):
+            metadata["page_count"] = text_store.write_text(
+                file_path, extract_pages(file_path, content_type, failed_pages)
+            )
+        if failed_pages:
+            metadata["failed_pages"] = failed_pages
+    except Exception as e:
+        metadata["extraction_error"] = str(e)
     
-    elif content_type.startswith("text/"):
-        # For text files, read directly
+    return metadata
+
+def has_extracted_text(file_path: str) -> bool:
+    """Check whether text has already been extracted for a file."""
+    return text_store.has_text(file_path)
+
+def load_text(file_path: str, content_type: str) -> str:
+    """
+    Get the extracted text of a document.
+    
+    Reads the text store (or the LRU for hot documents), falls back to
+    the .metadata.json sidecar written by older versions, and extracts
+    on the spot as a last resort.
+    """
+    extracted_text = text_store.read_text(file_path)
+    
+    if extracted_text is None:
+        metadata_path = f"{file_path}.metadata.json"
+        if os.path.exists(metadata_path):
+            with open(metadata_path, "r") as f:
+                extracted_text = json.load(f).get("extracted_text", "")
+    
+    # If no extracted text is stored, try to extract it now
+    if not extracted_text:
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                metadata["extracted_text"] = f.read()
-        except Exception as e:
-            metadata["extraction_error"] = str(e)
+            extracted_text = "".join(extract_pages(file_path, content_type))
+        except Exception:
+            extracted_text = ""
     
-    # Save metadata to a JSON file alongside the original
-    metadata_path = f"{file_path}.metadata.json"
-    with open(metadata_path, "w") as f:
-        json.dump(metadata, f, indent=2)
+    return extracted_text
 
 def analyze_document(file_path: str, content_type: str) -> Dict[str, Any]:
     """
@@ -59,69 +347,27 @@ def analyze_document(file_path: str, content_type: str) -> Dict[str, Any]:
     Returns:
         Dictionary containing analysis results
     """
-    # Check if metadata exists
-    metadata_path = f"{file_path}.metadata.json"
-    extracted_text = ""
-    
-    if os.path.exists(metadata_path):
-        with open(metadata_path, "r") as f:
-            metadata = json.load(f)
-            extracted_text = metadata.get("extracted_text", "")
-    
-    # If no extracted text in metadata, try to extract it now
-    if not extracted_text and content_type == "application/pdf":
-        try:
-            import subprocess
-            output = subprocess.check_output(["pdftotext", file_path, "-"])
-            extracted_text = output.decode("utf-8", errors="replace")
-        except Exception:
-            pass
-    
-    elif not extracted_text and content_type.startswith("text/"):
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                extracted_text = f.read()
-        except Exception:
-            pass
-    
-    # Perform basic analysis
-    word_count = len(extracted_text.split())
-    
-    # Extract key points (simple implementation)
-    sentences = [s.strip() for s in extracted_text.replace("\n", " ").split(".") if s.strip()]
-    key_points = []
-    
-    # Get sentences that might be important (longer sentences)
-    for sentence in sentences:
-        if len(sentence.split()) > 10:  # Arbitrary threshold
-            key_points.append(sentence)
-    
-    # Limit to top 5 key points
-    key_points = key_points[:5]
+    with metrics.stage("load_text"):
+        extracted_text = load_text(file_path, content_type)
     
-    # Generate a simple summary
-    summary = ""
-    if sentences:
-        summary = sentences[0]  # First sentence as summary
-        if len(sentences) > 1:
-            summary += " " + sentences[-1]  # Add last sentence
-    
-    # Simple sentiment analysis
-    positive_words = ["good", "great", "excellent", "positive", "success", "benefit", "advantage"]
-    negative_words = ["bad", "poor", "negative", "failure", "problem", "disadvantage", "issue"]
-    
-    positive_count = sum(1 for word in extracted_text.lower().split() if word in positive_words)
-    negative_count = sum(1 for word in extracted_text.lower().split() if word in negative_words)
+    # Word count, key points, summary and sentiment in one streaming pass
+    with metrics.stage("analyze"):
+        return analyzer.default_analyzer.analyze(extracted_text)
+
+def analyze_ranges(file_path: str, ranges: List[Tuple[int, int]]) -> List[Dict[str, Any]]:
+    """
+    Analyze character ranges of a document's extracted text separately.
     
-    sentiment = "neutral"
-    if positive_count > negative_count * 2:
-        sentiment = "positive"
-    elif negative_count > positive_count * 2:
-        sentiment = "negative"
+    Used for the chunks of a new document version that have not been
+    analyzed before; the states are merged into a document-level result
+    with ``Analyzer.merge``.
     
-    return {
-        "summary": summary,
-        "key_points": key_points,
-        "word_count": word_count,
-        "sentiment": sentiment
-    }
+    Args:
+        file_path: Path to the document file; its text must be extracted
+        ranges: (start, end) character ranges, cut at sentence ends
+        
+    Returns:
+        The mergeable analyzer state of each range, in order
+    """
+    with metrics.stage("analyze"):
+        return [analyzer.default_analyzer.partial(text) for text in text_store.read_ranges(file_path, ranges)]
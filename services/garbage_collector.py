@@ -0,0 +1,283 @@
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Set
+
+import database
+import models
+from services import storage_service, text_store
+
+logger = logging.getLogger(__name__)
+
+# Garbage collector configuration
+GC_ENABLED = os.getenv("GC_ENABLED", "true").lower() in ("1", "true", "yes")
+GC_BATCH_SIZE = int(os.getenv("GC_BATCH_SIZE", 100))  # Files removed per batch
+GC_BATCH_PAUSE = float(os.getenv("GC_BATCH_PAUSE", 0.5))  # Seconds between batches
+GC_SWEEP_INTERVAL = float(os.getenv("GC_SWEEP_INTERVAL", 3600))  # Seconds between full sweeps; 0 disables
+GC_MIN_AGE = float(os.getenv("GC_MIN_AGE", 600))  # Sweeps skip files modified more recently
+GC_TMP_MAX_AGE = float(os.getenv("GC_TMP_MAX_AGE", 86400))  # Staged uploads older than this are abandoned
+
+# Files derived from an upload: text store (and its partial writes),
+# .metadata.json sidecars, and files parked by this collector
+_DERIVED_SUFFIX = re.compile(r"(\.txtz(\.[0-9a-f]{32}\.part)?|\.metadata\.json|\.[0-9a-f]{32}\.gc)$")
+
+def base_path(path: str) -> str:
+    """The upload a (possibly derived) file belongs to."""
+    return _DERIVED_SUFFIX.sub("", path)
+
+_BLOB_NAME = re.compile(r"[0-9a-f]{64}$")
+
+def _is_blob(path: str) -> bool:
+    """Blob paths look like <blobs>/<first two hex chars>/<sha256>."""
+    name = os.path.basename(path)
+    return bool(_BLOB_NAME.match(name)) and os.path.basename(os.path.dirname(path)) == name[:2]
+
+def referenced(db, paths: Iterable[str]) -> Set[str]:
+    """The upload paths still used by a blob or a (pre-blob-store) document or version."""
+    paths = set(paths)
+    hashes = {os.path.basename(path): path for path in paths if _is_blob(path)}
+    legacy = paths.difference(hashes.values())
+    live = set()
+    for start in range(0, len(hashes), 500):
+        chunk = list(hashes)[start:start + 500]
+        live.update(hashes[content_hash] for (content_hash,) in db.query(models.Blob.content_hash).filter(
+            models.Blob.content_hash.in_(chunk)
+        ))
+    if legacy:
+        # Few documents predate the blob store; compare absolute paths so a
+        # relative UPLOAD_DIR can't make a live upload look orphaned
+        known = set()
+        for model in (models.Document, models.DocumentVersion):
+            known.update(os.path.abspath(path) for (path,) in db.query(model.file_path).filter(
+                model.content_hash.is_(None), model.file_path.isnot(None)
+            ))
+        live.update(path for path in legacy if os.path.abspath(path) in known)
+    return live
+
+class GarbageCollector:
+    """
+    Removes upload files that no longer belong to any document.
+
+    Deletes hand over the paths of blobs they unreferenced (``enqueue``)
+    and a periodic sweep of UPLOAD_DIR finds anything else left behind:
+    blobs and legacy uploads without a database row, their text store and
+    sidecar files, and abandoned staged uploads. Files are removed in
+    batches of GC_BATCH_SIZE with a GC_BATCH_PAUSE between batches so a
+    large cleanup never saturates the disk.
+
+    Content-addressed blobs can be re-uploaded at any moment, so a blob is
+    first renamed aside, then checked against the database again, and put
+    back if it was acquired meanwhile. Uploads register the blob row
+    before looking for an existing file, which makes this race-free.
+    """
+
+    def __init__(self, session_factory=database.SessionLocal):
+        self.session_factory = session_factory
+        self.removed = 0
+        self._queue: Deque[str] = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._next_sweep: Optional[float] = None
+
+    def enqueue(self, paths: Iterable[str]) -> None:
+        """
+        Schedule upload files (and everything derived from them) for removal.
+
+        Without a running collector (GC disabled, or outside the app) they
+        are removed right away instead.
+        """
+        paths = list(paths)
+        if not paths:
+            return
+        if self._thread is None:
+            self.collect(paths)
+            return
+        with self._cond:
+            self._queue.extend(paths)
+            self._cond.notify()
+
+    def __len__(self) -> int:
+        """Number of files waiting to be removed."""
+        return len(self._queue)
+
+    # Lifecycle
+    def start(self, sweep: bool = True) -> None:
+        """Start removing queued files, and sweeping UPLOAD_DIR if ``sweep``."""
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._next_sweep = time.monotonic() if sweep and GC_SWEEP_INTERVAL > 0 else None
+        self._thread = threading.Thread(target=self._run, name="garbage-collector", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the collector thread; queued files are picked up by the next sweep."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # Collection
+    def collect(self, paths: List[str]) -> int:
+        """Remove the given upload files that are unreferenced; returns how many went."""
+        parked = {}
+        for path in set(paths):
+            trash = f"{path}.{uuid.uuid4().hex}.gc"
+            try:
+                os.rename(path, trash)
+            except FileNotFoundError:
+                trash = None
+            parked[path] = trash
+
+        with self.session_factory() as db:
+            live = referenced(db, parked)
+
+        removed = 0
+        for path, trash in parked.items():
+            if path in live:
+                # Re-uploaded meanwhile; identical content, so either copy will do
+                if trash is not None:
+                    self._restore(path, trash)
+                continue
+            if trash is not None:
+                os.remove(trash)
+            # text_store also drops the cached text
+            text_store.remove_text(path)
+            self._remove(f"{path}.metadata.json")
+            removed += 1
+        self.removed += removed
+        return removed
+
+    def sweep(self, now: Optional[float] = None, pause: Callable[[], bool] = None) -> int:
+        """
+        Scan UPLOAD_DIR and remove everything unreferenced, in batches.
+
+        Args:
+            now: Current time, for the age checks
+            pause: Called between batches; returning True aborts the sweep
+
+        Returns:
+            Number of upload files removed
+        """
+        now = time.time() if now is None else now
+        removed = 0
+        for path in self._stale_staged(now):
+            self._remove(path)
+        batch: List[str] = []
+        for path in self._candidates(now):
+            batch.append(path)
+            if len(batch) >= GC_BATCH_SIZE:
+                removed += self.collect(batch)
+                batch = []
+                if pause is not None and pause():
+                    return removed
+        if batch:
+            removed += self.collect(batch)
+        if removed:
+            logger.info("Garbage collector swept %d orphaned uploads", removed)
+        return removed
+
+    # Internals
+    def _candidates(self, now: float) -> Iterator[str]:
+        """Upload paths with files on disk and no reference, one directory at a time."""
+        directories = [storage_service.UPLOAD_DIR]
+        if os.path.isdir(storage_service.BLOB_DIR):
+            directories += sorted(entry.path for entry in os.scandir(storage_service.BLOB_DIR) if entry.is_dir())
+        for directory in directories:
+            bases = set()
+            parked = []
+            try:
+                entries = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if not entry.is_file() or entry.path.endswith(".part"):
+                    continue
+                try:
+                    if now - entry.stat().st_mtime < GC_MIN_AGE:
+                        continue
+                except FileNotFoundError:
+                    continue
+                bases.add(base_path(entry.path))
+                if entry.path.endswith(".gc"):
+                    parked.append(entry.path)
+            with self.session_factory() as db:
+                live = referenced(db, bases)
+            # Left behind by a collection that was interrupted mid-way
+            for trash in parked:
+                if base_path(trash) in live:
+                    self._restore(base_path(trash), trash)
+                else:
+                    self._remove(trash)
+            yield from sorted(bases - live)
+
+    def _stale_staged(self, now: float) -> List[str]:
+        """Partial uploads and text store writes abandoned by a crashed process."""
+        stale = []
+        for root, _, files in os.walk(storage_service.UPLOAD_DIR):
+            for name in files:
+                if name.endswith(".part"):
+                    path = os.path.join(root, name)
+                    try:
+                        if now - os.stat(path).st_mtime > GC_TMP_MAX_AGE:
+                            stale.append(path)
+                    except FileNotFoundError:
+                        pass
+        return stale
+
+    @staticmethod
+    def _restore(path: str, trash: str) -> None:
+        if os.path.exists(path):
+            os.remove(trash)
+        else:
+            os.replace(trash, path)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _wait(self, timeout: float) -> bool:
+        """Sleep up to ``timeout``; True once the collector is stopping."""
+        with self._cond:
+            if not self._stopping:
+                self._cond.wait(timeout)
+            return self._stopping
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                if not self._queue:
+                    timeout = None
+                    if self._next_sweep is not None:
+                        timeout = max(0.0, self._next_sweep - time.monotonic())
+                    if timeout is None or timeout > 0:
+                        self._cond.wait(timeout)
+                        continue
+                batch = [self._queue.popleft() for _ in range(min(GC_BATCH_SIZE, len(self._queue)))]
+            try:
+                if batch:
+                    self.collect(batch)
+                    if self._wait(GC_BATCH_PAUSE):
+                        return
+                elif self._next_sweep is not None and time.monotonic() >= self._next_sweep:
+                    self._next_sweep = time.monotonic() + GC_SWEEP_INTERVAL
+                    self.sweep(pause=lambda: self._wait(GC_BATCH_PAUSE))
+            except Exception:
+                logger.exception("Garbage collection failed")
+                if self._wait(GC_BATCH_PAUSE):
+                    return
+
+# Shared collector, started and stopped with the application
+collector = GarbageCollector()
@@ -0,0 +1,215 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import crud
+import database
+import metrics
+from services import search_index, tfidf
+from services.document_service import process_document
+
+logger = logging.getLogger(__name__)
+
+# Worker pool configuration
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", os.cpu_count() or 1))
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", 300))  # Seconds per attempt
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", 5))  # Multiplied by attempt number
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1.0))
+
+def _extract(file_path: str, content_type: str) -> None:
+    """Extract text from a document, failing the job on extraction errors."""
+    metadata = process_document(file_path, content_type)
+    if "extraction_error" in metadata:
+        raise RuntimeError(metadata["extraction_error"])
+
+# Job kind -> function run inside the worker process
+JOB_HANDLERS: Dict[str, Callable[..., Any]] = {
+    "extract": _extract,
+}
+
+def _index_extracted(db, job) -> None:
+    """Add freshly extracted text to the search index and the owner's corpus statistics."""
+    document = job.document
+    if document is not None and document.content_hash:
+        search_index.index_blob(db, document.content_hash, document.file_path)
+        tfidf.count_documents(db, [document])
+
+# Job kind -> function run in the API process after the job succeeded
+JOB_COMPLETIONS: Dict[str, Callable[..., Any]] = {
+    "extract": _index_extracted,
+}
+
+def run_job(kind: str, file_path: str, content_type: str) -> Any:
+    """
+    Entry point executed in a pool process.
+    
+    Returns the handler's result and the stage timings recorded in this
+    process; on failure the timings travel on the exception instead.
+    """
+    handler = JOB_HANDLERS.get(kind)
+    if handler is None:
+        raise ValueError(f"Unknown job kind: {kind}")
+    with metrics.capture_stages() as samples:
+        try:
+            result = handler(file_path, content_type)
+        except Exception as e:
+            e.stage_samples = samples
+            raise
+    return result, samples
+
+def enqueue(db, document_id: int, kind: str):
+    """Persist a new job and wake the worker."""
+    job = crud.create_job(db, document_id=document_id, kind=kind, max_attempts=JOB_MAX_ATTEMPTS)
+    worker.notify()
+    return job
+
+class JobWorker:
+    """
+    Dispatches queued jobs from the ``jobs`` table to a process pool.
+
+    A single dispatcher thread claims runnable jobs (atomically, so several
+    API processes can share one table), submits them to a
+    ProcessPoolExecutor sized by JOB_WORKERS and records the outcome.
+    Jobs that raise are retried with a linear backoff until they run out
+    of attempts; jobs that exceed JOB_TIMEOUT are failed and the pool is
+    recycled so the stuck process does not hold a slot forever.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, session_factory=database.SessionLocal):
+        self.max_workers = max(1, max_workers)
+        self.session_factory = session_factory
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        # job id -> (future, started at)
+        self._in_flight: Dict[int, Tuple[Future, float]] = {}
+
+    def start(self) -> None:
+        """Start the pool and the dispatcher thread."""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._executor = self._new_executor()
+        with self.session_factory() as db:
+            stale = crud.requeue_stale_jobs(
+                db, started_before=datetime.utcnow() - timedelta(seconds=JOB_TIMEOUT * 2)
+            )
+        if stale:
+            logger.warning("Re-queued %d stale jobs", stale)
+        self._thread = threading.Thread(target=self._run, name="job-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop dispatching and shut the pool down."""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def in_flight(self) -> int:
+        """Jobs currently running in the pool."""
+        return len(self._in_flight)
+
+    def notify(self) -> None:
+        """Wake the dispatcher, e.g. right after a job was enqueued."""
+        self._wakeup.set()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # "spawn" avoids forking a process that already runs threads
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def _recycle_executor(self) -> None:
+        """Replace the pool, terminating any process stuck on a timed-out job."""
+        old = self._executor
+        self._executor = self._new_executor()
+        processes = list(getattr(old, "_processes", {}).values())
+        old.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+        # Anything else still running in the old pool is lost; retry it
+        for job_id, (future, _) in list(self._in_flight.items()):
+            if not future.done():
+                self._finish(job_id, error="Worker pool recycled")
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self._reap()
+                self._dispatch()
+            except Exception:
+                logger.exception("Job dispatcher iteration failed")
+            self._wakeup.wait(JOB_POLL_INTERVAL)
+            self._wakeup.clear()
+
+    def _dispatch(self) -> None:
+        free_slots = self.max_workers - len(self._in_flight)
+        if free_slots <= 0:
+            return
+        with self.session_factory() as db:
+            for job in crud.get_runnable_jobs(db, limit=free_slots):
+                if not crud.claim_job(db, job.id):
+                    continue
+                document = job.document
+                if document is None:
+                    crud.fail_job(db, job.id, error="Document no longer exists")
+                    continue
+                future = self._executor.submit(
+                    run_job, job.kind, document.file_path, document.content_type
+                )
+                future.add_done_callback(lambda _: self._wakeup.set())
+                self._in_flight[job.id] = (future, time.monotonic())
+
+    def _reap(self) -> None:
+        broken = False
+        for job_id, (future, started) in list(self._in_flight.items()):
+            if future.cancelled():
+                self._finish(job_id, error="Job was cancelled")
+            elif future.done():
+                error = None
+                exc = future.exception()
+                if exc is not None:
+                    error = f"{type(exc).__name__}: {exc}"
+                    broken = broken or isinstance(exc, BrokenProcessPool)
+                    metrics.observe_stages(getattr(exc, "stage_samples", ()))
+                else:
+                    metrics.observe_stages(future.result()[1])
+                self._finish(job_id, error=error)
+            elif time.monotonic() - started > JOB_TIMEOUT:
+                self._finish(job_id, error=f"Job timed out after {JOB_TIMEOUT:g}s")
+                broken = True
+        if broken:
+            self._recycle_executor()
+
+    def _finish(self, job_id: int, error: Optional[str] = None) -> None:
+        self._in_flight.pop(job_id, None)
+        with self.session_factory() as db:
+            if error is None:
+                job = crud.complete_job(db, job_id)
+                on_complete = JOB_COMPLETIONS.get(job.kind) if job is not None else None
+                if on_complete is not None:
+                    try:
+                        on_complete(db, job)
+                    except Exception:
+                        logger.exception("Post-processing of job %d failed", job_id)
+            else:
+                logger.warning("Job %d failed: %s", job_id, error)
+                crud.fail_job(db, job_id, error=error, retry_delay=JOB_RETRY_DELAY)
+
+# Shared worker, started and stopped with the application
+worker = JobWorker()
@@ -0,0 +1,324 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, insert, inspect
+from sqlalchemy.orm import Session, object_session
+
+import database
+import models
+
+logger = logging.getLogger(__name__)
+
+def _parse_offsets(value: str) -> Tuple[int, ...]:
+    units = {"d": 86400, "h": 3600, "m": 60, "s": 1}
+    offsets = []
+    for part in value.split(","):
+        part = part.strip()
+        if part:
+            offsets.append(int(part[:-1]) * units[part[-1]] if part[-1] in units else int(part))
+    return tuple(sorted(set(offsets), reverse=True))
+
+# How long before a shortlisted program's deadline reminders fire,
+# e.g. "7d,1d,1h" (units d/h/m/s; bare numbers are seconds)
+REMINDER_OFFSETS = _parse_offsets(os.getenv("REMINDER_OFFSETS", "7d,1d,1h"))
+REMINDERS_ENABLED = os.getenv("REMINDERS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Seconds between checks for program changes made by other worker processes
+REMINDER_SYNC_INTERVAL = float(os.getenv("REMINDER_SYNC_INTERVAL", 5))
+
+# Heap entry layout: [fire_at, seq, program_id, offset, payload]; the
+# payload is set to None to cancel an entry in place (lazy deletion)
+_FIRE_AT, _SEQ, _PROGRAM_ID, _OFFSET, _PAYLOAD = range(5)
+
+def _epoch(deadline: datetime) -> float:
+    """Deadlines are stored as naive UTC."""
+    if deadline.tzinfo is None:
+        deadline = deadline.replace(tzinfo=timezone.utc)
+    return deadline.timestamp()
+
+class ReminderScheduler:
+    """
+    In-process min-heap of upcoming deadline reminders.
+
+    Every shortlisted program with a future deadline gets one entry per
+    REMINDER_OFFSETS value. A single thread sleeps until the earliest
+    entry is due, so the programs table is read in full only at startup.
+    Writes made in this process are applied on commit; those made by
+    other worker processes are picked up from the program_changes outbox
+    every REMINDER_SYNC_INTERVAL seconds. Scheduling is O(log n);
+    cancelling marks the program's entries dead in O(1) per entry, and
+    they are skipped when they reach the top (the heap is rebuilt if dead
+    entries come to outnumber live ones).
+
+    Listeners registered with ``subscribe`` receive a dict with
+    program_id, user_id, name, university, deadline and seconds_before.
+    """
+
+    def __init__(self, offsets: Tuple[int, ...] = REMINDER_OFFSETS):
+        self.offsets = offsets
+        self.fired = 0
+        self._heap: List[list] = []
+        self._entries: Dict[int, List[list]] = {}
+        self._dead = 0
+        self._seq = itertools.count()
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = [self._log]
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._session_factory = database.SessionLocal
+
+    # Scheduling
+    def schedule(self, program_id: int, user_id: int, name: str, university: str,
+                 deadline: Optional[datetime], now: Optional[float] = None) -> int:
+        """(Re)schedule a program's reminders; returns how many were queued."""
+        with self._cond:
+            self._cancel(program_id)
+            entries = self._make_entries(program_id, user_id, name, university, deadline, now)
+            for entry in entries:
+                heapq.heappush(self._heap, entry)
+            if entries:
+                self._entries[program_id] = entries
+                self._cond.notify()
+            return len(entries)
+
+    def cancel(self, program_id: int) -> None:
+        """Drop any pending reminders for a program."""
+        with self._cond:
+            self._cancel(program_id)
+
+    def load(self, rows, now: Optional[float] = None) -> int:
+        """Replace the schedule with (id, user_id, name, university, deadline) rows, in O(n)."""
+        now = time.time() if now is None else now
+        with self._cond:
+            self._heap = []
+            self._entries = {}
+            self._dead = 0
+            for program_id, user_id, name, university, deadline in rows:
+                entries = self._make_entries(program_id, user_id, name, university, deadline, now)
+                if entries:
+                    self._entries[program_id] = entries
+                    self._heap.extend(entries)
+            heapq.heapify(self._heap)
+            self._cond.notify()
+            return len(self._heap)
+
+    @property
+    def is_running(self) -> bool:
+        """Whether this process runs the scheduler thread."""
+        return self._thread is not None
+
+    def __len__(self) -> int:
+        """Number of pending (live) reminders."""
+        return len(self._heap) - self._dead
+
+    def subscribe(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        """Call ``listener`` with every reminder as it fires."""
+        self._listeners.append(listener)
+
+    def sync(self, session_factory=None) -> int:
+        """
+        Apply the program changes recorded in the outbox, then clear them.
+
+        Returns:
+            Number of programs rescheduled or cancelled
+        """
+        with (session_factory or self._session_factory)() as db:
+            changes = db.query(models.ProgramChange.id, models.ProgramChange.program_id).order_by(
+                models.ProgramChange.id
+            ).limit(10000).all()
+            if not changes:
+                return 0
+            program_ids = list({program_id for _, program_id in changes})
+            found = {}
+            for start in range(0, len(program_ids), 500):
+                found.update((row.id, row) for row in db.query(
+                    models.Program.id, models.Program.user_id, models.Program.name, models.Program.university,
+                    models.Program.deadline, models.Program.is_shortlisted
+                ).filter(models.Program.id.in_(program_ids[start:start + 500])))
+            for program_id in program_ids:
+                row = found.get(program_id)
+                if row is None or not row.is_shortlisted:
+                    self.cancel(program_id)
+                else:
+                    self.schedule(program_id, row.user_id, row.name, row.university, row.deadline)
+            _clear_changes(db, [change_id for change_id, _ in changes])
+            db.commit()
+        return len(program_ids)
+
+    # Lifecycle
+    def start(self, session_factory=database.SessionLocal) -> None:
+        """Load shortlisted programs with upcoming deadlines and start firing."""
+        if self._thread is not None:
+            return
+        self._session_factory = session_factory
+        with session_factory() as db:
+            # Changes recorded so far are covered by the full load
+            seen = [change_id for (change_id,) in db.query(models.ProgramChange.id)]
+            rows = db.query(
+                models.Program.id, models.Program.user_id, models.Program.name,
+                models.Program.university, models.Program.deadline
+            ).filter(
+                models.Program.is_shortlisted.is_(True), models.Program.deadline > datetime.utcnow()
+            ).execution_options(yield_per=10000)
+            count = self.load(rows)
+            _clear_changes(db, seen)
+            db.commit()
+        logger.info("Scheduled %d deadline reminders", count)
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="reminder-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the scheduler thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def pop_due(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Remove and return every reminder due at ``now``."""
+        now = time.time() if now is None else now
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][_FIRE_AT] <= now:
+                entry = heapq.heappop(self._heap)
+                if entry[_PAYLOAD] is None:
+                    self._dead -= 1
+                    continue
+                entries = self._entries.get(entry[_PROGRAM_ID])
+                if entries is not None:
+                    entries.remove(entry)
+                    if not entries:
+                        del self._entries[entry[_PROGRAM_ID]]
+                due.append({**entry[_PAYLOAD], "seconds_before": entry[_OFFSET]})
+        return due
+
+    # Internals
+    def _make_entries(self, program_id, user_id, name, university, deadline, now) -> List[list]:
+        if deadline is None:
+            return []
+        now = time.time() if now is None else now
+        deadline_at = _epoch(deadline)
+        payload = {
+            "program_id": program_id, "user_id": user_id, "name": name,
+            "university": university, "deadline": deadline,
+        }
+        return [
+            [deadline_at - offset, next(self._seq), program_id, offset, payload]
+            for offset in self.offsets
+            if deadline_at - offset > now
+        ]
+
+    def _cancel(self, program_id: int) -> None:
+        for entry in self._entries.pop(program_id, ()):
+            entry[_PAYLOAD] = None
+            self._dead += 1
+        if self._dead > 1024 and self._dead > len(self._heap) // 2:
+            self._heap = [entry for entry in self._heap if entry[_PAYLOAD] is not None]
+            heapq.heapify(self._heap)
+            self._dead = 0
+
+    def _run(self) -> None:
+        next_sync = time.monotonic() + REMINDER_SYNC_INTERVAL
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                timeout = next_sync - time.monotonic()
+                if self._heap:
+                    timeout = min(timeout, self._heap[0][_FIRE_AT] - time.time())
+                if timeout > 0:
+                    self._cond.wait(timeout)
+                    continue
+            if time.monotonic() >= next_sync:
+                try:
+                    self.sync()
+                except Exception:
+                    logger.exception("Reminder sync failed")
+                next_sync = time.monotonic() + REMINDER_SYNC_INTERVAL
+            for reminder in self.pop_due():
+                self.fired += 1
+                for listener in self._listeners:
+                    try:
+                        listener(reminder)
+                    except Exception:
+                        logger.exception("Reminder listener failed")
+
+    @staticmethod
+    def _log(reminder: Dict[str, Any]) -> None:
+        logger.info(
+            "Deadline reminder: program %s (%s, %s) for user %s is due %s",
+            reminder["program_id"], reminder["name"], reminder["university"],
+            reminder["user_id"], reminder["deadline"]
+        )
+
+def _clear_changes(db: Session, change_ids: List[int]) -> None:
+    """Delete processed outbox rows. Does not commit."""
+    for start in range(0, len(change_ids), 500):
+        db.query(models.ProgramChange).filter(
+            models.ProgramChange.id.in_(change_ids[start:start + 500])
+        ).delete(synchronize_session=False)
+
+# Shared scheduler, started and stopped with the application
+scheduler = ReminderScheduler()
+
+# Keep the schedule in step with writes. Changes are recorded in the
+# program_changes outbox, in the same transaction, for whichever worker
+# process runs the scheduler; in that process they are also collected per
+# session and applied as soon as the transaction commits.
+def note_program(db: Session, program_id: int, user_id: int = None, name: str = None, university: str = None,
+                 deadline: Optional[datetime] = None, is_shortlisted: bool = False) -> None:
+    """Record a program write to apply to the schedule when ``db`` commits."""
+    if not REMINDERS_ENABLED:
+        return
+    pending = db.info.setdefault("reminder_changes", {})
+    if program_id not in pending:
+        db.connection().execute(insert(models.ProgramChange.__table__).values(
+            program_id=program_id, created_at=datetime.utcnow()
+        ))
+    pending[program_id] = (user_id, name, university, deadline if is_shortlisted else None)
+
+def _note_target(target) -> None:
+    db = object_session(target)
+    if db is not None:
+        note_program(db, target.id, target.user_id, target.name, target.university,
+                     target.deadline, bool(target.is_shortlisted))
+
+@event.listens_for(models.Program, "after_insert")
+def _program_inserted(mapper, connection, target):
+    _note_target(target)
+
+@event.listens_for(models.Program, "after_update")
+def _program_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[key].history.has_changes() for key in ("deadline", "is_shortlisted", "name", "university")):
+        _note_target(target)
+
+@event.listens_for(models.Program, "after_delete")
+def _program_deleted(mapper, connection, target):
+    db = object_session(target)
+    if db is not None:
+        note_program(db, target.id)
+
+@event.listens_for(Session, "after_commit")
+def _apply_reminder_changes(db):
+    changes = db.info.pop("reminder_changes", {})
+    if not scheduler.is_running:
+        # Another process schedules; the outbox rows reach it
+        return
+    for program_id, (user_id, name, university, deadline) in changes.items():
+        if deadline is None:
+            scheduler.cancel(program_id)
+        else:
+            scheduler.schedule(program_id, user_id, name, university, deadline)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_reminder_changes(db, previous_transaction):
+    db.info.pop("reminder_changes", None)
@@ -0,0 +1,328 @@
+import html
+import logging
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import bindparam, case, delete, func, insert, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+import models
+from services import chunking, text_store
+
+logger = logging.getLogger(__name__)
+
+# Search configuration
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", 50))
+SEARCH_SNIPPET_TOKENS = int(os.getenv("SEARCH_SNIPPET_TOKENS", 12))  # FTS5 snippet length in tokens
+SEARCH_SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", 80))  # Fallback context on each side of a hit
+
+# Extracted text is indexed per content-defined chunk (see chunking) and
+# joined through blob_chunks to documents at query time, so duplicates and
+# the unchanged parts of new document versions share index entries, and
+# every query is scoped to the caller's documents.
+FTS_TABLE = "chunk_text_fts"
+# Per-blob index tables of earlier versions, dropped by the create-schema step
+RETIRED_TABLES = ("search_postings", "document_text_fts")
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+MAX_TERM_LENGTH = 64
+
+# Marks FTS5 puts around hits, replaced with <mark> tags once the snippet
+# has been HTML-escaped (private-use characters, absent from real text)
+_MARK_OPEN = "\ue000"
+_MARK_CLOSE = "\ue001"
+
+# "fts5" or "table", decided per engine by ensure_schema (the reader and
+# writer engines of one database are decided separately)
+_backends: Dict[Any, str] = {}
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens, as stored in the fallback index."""
+    return [token for token in TOKEN_RE.findall(text.lower()) if len(token) <= MAX_TERM_LENGTH]
+
+def ensure_schema(engine) -> str:
+    """
+    Create the FTS5 table when the database supports it.
+
+    A query-only engine cannot create the table; until a writer has, it
+    reports "table" without remembering the answer.
+
+    Returns:
+        The backend in use: "fts5" on SQLite builds with FTS5, otherwise
+        "table" (the chunk_postings table created with the models)
+    """
+    if engine in _backends:
+        return _backends[engine]
+    with engine.begin() as conn:
+        backend = _decide_backend(engine, conn)
+    if backend == "fts5":
+        # Created by this call and now committed
+        _backends[engine] = backend
+    return backend
+
+def _backend(db: Session) -> str:
+    engine = db.get_bind()
+    if engine in _backends:
+        return _backends[engine]
+    # On the session's own connection: the writer pool may hold only one
+    return _decide_backend(engine, db.connection())
+
+def _decide_backend(engine, conn) -> str:
+    """Find or create the FTS5 table on ``conn``, caching answers that cannot change."""
+    if engine.dialect.name != "sqlite":
+        _backends[engine] = "table"
+        return "table"
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": FTS_TABLE}
+    ).first()
+    if exists:
+        _backends[engine] = "fts5"
+        return "fts5"
+    if conn.execute(text("PRAGMA query_only")).scalar():
+        return "table"
+    try:
+        # rowid is search_chunks.id
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            "USING fts5(body, tokenize='unicode61 remove_diacritics 2')"
+        ))
+    except OperationalError:
+        logger.warning("SQLite FTS5 unavailable; using the fallback search index")
+        _backends[engine] = "table"
+        return "table"
+    # Part of the caller's transaction: cached once it is seen committed
+    return "fts5"
+
+def index_blob(db: Session, content_hash: str, file_path: str) -> int:
+    """
+    Index the chunks of a blob's extracted text that are not indexed yet, and commit.
+
+    Args:
+        db: Database session (write)
+        content_hash: Blob the text belongs to
+        file_path: Blob path; its text store must already exist
+
+    Returns:
+        Number of chunks added to the index
+    """
+    chunks = chunking.ensure_chunks(db, content_hash, file_path)
+    if not chunks:
+        return 0
+    ranges = {chunk.chunk_hash: (chunk.start, chunk.end) for chunk in chunks}
+    indexed = {chunk_hash for (chunk_hash,) in db.query(models.SearchChunk.chunk_hash).filter(
+        models.SearchChunk.chunk_hash.in_(list(ranges))
+    )}
+    missing = [chunk_hash for chunk_hash in ranges if chunk_hash not in indexed]
+    if not missing:
+        return 0
+    fts = _backend(db) == "fts5"
+    try:
+        bodies = text_store.read_ranges(file_path, [ranges[chunk_hash] for chunk_hash in missing])
+        for chunk_hash, body in zip(missing, bodies):
+            search_chunk = models.SearchChunk(chunk_hash=chunk_hash)
+            db.add(search_chunk)
+            db.flush()
+            if fts:
+                db.execute(
+                    text(f"INSERT INTO {FTS_TABLE} (rowid, body) VALUES (:id, :body)"),
+                    {"id": search_chunk.id, "body": body}
+                )
+            else:
+                counts = Counter(tokenize(body))
+                if counts:
+                    db.execute(
+                        insert(models.ChunkPosting),
+                        [{"term": term, "chunk_id": search_chunk.id, "tf": tf} for term, tf in counts.items()]
+                    )
+        db.commit()
+    except IntegrityError:
+        # A chunk shared with another blob was indexed concurrently
+        db.rollback()
+        return index_blob(db, content_hash, file_path)
+    return len(missing)
+
+def remove_chunks(db: Session, chunk_hashes: List[str]) -> None:
+    """Drop chunks from the index. Does not commit."""
+    ids = [chunk_id for (chunk_id,) in db.query(models.SearchChunk.id).filter(
+        models.SearchChunk.chunk_hash.in_(list(chunk_hashes))
+    )]
+    if not ids:
+        return
+    if _backend(db) == "fts5":
+        db.execute(
+            text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN :ids").bindparams(bindparam("ids", expanding=True)),
+            {"ids": ids}
+        )
+    else:
+        db.execute(delete(models.ChunkPosting).where(models.ChunkPosting.chunk_id.in_(ids)))
+    db.execute(delete(models.SearchChunk).where(models.SearchChunk.id.in_(ids)))
+
+def backfill(db: Session) -> int:
+    """
+    Chunk and index every blob with extracted text that has no chunks yet.
+
+    Run by the release step so content uploaded before chunking (or whose
+    indexing was interrupted) becomes searchable. Commits per blob.
+
+    Returns:
+        Number of blobs indexed
+    """
+    chunked = db.query(models.BlobChunk.content_hash).filter(
+        models.BlobChunk.content_hash == models.Blob.content_hash
+    ).exists()
+    blobs = db.query(models.Blob.content_hash, models.Blob.file_path).filter(~chunked).all()
+    indexed = 0
+    for content_hash, file_path in blobs:
+        if file_path and text_store.has_text(file_path):
+            index_blob(db, content_hash, file_path)
+            indexed += 1
+    return indexed
+
+def search(db: Session, user_id: int, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Rank a user's documents against a query.
+
+    Every word of the query must match (with FTS5 the last one also
+    matches as a prefix). Results are ordered best first: BM25 with FTS5,
+    TF-IDF with the fallback index.
+
+    Args:
+        db: Database session
+        user_id: Owner whose documents are searched
+        query: Free text entered by the user
+        limit: Maximum number of results
+
+    Returns:
+        Dicts with document_id, title, filename, score and snippet
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+    limit = max(1, min(limit, SEARCH_MAX_RESULTS))
+    if _backend(db) == "fts5":
+        return _search_fts(db, user_id, terms, limit)
+    return _search_table(db, user_id, terms, limit)
+
+def _search_fts(db: Session, user_id: int, terms: List[str], limit: int) -> List[Dict[str, Any]]:
+    # One MATCH per term, so the terms of a query may sit in different
+    # chunks of a document. Terms are quoted so user input cannot inject
+    # FTS5 query syntax; the last one also matches as a prefix.
+    matches = [f'"{term}"' for term in terms]
+    matches[-1] += "*"
+    # Candidates are limited to the caller's chunks before anything else
+    # is done with them: bm25() and the joins below only see those rows.
+    # The unary + keeps the rowid test a filter on the term's doclist; as
+    # a constraint FTS5 would rerun the query (and bm25's statistics) per id
+    hits = " UNION ALL ".join(
+        f"SELECT {i} AS term, rowid AS chunk_id, bm25({FTS_TABLE}) AS score "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match{i} AND +rowid IN (SELECT id FROM mine)"
+        for i in range(len(terms))
+    )
+    params = {f"match{i}": match for i, match in enumerate(matches)}
+    # MATERIALIZED keeps SQLite from flattening a single-term CTE into the
+    # join, where bm25() is not allowed. With a single MIN() aggregate,
+    # SQLite takes the bare hits.chunk_id from the best-scoring hit.
+    rows = db.execute(text(
+        "WITH mine AS MATERIALIZED ("
+        "SELECT DISTINCT sc.id FROM documents d "
+        "JOIN blob_chunks bc ON bc.content_hash = d.content_hash "
+        "JOIN search_chunks sc ON sc.chunk_hash = bc.chunk_hash "
+        "WHERE d.user_id = :user_id), "
+        f"hits AS MATERIALIZED ({hits}) "
+        "SELECT d.id, d.title, d.filename, SUM(hits.score) AS score, "
+        "MIN(hits.score) AS best, hits.chunk_id AS best_chunk "
+        "FROM hits JOIN search_chunks sc ON sc.id = hits.chunk_id "
+        "JOIN blob_chunks bc ON bc.chunk_hash = sc.chunk_hash "
+        "JOIN documents d ON d.content_hash = bc.content_hash "
+        "WHERE d.user_id = :user_id "
+        "GROUP BY d.id HAVING COUNT(DISTINCT hits.term) = :terms "
+        "ORDER BY score, d.id LIMIT :limit"
+    ), {**params, "user_id": user_id, "terms": len(terms), "limit": limit}).all()
+    # Snippets from each document's best-matching chunk, in one query
+    snippets = {}
+    if rows:
+        snippets = dict(db.execute(
+            text(
+                f"SELECT rowid, snippet({FTS_TABLE}, 0, :open, :close, '…', :tokens) "
+                f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match AND rowid IN :ids"
+            ).bindparams(bindparam("ids", expanding=True)),
+            {
+                "open": _MARK_OPEN, "close": _MARK_CLOSE, "tokens": SEARCH_SNIPPET_TOKENS,
+                "match": " OR ".join(matches), "ids": list({row.best_chunk for row in rows}),
+            }
+        ).all())
+    # bm25() is lower-is-better; flip it so higher scores rank first
+    return [
+        {
+            "document_id": row.id,
+            "title": row.title,
+            "filename": row.filename,
+            "score": -row.score,
+            "snippet": _escape_marked(snippets.get(row.best_chunk)),
+        }
+        for row in rows
+    ]
+
+def _search_table(db: Session, user_id: int, terms: List[str], limit: int) -> List[Dict[str, Any]]:
+    posting = models.ChunkPosting
+    doc_freq = dict(
+        db.query(posting.term, func.count()).filter(posting.term.in_(terms)).group_by(posting.term).all()
+    )
+    if len(doc_freq) < len(terms):
+        return []
+    total = db.query(func.count(models.SearchChunk.id)).scalar() or 1
+    idf = case(
+        {term: math.log(1 + total / freq) for term, freq in doc_freq.items()},
+        value=posting.term
+    )
+    score = func.sum(posting.tf * idf).label("score")
+    rows = db.query(
+        models.Document.id, models.Document.title, models.Document.filename, models.Document.file_path, score
+    ).join(
+        models.BlobChunk, models.BlobChunk.content_hash == models.Document.content_hash
+    ).join(
+        models.SearchChunk, models.SearchChunk.chunk_hash == models.BlobChunk.chunk_hash
+    ).join(
+        posting, posting.chunk_id == models.SearchChunk.id
+    ).filter(
+        models.Document.user_id == user_id, posting.term.in_(terms)
+    ).group_by(models.Document.id).having(
+        func.count(posting.term.distinct()) == len(terms)
+    ).order_by(score.desc(), models.Document.id).limit(limit).all()
+    return [
+        {
+            "document_id": row.id,
+            "title": row.title,
+            "filename": row.filename,
+            "score": row.score,
+            "snippet": _snippet(row.file_path, terms),
+        }
+        for row in rows
+    ]
+
+def _snippet(file_path: str, terms: List[str]) -> Optional[str]:
+    """Text around the first occurrence of any term, with hits marked."""
+    pattern = re.compile(r"\b(" + "|".join(map(re.escape, terms)) + r")\b", re.IGNORECASE)
+    try:
+        pages = text_store.iter_text(file_path)
+        for page in pages:
+            hit = pattern.search(page)
+            if hit is None:
+                continue
+            start = max(0, hit.start() - SEARCH_SNIPPET_CHARS)
+            end = min(len(page), hit.end() + SEARCH_SNIPPET_CHARS)
+            window = " ".join(page[start:end].split())
+            marked = pattern.sub(lambda m: f"{_MARK_OPEN}{m.group(0)}{_MARK_CLOSE}", window)
+            return ("…" if start else "") + _escape_marked(marked) + ("…" if end < len(page) else "")
+    except OSError:
+        pass
+    return None
+
+def _escape_marked(snippet: Optional[str]) -> Optional[str]:
+    """HTML-escape document text, then turn the hit marks into <mark> tags."""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
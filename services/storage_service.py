@@ -0,0 +1,109 @@
+import hashlib
+import os
+import uuid
+from typing import Tuple
+
+import aiofiles
+import aiofiles.os
+from fastapi import HTTPException, UploadFile, status
+
+from services import text_store
+
+# Upload storage configuration
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))  # 1 MiB
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 50 * 1024 * 1024))  # 50 MiB
+
+# Content-addressed blobs live under blobs/<first two hex chars>/<sha256>;
+# uploads are staged in tmp/ until their hash is known
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+TMP_DIR = os.path.join(UPLOAD_DIR, "tmp")
+
+# Create upload directories if they don't exist
+os.makedirs(BLOB_DIR, exist_ok=True)
+os.makedirs(TMP_DIR, exist_ok=True)
+
+def upload_too_large() -> HTTPException:
+    """Build the error raised when an upload exceeds MAX_UPLOAD_SIZE."""
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File exceeds the maximum upload size of {MAX_UPLOAD_SIZE} bytes"
+    )
+
+def blob_path(content_hash: str) -> str:
+    """Path of the blob holding content with the given SHA-256."""
+    return os.path.join(BLOB_DIR, content_hash[:2], content_hash)
+
+async def save_upload(upload: UploadFile) -> Tuple[str, int, str]:
+    """
+    Stream an uploaded file to a staging file without blocking the event loop.
+
+    The body is copied in UPLOAD_CHUNK_SIZE chunks into a temporary
+    ``.part`` file while the size limit is enforced and a SHA-256 checksum
+    is computed. Pass the result to ``store_blob`` once the blob has been
+    registered in the database.
+
+    Args:
+        upload: The incoming multipart file
+
+    Returns:
+        Tuple of (staging path, size in bytes, hex SHA-256 digest)
+    """
+    partial_path = os.path.join(TMP_DIR, f"{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        async with aiofiles.open(partial_path, "wb") as buffer:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_SIZE:
+                    raise upload_too_large()
+                digest.update(chunk)
+                await buffer.write(chunk)
+            await buffer.flush()
+            await aiofiles.os.wrap(os.fsync)(buffer.fileno())
+    except BaseException:
+        # Never leave partial uploads behind
+        discard_staged(partial_path)
+        raise
+
+    return partial_path, size, digest.hexdigest()
+
+def store_blob(staged_path: str, content_hash: str) -> str:
+    """
+    Move a staged upload into the blob store.
+
+    If a blob with the same content already exists the staged copy is
+    simply discarded, so duplicate uploads cost no extra disk.
+
+    Returns:
+        Path of the stored blob
+    """
+    path = blob_path(content_hash)
+    if os.path.exists(path):
+        discard_staged(staged_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(staged_path, path)
+    return path
+
+def discard_staged(staged_path: str) -> None:
+    """Remove a staging file if it still exists."""
+    try:
+        os.remove(staged_path)
+    except FileNotFoundError:
+        pass
+
+def remove_blob(path: str) -> None:
+    """Remove a blob and any files derived from it."""
+    text_store.remove_text(path)
+    # .metadata.json sidecars were written before the text store existed
+    for candidate in (path, f"{path}.metadata.json"):
+        try:
+            os.remove(candidate)
+        except FileNotFoundError:
+            pass
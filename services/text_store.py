@@ -0,0 +1,268 @@
+import bisect
+import mmap
+import os
+import struct
+import uuid
+import zlib
+from typing import Iterable, Iterator, List, Optional
+
+from cache import LRUCache
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; zlib is always available
+    zstandard = None
+
+# Extracted text is stored next to each blob as "<blob>.txtz":
+#
+#   header   MAGIC, format version, codec, 2 reserved bytes
+#   frames   one independently compressed UTF-8 frame per page
+#   index    (frame offset, frame length, page length in chars) per page
+#   trailer  index offset, page count, MAGIC
+#
+# Pages concatenate back to the exact extracted text, so a single page or
+# character range can be decompressed without touching the rest.
+MAGIC = b"PPTX"
+FORMAT_VERSION = 1
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+
+_HEADER = struct.Struct("<4sBBxx")
+_INDEX_ENTRY = struct.Struct("<QII")
+_TRAILER = struct.Struct("<QI4s")
+
+# Text store configuration
+TEXT_STORE_CODEC = os.getenv("TEXT_STORE_CODEC", "zstd" if zstandard else "zlib")
+TEXT_STORE_LEVEL = int(os.getenv("TEXT_STORE_LEVEL", 6))
+TEXT_PAGE_CHARS = int(os.getenv("TEXT_PAGE_CHARS", 64 * 1024))  # Page size for plain text
+TEXT_CACHE_MAX_ENTRIES = int(os.getenv("TEXT_CACHE_MAX_ENTRIES", 128))
+TEXT_CACHE_MAX_CHARS = int(os.getenv("TEXT_CACHE_MAX_CHARS", 64 * 1024 * 1024))
+
+# Hot documents, keyed by text store path
+text_cache = LRUCache(TEXT_CACHE_MAX_ENTRIES, max_weight=TEXT_CACHE_MAX_CHARS, weigh=len)
+
+def text_path(file_path: str) -> str:
+    """Path of the text store for an uploaded file."""
+    return f"{file_path}.txtz"
+
+def _compressor(codec: int):
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=TEXT_STORE_LEVEL).compress
+    return lambda data: zlib.compress(data, TEXT_STORE_LEVEL)
+
+def _decompressor(codec: int):
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Text store is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress
+    if codec == CODEC_ZLIB:
+        return zlib.decompress
+    raise ValueError(f"Unknown text store codec: {codec}")
+
+class TextStoreWriter:
+    """
+    Append pages to a new text store.
+
+    Pages are compressed and written as they arrive, so memory use is
+    bounded by a single page. The store only becomes visible at its final
+    path once ``close`` has written the index.
+    """
+
+    def __init__(self, path: str, codec: Optional[str] = None):
+        codec = codec or TEXT_STORE_CODEC
+        self.codec = CODEC_ZSTD if codec == "zstd" and zstandard else CODEC_ZLIB
+        self.path = path
+        self._partial_path = f"{path}.{uuid.uuid4().hex}.part"
+        self._file = open(self._partial_path, "wb")
+        self._file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, self.codec))
+        self._compress = _compressor(self.codec)
+        self._index: List[tuple] = []
+
+    def write_page(self, text: str) -> None:
+        """Compress and append one page of text."""
+        frame = self._compress(text.encode("utf-8"))
+        self._index.append((self._file.tell(), len(frame), len(text)))
+        self._file.write(frame)
+
+    @property
+    def page_count(self) -> int:
+        return len(self._index)
+
+    def close(self) -> None:
+        """Write the index and move the store into place."""
+        index_offset = self._file.tell()
+        for entry in self._index:
+            self._file.write(_INDEX_ENTRY.pack(*entry))
+        self._file.write(_TRAILER.pack(index_offset, len(self._index), MAGIC))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._partial_path, self.path)
+        text_cache.pop(self.path)
+
+    def abort(self) -> None:
+        """Discard everything written so far."""
+        self._file.close()
+        try:
+            os.remove(self._partial_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "TextStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class TextStoreReader:
+    """Memory-mapped random access to the pages of a text store."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, codec = _HEADER.unpack_from(self._map, 0)
+        index_offset, page_count, trailer_magic = _TRAILER.unpack_from(
+            self._map, len(self._map) - _TRAILER.size
+        )
+        if magic != MAGIC or trailer_magic != MAGIC or version != FORMAT_VERSION:
+            self._map.close()
+            raise ValueError(f"Not a text store: {path}")
+        self._decompress = _decompressor(codec)
+        self._frames = [
+            _INDEX_ENTRY.unpack_from(self._map, index_offset + i * _INDEX_ENTRY.size)
+            for i in range(page_count)
+        ]
+        # Character offset at which each page starts
+        self._starts = [0]
+        for _, _, chars in self._frames:
+            self._starts.append(self._starts[-1] + chars)
+        # Last page decompressed, so nearby ranges don't decompress it again
+        self._last_page = (-1, "")
+
+    @property
+    def page_count(self) -> int:
+        return len(self._frames)
+
+    @property
+    def char_count(self) -> int:
+        return self._starts[-1]
+
+    def page(self, number: int) -> str:
+        """Text of a single page (0-based)."""
+        if self._last_page[0] == number:
+            return self._last_page[1]
+        offset, length, _ = self._frames[number]
+        text = self._decompress(self._map[offset:offset + length]).decode("utf-8")
+        self._last_page = (number, text)
+        return text
+
+    def pages(self) -> Iterator[str]:
+        """Iterate over pages, decompressing one at a time."""
+        for number in range(self.page_count):
+            yield self.page(number)
+
+    def read_range(self, start: int, end: int) -> str:
+        """Characters ``[start, end)`` of the full text."""
+        start = max(0, start)
+        end = min(end, self.char_count)
+        if start >= end:
+            return ""
+        first = bisect.bisect_right(self._starts, start) - 1
+        last = bisect.bisect_left(self._starts, end) - 1
+        text = "".join(self.page(number) for number in range(first, last + 1))
+        offset = self._starts[first]
+        return text[start - offset:end - offset]
+
+    def read(self) -> str:
+        """The full text."""
+        return "".join(self.pages())
+
+    def close(self) -> None:
+        self._map.close()
+
+    def __enter__(self) -> "TextStoreReader":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+def write_text(file_path: str, pages: Iterable[str]) -> int:
+    """
+    Store extracted text for a file, page by page.
+
+    Returns:
+        Number of pages written
+    """
+    with TextStoreWriter(text_path(file_path)) as writer:
+        for page in pages:
+            writer.write_page(page)
+        return writer.page_count
+
+def has_text(file_path: str) -> bool:
+    """Check whether text has been stored for a file."""
+    return os.path.exists(text_path(file_path))
+
+def read_text(file_path: str) -> Optional[str]:
+    """Full extracted text for a file (served from the LRU when hot), or None."""
+    path = text_path(file_path)
+    text = text_cache.get(path)
+    if text is None:
+        if not os.path.exists(path):
+            return None
+        with TextStoreReader(path) as reader:
+            text = reader.read()
+        text_cache.set(path, text)
+    return text
+
+def iter_text(file_path: str) -> Iterator[str]:
+    """
+    Iterate over the stored text in consecutive pieces.
+
+    Yields page by page from disk, or the whole text at once when it is
+    already cached, so callers never hold more than one page they did not
+    ask for.
+    """
+    path = text_path(file_path)
+    text = text_cache.get(path)
+    if text is not None:
+        yield text
+        return
+    with TextStoreReader(path) as reader:
+        yield from reader.pages()
+
+def read_page(file_path: str, number: int) -> str:
+    """A single stored page (0-based)."""
+    with TextStoreReader(text_path(file_path)) as reader:
+        return reader.page(number)
+
+def read_range(file_path: str, start: int, end: int) -> str:
+    """Characters ``[start, end)`` of the stored text."""
+    text = text_cache.get(text_path(file_path))
+    if text is not None:
+        return text[start:end]
+    with TextStoreReader(text_path(file_path)) as reader:
+        return reader.read_range(start, end)
+
+def read_ranges(file_path: str, ranges: Iterable[tuple]) -> Iterator[str]:
+    """Several ``(start, end)`` character ranges of the stored text, opening it once."""
+    text = text_cache.get(text_path(file_path))
+    if text is not None:
+        for start, end in ranges:
+            yield text[start:end]
+        return
+    with TextStoreReader(text_path(file_path)) as reader:
+        for start, end in ranges:
+            yield reader.read_range(start, end)
+
+def remove_text(file_path: str) -> None:
+    """Delete the stored text for a file."""
+    path = text_path(file_path)
+    text_cache.pop(path)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
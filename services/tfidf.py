@@ -0,0 +1,420 @@
+import json
+import os
+import re
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, func, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+from services import analyzer, text_store
+from services.document_service import load_text
+from services.search_index import MAX_TERM_LENGTH
+
+# Analyzer version of this engine, selectable next to analyzer.ANALYZER_VERSION
+ANALYZER_VERSION = "tfidf-1"
+
+# Ranking configuration
+TFIDF_KEY_POINTS = int(os.getenv("TFIDF_KEY_POINTS", 5))
+TFIDF_SUMMARY_SENTENCES = int(os.getenv("TFIDF_SUMMARY_SENTENCES", 2))
+TFIDF_MIN_WORDS = int(os.getenv("TFIDF_MIN_WORDS", 6))  # Shorter sentences are never key points
+
+# Above this many distinct terms in a batch, read all of the user's
+# statistics in one scan instead of looking the terms up
+FULL_SCAN_TERMS = 5000
+
+# Index terms (as search_index.tokenize, which drops overlong words), plus
+# the "." that ends a sentence
+_TOKEN_OR_STOP = re.compile(rf"(?<!\w)\w{{1,{MAX_TERM_LENGTH}}}(?!\w)|\.", re.UNICODE)
+
+# Word count and sentiment are the same as in the streaming engine
+_counts_analyzer = analyzer.Analyzer((analyzer.WordCountPass, analyzer.SentimentPass))
+
+@dataclass
+class Profile:
+    """
+    What ranking needs to know about one text, computed once per blob.
+
+    ``sentences`` holds (start, end, words) per sentence, as character
+    offsets into the text; ``entries`` holds (sentence, term, tf) for every
+    term of every sentence, term being an index into the sorted ``terms``.
+    """
+    terms: List[str]
+    word_count: int
+    sentiment: str
+    sentences: np.ndarray
+    entries: np.ndarray
+
+def profile(text: str) -> Profile:
+    """Tokenize a text once into its TF-IDF profile."""
+    counts = _counts_analyzer.analyze(text)
+    spans = []
+    segment_sentence = []  # Sentence of each "."-separated segment (-1 when it has no words)
+    start = 0
+    for segment in text.split("."):
+        words = len(segment.split())
+        segment_sentence.append(len(spans) if words else -1)
+        if words:
+            spans.append((start, start + len(segment), words))
+        start += len(segment) + 1
+
+    # One tokenizing pass; a token's segment is the number of separators before it
+    tokens = _TOKEN_OR_STOP.findall(text.lower())
+    terms = sorted(set(tokens) - {"."})
+    index = dict(zip(terms, range(len(terms))))
+    index["."] = -1
+    ids = np.fromiter(map(index.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+    stop = ids == -1
+    sentence = np.asarray(segment_sentence, dtype=np.int64)[np.cumsum(stop)[~stop]]
+    size = max(1, len(terms))
+    keys, tf = np.unique(sentence * size + ids[~stop], return_counts=True)
+    return Profile(
+        terms=terms,
+        word_count=counts["word_count"],
+        sentiment=counts["sentiment"],
+        sentences=np.asarray(spans, dtype=np.int64).reshape(-1, 3),
+        entries=np.stack((keys // size, keys % size, tf), axis=1).reshape(-1, 3),
+    )
+
+def select(profiles: Sequence[Profile], doc_freq: Callable[[List[str]], Dict[str, int]],
+           corpus_size: int) -> List[Tuple[List[int], List[int]]]:
+    """
+    Pick the key point and summary sentences of each profile by TF-IDF centrality.
+
+    Every sentence becomes a sublinear TF-IDF vector; its score is the
+    cosine similarity to the centroid of its document's (unit) sentence
+    vectors, i.e. how representative it is of the document. All profiles
+    share one sparse term matrix, kept as coordinate arrays, so the whole
+    batch is scored with a handful of NumPy operations.
+
+    Args:
+        profiles: Profiles of the texts to rank
+        doc_freq: Looks up how many of the user's documents contain each
+            of the batch's terms
+        corpus_size: Number of the user's documents in the statistics
+
+    Returns:
+        Per profile, the indices of its key point sentences (best ones, in
+        text order) and of its summary sentences (in text order)
+    """
+    picks: List[Tuple[List[int], List[int]]] = [([], []) for _ in profiles]
+    if not profiles:
+        return picks
+
+    # Batch-wide term ids; a document's (local) terms are numbered
+    # consecutively from its offset, which makes them its centroid cells
+    ids: Dict[str, int] = {}
+    cell_terms = np.fromiter(
+        (ids.setdefault(term, len(ids)) for p in profiles for term in p.terms), dtype=np.int64
+    )
+    if not ids:
+        return picks
+    vocabulary_sizes = np.asarray([len(p.terms) for p in profiles], dtype=np.int64)
+    sentence_counts = np.asarray([len(p.sentences) for p in profiles], dtype=np.int64)
+    doc_ids = np.arange(len(profiles))
+    entries = np.concatenate([p.entries for p in profiles])
+    entry_doc = np.repeat(doc_ids, [len(p.entries) for p in profiles])
+    entry_sentence = entries[:, 0] + (np.cumsum(sentence_counts) - sentence_counts)[entry_doc]
+    entry_cell = entries[:, 1] + (np.cumsum(vocabulary_sizes) - vocabulary_sizes)[entry_doc]
+    docs = np.repeat(doc_ids, sentence_counts)
+    sentence_total = len(docs)
+
+    known = doc_freq(list(ids))
+    df = np.fromiter((known.get(term, 0) for term in ids), dtype=np.float64, count=len(ids))
+    idf = np.log((1.0 + corpus_size) / (1.0 + df)) + 1.0
+    weight = (1.0 + np.log(entries[:, 2])) * idf[cell_terms[entry_cell]]
+
+    # Unit sentence vectors, their per-document centroids, and the cosine
+    # of each sentence with its centroid
+    norm = np.sqrt(np.bincount(entry_sentence, weights=weight * weight, minlength=sentence_total))
+    weight /= norm[entry_sentence]
+    centroid = np.bincount(entry_cell, weights=weight, minlength=len(cell_terms))
+    centroid_norm = np.sqrt(np.bincount(
+        np.repeat(doc_ids, vocabulary_sizes), weights=centroid * centroid, minlength=len(profiles)
+    ))
+    dot = np.bincount(entry_sentence, weights=weight * centroid[entry_cell], minlength=sentence_total)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        score = np.where(centroid_norm[docs] > 0, dot / centroid_norm[docs], 0.0)
+
+    # Best sentences first within each document (ties keep text order)
+    order = np.lexsort((np.arange(sentence_total), -score, docs))
+    ordered_docs = docs[order]
+    position = np.arange(sentence_total) - np.searchsorted(ordered_docs, ordered_docs, side="left")
+    summary = np.sort(order[position < TFIDF_SUMMARY_SENTENCES])
+
+    words = np.concatenate([p.sentences[:, 2] for p in profiles])
+    eligible = words[order] >= TFIDF_MIN_WORDS
+    eligible_docs = ordered_docs[eligible]
+    eligible_position = np.arange(len(eligible_docs)) - np.searchsorted(eligible_docs, eligible_docs, side="left")
+    key_points = np.sort(order[eligible][eligible_position < TFIDF_KEY_POINTS])
+
+    first_sentence = (np.cumsum(sentence_counts) - sentence_counts).tolist()
+    for which, chosen in ((0, key_points), (1, summary)):
+        for doc, sentence in zip(docs[chosen].tolist(), chosen.tolist()):
+            picks[doc][which].append(sentence - first_sentence[doc])
+    return picks
+
+def _result(p: Profile, picked: Tuple[List[int], List[int]],
+            read: Callable[[List[Tuple[int, int]]], Any]) -> Dict[str, Any]:
+    """Analysis result of a ranked profile; ``read`` fetches sentence ranges of its text."""
+    key_points, summary = picked
+    needed = sorted(set(key_points) | set(summary))
+    spans = [(int(p.sentences[i, 0]), int(p.sentences[i, 1])) for i in needed]
+    texts = dict(zip(needed, (" ".join(raw.split()) for raw in read(spans)))) if needed else {}
+    return {
+        "word_count": p.word_count,
+        "sentiment": p.sentiment,
+        "key_points": [texts[i] for i in key_points],
+        "summary": " ".join(texts[i] for i in summary),
+    }
+
+def rank(texts: Sequence[str], doc_freq: Callable[[List[str]], Dict[str, int]],
+         corpus_size: int) -> List[Dict[str, Any]]:
+    """
+    Analyze texts by ranking their sentences with TF-IDF centrality (see ``select``).
+
+    Returns:
+        Per text, the same keys as analyzer.Analyzer: word_count,
+        key_points (best sentences, in text order), summary and sentiment
+    """
+    profiles = [profile(text) for text in texts]
+    return [
+        _result(p, picked, lambda spans, text=text: [text[start:end] for start, end in spans])
+        for p, picked, text in zip(profiles, select(profiles, doc_freq, corpus_size), texts)
+    ]
+
+# Stored profiles
+def _pack(array: np.ndarray, dtype: str) -> bytes:
+    return zlib.compress(array.astype(dtype).tobytes(), 1)
+
+def _unpack(data: bytes, dtype: str) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(data), dtype=dtype).reshape(-1, 3).astype(np.int64)
+
+def _profile_columns(p: Profile) -> Dict[str, Any]:
+    """BlobVocabulary columns holding a profile."""
+    return {
+        "terms": json.dumps(p.terms),
+        "word_count": p.word_count,
+        "sentiment": p.sentiment,
+        "sentences": _pack(p.sentences, "<i8"),
+        "entries": _pack(p.entries, "<i4"),
+    }
+
+def _load_profiles(db: Session, content_hashes: Sequence[str]) -> Dict[str, Profile]:
+    """Stored profiles of the given blobs (those stored before profiles existed are left out)."""
+    content_hashes = list(content_hashes)
+    table = models.BlobVocabulary
+    found = {}
+    for start in range(0, len(content_hashes), 500):
+        for row in db.query(
+            table.content_hash, table.terms, table.word_count, table.sentiment, table.sentences, table.entries
+        ).filter(table.content_hash.in_(content_hashes[start:start + 500]), table.sentences.isnot(None)):
+            found[row.content_hash] = Profile(
+                terms=json.loads(row.terms),
+                word_count=row.word_count,
+                sentiment=row.sentiment,
+                sentences=_unpack(row.sentences, "<i8"),
+                entries=_unpack(row.entries, "<i4"),
+            )
+    return found
+
+# Corpus statistics
+def _vocabularies(db: Session, content_hashes: Sequence[str]) -> Dict[str, List[str]]:
+    """Stored vocabularies of the given blobs."""
+    content_hashes = list(content_hashes)
+    found = {}
+    for start in range(0, len(content_hashes), 500):
+        found.update(
+            (content_hash, json.loads(terms))
+            for content_hash, terms in db.query(models.BlobVocabulary.content_hash, models.BlobVocabulary.terms).filter(
+                models.BlobVocabulary.content_hash.in_(content_hashes[start:start + 500])
+            )
+        )
+    return found
+
+def _apply(db: Session, delta: Counter) -> None:
+    """Add ``delta`` ((user_id, term) -> change) to the document frequencies. Does not commit."""
+    term_table = models.CorpusTerm.__table__
+    by_user: Dict[int, Dict[str, int]] = {}
+    for (user_id, term), change in delta.items():
+        if change:
+            by_user.setdefault(user_id, {})[term] = change
+    for user_id, changes in by_user.items():
+        touched = list(changes)
+        existing = set()
+        for start in range(0, len(touched), 500):
+            existing.update(term for (term,) in db.query(models.CorpusTerm.term).filter(
+                models.CorpusTerm.user_id == user_id, models.CorpusTerm.term.in_(touched[start:start + 500])
+            ))
+        if existing:
+            db.execute(
+                update(term_table).where(
+                    term_table.c.user_id == user_id, term_table.c.term == bindparam("t")
+                ).values(df=term_table.c.df + bindparam("change")),
+                [{"t": term, "change": changes[term]} for term in existing]
+            )
+        new = [
+            {"user_id": user_id, "term": term, "df": change}
+            for term, change in changes.items() if term not in existing and change > 0
+        ]
+        if new:
+            db.execute(insert(models.CorpusTerm), new)
+        dropped = [term for term, change in changes.items() if term in existing and change < 0]
+        for start in range(0, len(dropped), 500):
+            db.query(models.CorpusTerm).filter(
+                models.CorpusTerm.user_id == user_id,
+                models.CorpusTerm.term.in_(dropped[start:start + 500]),
+                models.CorpusTerm.df <= 0
+            ).delete(synchronize_session=False)
+
+def count_documents(db: Session, documents: Sequence[models.Document]) -> int:
+    """
+    Bring the corpus statistics up to date for the given documents, and commit.
+
+    Documents are counted once their text has been extracted; a document
+    whose content changed (a new version) has its old vocabulary
+    subtracted and the new one added. A blob is profiled the first time
+    one of its documents is counted.
+
+    Returns:
+        Number of documents (re)counted
+    """
+    documents = [document for document in documents if document.content_hash]
+    if not documents:
+        return 0
+    counted = {
+        row.document_id: row for row in db.query(models.CorpusDocument).filter(
+            models.CorpusDocument.document_id.in_([document.id for document in documents])
+        )
+    }
+    stale = [
+        document for document in documents
+        if document.id not in counted or counted[document.id].content_hash != document.content_hash
+    ]
+    if not stale:
+        return 0
+    vocabularies = _vocabularies(
+        db, {document.content_hash for document in stale} | {row.content_hash for row in counted.values()}
+    )
+    delta: Counter = Counter()
+    recounted = 0
+    for document in stale:
+        terms = vocabularies.get(document.content_hash)
+        if terms is None:
+            text = text_store.read_text(document.file_path) if document.file_path else None
+            if text is None:
+                continue
+            p = profile(text)
+            terms = vocabularies[document.content_hash] = p.terms
+            db.add(models.BlobVocabulary(content_hash=document.content_hash, **_profile_columns(p)))
+        row = counted.get(document.id)
+        if row is None:
+            db.add(models.CorpusDocument(
+                document_id=document.id, user_id=document.user_id, content_hash=document.content_hash
+            ))
+        else:
+            for term in vocabularies.get(row.content_hash, ()):
+                delta[(document.user_id, term)] -= 1
+            row.content_hash = document.content_hash
+        for term in terms:
+            delta[(document.user_id, term)] += 1
+        recounted += 1
+    try:
+        db.flush()
+        _apply(db, delta)
+        db.commit()
+    except IntegrityError:
+        # Counted concurrently (e.g. the extraction job and the upload)
+        db.rollback()
+        return count_documents(db, documents)
+    return recounted
+
+def uncount_documents(db: Session, document_ids) -> None:
+    """
+    Remove documents from the corpus statistics before they are deleted.
+
+    ``document_ids`` may be a list or a subquery selecting them. Does not
+    commit.
+    """
+    rows = db.query(
+        models.CorpusDocument.user_id, models.CorpusDocument.content_hash, func.count()
+    ).filter(
+        models.CorpusDocument.document_id.in_(document_ids)
+    ).group_by(models.CorpusDocument.user_id, models.CorpusDocument.content_hash).all()
+    if not rows:
+        return
+    vocabularies = _vocabularies(db, {content_hash for _, content_hash, _ in rows})
+    delta: Counter = Counter()
+    for user_id, content_hash, count in rows:
+        for term in vocabularies.get(content_hash, ()):
+            delta[(user_id, term)] -= count
+    _apply(db, delta)
+    db.query(models.CorpusDocument).filter(
+        models.CorpusDocument.document_id.in_(document_ids)
+    ).delete(synchronize_session=False)
+
+def _doc_freq(db: Session, user_id: int, terms: List[str]) -> Dict[str, int]:
+    query = db.query(models.CorpusTerm.term, models.CorpusTerm.df).filter(models.CorpusTerm.user_id == user_id)
+    if len(terms) > FULL_SCAN_TERMS:
+        return dict(query.all())
+    doc_freq = {}
+    for start in range(0, len(terms), 500):
+        doc_freq.update(query.filter(models.CorpusTerm.term.in_(terms[start:start + 500])).all())
+    return doc_freq
+
+def analyze_documents(db: Session, user_id: int, documents: Sequence[models.Document]) -> Dict[int, Dict[str, Any]]:
+    """
+    Analyze a user's documents in one batch against their corpus statistics.
+
+    Documents not yet in the statistics are counted first (and committed).
+    Identical contents are ranked once, from their stored profiles; only
+    the chosen sentences are read from the text store.
+
+    Args:
+        db: Database session (write)
+        user_id: Owner of the documents, whose statistics are used
+        documents: The documents to analyze
+
+    Returns:
+        Document ID -> analysis result
+    """
+    count_documents(db, documents)
+    corpus_size = db.query(func.count(models.CorpusDocument.document_id)).filter(
+        models.CorpusDocument.user_id == user_id
+    ).scalar()
+
+    contents: Dict[Tuple[Optional[str], Any], List[models.Document]] = {}
+    for document in documents:
+        key = (document.content_hash, None) if document.content_hash else (None, document.id)
+        contents.setdefault(key, []).append(document)
+    stored = _load_profiles(db, [content_hash for content_hash, _ in contents if content_hash])
+    profiles = []
+    readers = []
+    for (content_hash, _), group in contents.items():
+        file_path = group[0].file_path
+        if content_hash in stored:
+            profiles.append(stored[content_hash])
+            readers.append(lambda spans, file_path=file_path: text_store.read_ranges(file_path, spans))
+            continue
+        # No stored text (or stored before profiles were): profile it now
+        text = load_text(file_path, group[0].content_type)
+        p = profile(text)
+        if content_hash and text_store.has_text(file_path):
+            db.query(models.BlobVocabulary).filter(
+                models.BlobVocabulary.content_hash == content_hash
+            ).update(_profile_columns(p), synchronize_session=False)
+        profiles.append(p)
+        readers.append(lambda spans, text=text: [text[start:end] for start, end in spans])
+    db.commit()
+
+    picks = select(profiles, lambda terms: _doc_freq(db, user_id, terms), corpus_size)
+    return {
+        document.id: _result(p, picked, read)
+        for group, p, picked, read in zip(contents.values(), profiles, picks, readers)
+        for document in group
+    }
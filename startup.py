@@ -0,0 +1,288 @@
+"""
+Application startup: schema creation, warm-up and a startup-time report.
+
+main.py imports this module first, so ``report`` measures everything the
+app imports. Schema DDL only runs when CREATE_SCHEMA is set (or through
+the release command below); warm-up pays the first-use costs (DB
+connections, the bcrypt backend self-test, the analyzer code paths)
+before the worker takes traffic instead of on its first requests.
+
+Release and diagnostics commands:
+
+    python -m startup create-schema
+    python -m startup import-report [--top 20]
+"""
+import argparse
+import hashlib
+import logging
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+CREATE_SCHEMA = _flag("CREATE_SCHEMA", "false")  # Run create_all on startup (else a release step does)
+WARM_UP = _flag("WARM_UP", "true")
+# Directory for the lock files that keep singleton background work
+# (e.g. the reminder scheduler) to one process per host
+LOCK_DIR = os.getenv("LOCK_DIR", tempfile.gettempdir())
+
+class StartupReport:
+    """Wall-clock timings of the startup phases of this process."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.ready: Optional[float] = None
+        self.first_request: Optional[float] = None
+        self._mark = self.started
+
+    def phase(self, name: str) -> None:
+        """Close the current phase, attributing the time since the last mark to ``name``."""
+        now = time.perf_counter()
+        self.phases[name] = now - self._mark
+        self._mark = now
+
+    def mark_ready(self) -> None:
+        self.ready = time.perf_counter() - self.started
+        logger.info(
+            "Startup complete in %.3fs (%s)", self.ready,
+            ", ".join(f"{name} {seconds:.3f}s" for name, seconds in self.phases.items())
+        )
+
+    def mark_first_request(self) -> None:
+        self.first_request = time.perf_counter() - self.started
+        logger.info("First request served %.3fs after startup began", self.first_request)
+
+    def metric_lines(self) -> List[str]:
+        """Exposition lines for /metrics."""
+        import metrics
+
+        values = dict(self.phases)
+        if self.ready is not None:
+            values["ready"] = self.ready
+        if self.first_request is not None:
+            values["first_request"] = self.first_request
+        return metrics.gauge_lines(
+            "startup_seconds", "Seconds from startup to the end of each phase.", values, label="phase"
+        )
+
+report = StartupReport()
+
+class FirstRequestTimer:
+    """ASGI middleware recording when the first HTTP request completes."""
+
+    def __init__(self, app):
+        self.app = app
+        self.pending = True
+
+    async def __call__(self, scope, receive, send):
+        await self.app(scope, receive, send)
+        if self.pending and scope["type"] == "http":
+            self.pending = False
+            report.mark_first_request()
+
+def upgrade_schema(engine) -> List[str]:
+    """
+    Bring tables created by earlier versions up to date with the models.
+
+    create_all only creates missing tables, so columns and indexes added
+    to existing tables since are added here, and tables no longer used are
+    dropped. Idempotent. Foreign keys and constraints are not retrofitted,
+    and NOT NULL columns without a server default cannot be added (they
+    are reported instead).
+
+    Returns:
+        The DDL statements that were run
+    """
+    from sqlalchemy import inspect, text
+    from sqlalchemy.schema import CreateIndex
+
+    import models
+    from services import search_index
+
+    quote = engine.dialect.identifier_preparer
+    applied = []
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        existing = set(inspector.get_table_names())
+        for table in models.Base.metadata.sorted_tables:
+            if table.name not in existing:
+                continue
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                if column.primary_key or (not column.nullable and column.server_default is None):
+                    logger.error("Cannot add column %s.%s to the existing table; migrate it by hand",
+                                 table.name, column.name)
+                    continue
+                ddl = (
+                    f"ALTER TABLE {quote.format_table(table)} ADD COLUMN {quote.format_column(column)} "
+                    f"{column.type.compile(dialect=engine.dialect)}"
+                )
+                connection.execute(text(ddl))
+                applied.append(ddl)
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(connection)
+                    applied.append(str(CreateIndex(index).compile(dialect=engine.dialect)).strip())
+        for name in search_index.RETIRED_TABLES:
+            if name in existing:
+                ddl = f"DROP TABLE {quote.quote(name)}"
+                connection.execute(text(ddl))
+                applied.append(ddl)
+    return applied
+
+def create_schema() -> List[str]:
+    """
+    Create missing tables, columns, indexes and the full-text search
+    table, and index unchunked blobs.
+
+    Returns:
+        The DDL run to upgrade existing tables
+    """
+    import database
+    import models
+    from services import search_index
+
+    models.Base.metadata.create_all(bind=database.engine)
+    upgraded = upgrade_schema(database.engine)
+    for ddl in upgraded:
+        logger.info("Schema upgrade: %s", ddl)
+    search_index.ensure_schema(database.engine)
+    with database.SessionLocal() as db:
+        indexed = search_index.backfill(db)
+    if indexed:
+        logger.info("Indexed the text of %d blobs", indexed)
+    return upgraded
+
+def _warm_pool(engine) -> int:
+    """Open (and return to the pool) as many connections as the pool keeps."""
+    from sqlalchemy import text
+
+    size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+    connections = []
+    try:
+        for _ in range(max(1, size)):
+            connection = engine.connect()
+            connection.execute(text("SELECT 1"))
+            connections.append(connection)
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+def warm_up() -> None:
+    """Pay first-use costs now: DB connections, the bcrypt backend and the analyzer."""
+    import database
+    import security
+    from services import analyzer
+
+    opened = _warm_pool(database.engine)
+    if database.read_engine is not database.engine:
+        opened += _warm_pool(database.read_engine)
+    # Loading passlib's bcrypt backend runs its self-tests; do it once here
+    security.pwd_context.handler().get_backend()
+    analyzer.default_analyzer.analyze("Warm up the analyzer with one good sentence. And a second one.")
+    logger.debug("Warm-up opened %d database connections", opened)
+
+_locks: Dict[str, int] = {}
+
+def hold_lock(name: str) -> bool:
+    """
+    Try to take a process-lifetime lock shared by every worker on this host.
+
+    Used to run singleton background work (like the reminder scheduler) in
+    one worker only. The lock is released when the holder exits, so a
+    recycled worker's replacement takes it over. Always True where file
+    locks are unavailable.
+    """
+    if name in _locks:
+        return True
+    try:
+        import fcntl
+    except ImportError:
+        return True
+    import database
+
+    # One lock per database, so separate apps on a host don't share it
+    key = hashlib.sha1(database.DATABASE_URL.encode("utf-8")).hexdigest()[:12]
+    fd = os.open(os.path.join(LOCK_DIR, f"pathfinder-{name}-{key}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return False
+    _locks[name] = fd
+    return True
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|\s+(\S+)")
+
+def import_times(module: str = "main") -> List[Tuple[str, float, float]]:
+    """
+    Import cost of ``module`` grouped by top-level package, in a fresh interpreter.
+
+    Returns:
+        (package, self seconds, cumulative seconds of its slowest single import)
+        tuples, slowest first
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env={**os.environ, "WARM_UP": "false"}
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    self_us: Dict[str, int] = defaultdict(int)
+    cumulative_us: Dict[str, int] = defaultdict(int)
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if not match:
+            continue
+        own, cumulative, name = match.groups()
+        package = name.split(".")[0]
+        self_us[package] += int(own)
+        cumulative_us[package] = max(cumulative_us[package], int(cumulative))
+    return sorted(
+        ((package, self_us[package] / 1e6, cumulative_us[package] / 1e6) for package in self_us),
+        key=lambda row: row[1], reverse=True
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("create-schema", help="Create or upgrade the database schema (release step)")
+    imports = commands.add_parser("import-report", help="Show import time per package")
+    imports.add_argument("--module", default="main")
+    imports.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "create-schema":
+        start = time.perf_counter()
+        for ddl in create_schema():
+            print(ddl)
+        print(f"Schema ready in {time.perf_counter() - start:.3f}s")
+        return
+
+    rows = import_times(args.module)
+    total = sum(own for _, own, _ in rows)
+    print(f"{'package':<28} {'self ms':>9} {'largest import ms':>18}")
+    for package, own, cumulative in rows[:args.top]:
+        print(f"{package:<28} {own * 1000:>9.1f} {cumulative * 1000:>18.1f}")
+    print(f"{'total':<28} {total * 1000:>9.1f}")
+
+if __name__ == "__main__":
+    main()